@@ -1,3 +1,5 @@
+from typing import List, Tuple, Optional
+
 from beanie import Link
 from ortools.sat.python.cp_model import CpModel
 
@@ -10,7 +12,7 @@ from planner_solver.models.stored_documents import TaskDocument
 @ConstraintType(type_name="after_constraint", attachable_to=['task'])
 class AfterConstraint(Constraint):
 
-    task: Link[TaskDocument] = ConstraintParameter(
+    task: Link[TaskDocument] | str = ConstraintParameter(
         param_type=Task,
         link='task'
     )
@@ -25,6 +27,9 @@ class AfterConstraint(Constraint):
     def attach_scenario_constraint(self, model: CpModel) -> None:
         raise ConstraintAttachTypeException('after_constraint can only be attached to a task, use after_constraint_scenario')
 
+    def get_precedences(self, task: Optional[Task] = None) -> List[Tuple[Task, Task]]:
+        return [(self.task, task)]
+
 @ConstraintType(type_name="after_constraint_scenario", attachable_to=['scenario'])
 class AfterConstraintScenario(Constraint):
     """
@@ -59,4 +64,7 @@ class AfterConstraintScenario(Constraint):
 
         model.add(
             before_task.cp_sat.end <= after_task.cp_sat.start
-        )
\ No newline at end of file
+        )
+
+    def get_precedences(self, task: Optional[Task] = None) -> List[Tuple[Task, Task]]:
+        return [(self.task_before, self.task_after)]
\ No newline at end of file
@@ -19,11 +19,15 @@ class MachineryResource(Resource):
         self.__attached_tasks = []
 
     def prepare_resource(self, model: CpModel) -> None:
-        pass
+        # the same instance can be built in more than one model
+        self.__attached_tasks = []
 
     def attach_scenario_resource(self, model: CpModel) -> None:
         task_intervals = [task.cp_sat.interval for task in self.__attached_tasks]
         model.add_no_overlap(task_intervals)
 
     def attach_task_resource(self, model: CpModel, task: Task):
-        self.__attached_tasks.append(task)
\ No newline at end of file
+        self.__attached_tasks.append(task)
+
+    def is_exclusive(self) -> bool:
+        return True
\ No newline at end of file
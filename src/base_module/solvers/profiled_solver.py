@@ -0,0 +1,98 @@
+from typing import Optional, Dict, Any
+
+from ortools.sat.python.cp_model import CpModel, CpSolver
+
+from planner_solver.decorators.parameters import Parameter
+from planner_solver.decorators.solver_type import SolverType, SolverParameter
+from planner_solver.models.base_models import Solver
+from planner_solver.services.cpu_quota_service import available_cpu_count
+
+SOLVER_PROFILES: Dict[str, Dict[str, Any]] = {
+    'fast-feasible': {
+        'max_time_in_seconds': 5.0,
+        'relative_gap_limit': 0.05,
+        'linearization_level': 0,
+    },
+    'balanced': {
+        'max_time_in_seconds': 60.0,
+        'relative_gap_limit': 0.01,
+        'linearization_level': 1,
+    },
+    'deep-optimize': {
+        'max_time_in_seconds': 600.0,
+        'relative_gap_limit': 0.0,
+        'linearization_level': 2,
+    },
+}
+"""the named parameter sets, every value can still be overridden per execution"""
+
+DEFAULT_PROFILE = 'balanced'
+
+
+@SolverType(type_name="profiled_solver")
+class ProfiledSolver(Solver):
+    """
+    This solver picks a named set of CpSat parameters (see SOLVER_PROFILES)
+    and lets every single value be overridden.
+
+    The number of workers, if not set, is sized on the cpu quota of the container
+    """
+    profile: Optional[str] = SolverParameter(
+        param_type=str
+    )
+    num_search_workers: Optional[int] = SolverParameter(
+        param_type=int
+    )
+    max_time_in_seconds: Optional[float] = SolverParameter(
+        param_type=float
+    )
+    relative_gap_limit: Optional[float] = SolverParameter(
+        param_type=float
+    )
+    random_seed: Optional[int] = SolverParameter(
+        param_type=int
+    )
+    linearization_level: Optional[int] = SolverParameter(
+        param_type=int
+    )
+
+    @staticmethod
+    def __value(value: Any) -> Any:
+        # unset parameters still hold their descriptor
+        if isinstance(value, Parameter):
+            return None
+        return value
+
+    def get_profile(self) -> str:
+        return self.__value(self.profile) or DEFAULT_PROFILE
+
+    def get_parameters(self) -> Dict[str, Any]:
+        """
+        the resolved parameters: profile values, then the overrides
+        """
+        profile = self.get_profile()
+        if profile not in SOLVER_PROFILES:
+            raise ValueError(f"Unknown solver profile {profile}, available: {', '.join(SOLVER_PROFILES.keys())}")
+
+        parameters = dict(SOLVER_PROFILES[profile])
+        parameters['num_workers'] = available_cpu_count()
+
+        overrides = {
+            'num_workers': self.__value(self.num_search_workers),
+            'max_time_in_seconds': self.__value(self.max_time_in_seconds),
+            'relative_gap_limit': self.__value(self.relative_gap_limit),
+            'random_seed': self.__value(self.random_seed),
+            'linearization_level': self.__value(self.linearization_level),
+        }
+        for name, value in overrides.items():
+            if value is not None:
+                parameters[name] = value
+
+        return parameters
+
+    def generate_solver(self, model: CpModel) -> CpSolver:
+        solver = CpSolver()
+        for name, value in self.get_parameters().items():
+            setattr(solver.parameters, name, value)
+
+        return solver
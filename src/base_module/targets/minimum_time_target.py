@@ -1,4 +1,4 @@
-from typing import List
+from typing import ClassVar, List, Optional
 
 from ortools.sat.python.cp_model import CpModel
 
@@ -10,15 +10,22 @@ class MinimumTypeTarget(Target):
     """
     Minimizes the finish time
     """
+    minimizes_makespan: ClassVar[bool] = True
+
     def attach_target(
             self,
             model: CpModel,
             horizon: int,
-            tasks: List[Task]
+            tasks: List[Task],
+            lower_bound: int = 0,
     ) -> None:
-        obj_var = model.new_int_var(0, horizon, "makespan")
+        obj_var = model.new_int_var(lower_bound, horizon, "makespan")
         model.add_max_equality(
             obj_var,
             [task.cp_sat.end for task in tasks]
         )
-        model.minimize(obj_var)
\ No newline at end of file
+        model.minimize(obj_var)
+
+    def combine_objectives(self, objectives: List[float]) -> Optional[float]:
+        # the scenario ends when its last component does
+        return max(objectives, default=0)
@@ -27,7 +27,8 @@ class FixedDurationTask(Task):
         self.__uuid: str = str(uuid.uuid4())
 
     def get_unique_id(self) -> str:
-        return self.__uuid
+        # the stored uuid is stable across executions, the generated one is only for unsaved tasks
+        return self.uuid if self.uuid is not None else self.__uuid
 
     def get_duration(self) -> int:
         return self.duration
@@ -48,10 +49,14 @@ class FixedDurationTask(Task):
         self.__resources.append(resource)
 
     def generate_cp_sat(self, wrapped_model: "WrappedModel", horizon: int) -> CpSatTask:
+        earliest_start, latest_end = self.get_time_window()
+        if latest_end is None or latest_end > horizon:
+            latest_end = horizon
+
         wrapped_model.variables[f"{self.get_unique_id()}_start"] = (
-            wrapped_model.model.new_int_var(0, horizon, f"{self.get_unique_id()}_start"))
+            wrapped_model.model.new_int_var(earliest_start, max(earliest_start, latest_end - self.duration), f"{self.get_unique_id()}_start"))
         wrapped_model.variables[f"{self.get_unique_id()}_end"] = (
-            wrapped_model.model.new_int_var(0, horizon, f"{self.get_unique_id()}_end"))
+            wrapped_model.model.new_int_var(min(earliest_start + self.duration, latest_end), latest_end, f"{self.get_unique_id()}_end"))
         wrapped_model.variables[f"{self.get_unique_id()}_interval"] = (
             wrapped_model.model.new_interval_var(
                 wrapped_model.variables[f"{self.get_unique_id()}_start"],
@@ -7,13 +7,17 @@ messages exchanged via the rabbitmq server
 import dataclasses
 import datetime
 import logging
-from typing import cast, List
+import time
+from typing import cast, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from pydantic import ValidationError
 
 from planner_solver.containers import ApplicationContainer
-from planner_solver.models.base_models import Scenario, Resource, Task, Constraint
-from planner_solver.models.forms import BasePlannerSolverForm
+from planner_solver.exceptions.type_exceptions import TypeException, ConstraintAttachTypeException
+from planner_solver.models.base_models import Scenario, Resource, Task, Constraint, PlannerSolverBaseModel
+from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.models.forms import BasePlannerSolverForm, BulkCreateForm, BulkCreateResponse, BulkItemResult
 from planner_solver.models.stored_documents import ExecutionDocument
 
 logger = logging.getLogger(__name__)
@@ -32,9 +36,11 @@ container.wire(modules=[__name__])
 time_service = container.time_service()
 module_loader = container.module_loader_service()
 mongodb_service = container.mongodb_service()
-rabbitmq_service = container.rabbitmq_service()
+rabbitmq_publisher_service = container.rabbitmq_publisher_service()
+metrics_service = container.metrics_service()
 
 api_config = container.api_config()
+metrics_config = container.metrics_config()
 
 module_loader.load_all()
 
@@ -63,6 +69,34 @@ def health_check() -> HealthCheckResponse:
 
 # endregion status
 
+# region metrics
+
+@app.middleware('http')
+async def observe_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # the route template, so that the uuids don't explode the label values
+        route = request.scope.get('route')
+        metrics_service.http_request_seconds.labels(
+            method=request.method,
+            route=route.path if route is not None else 'unmatched',
+            status=str(status),
+        ).observe(time.perf_counter() - start)
+
+@app.get('/metrics', include_in_schema=False)
+def get_metrics(request: Request) -> Response:
+    if not metrics_config.enabled:
+        raise HTTPException(status_code=404, detail='metrics are disabled')
+    content, content_type = metrics_service.render(request.headers.get('accept'))
+    return Response(content=content, media_type=content_type)
+
+# endregion metrics
+
 # region scenario
 
 @app.get('/scenario')
@@ -224,6 +258,10 @@ async def post_scenario_task(
 
     base_model = task.to_base_model()
 
+    for uuid_resource in base_model.resource_uuids:
+        if not await mongodb_service.get_resource_document(uuid_scenario=uuid_scenario, uuid=uuid_resource):
+            raise HTTPException(status_code=404, detail=f'resource {uuid_resource} not found')
+
     # Hydrate parameter links before storing
     base_model = await mongodb_service.hydrate_parameter_links(base_model, uuid_scenario)
 
@@ -302,6 +340,14 @@ async def post_scenario_constraint(
 
     base_model = constraint.to_base_model()
 
+    try:
+        base_model.check_attachment()
+    except ConstraintAttachTypeException as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if base_model.task_uuid is not None \
+            and not await mongodb_service.get_task_document(uuid_scenario=uuid_scenario, uuid=base_model.task_uuid):
+        raise HTTPException(status_code=404, detail=f'task {base_model.task_uuid} not found')
+
     # Hydrate parameter links before storing
     base_model = await mongodb_service.hydrate_parameter_links(base_model, uuid_scenario)
 
@@ -334,13 +380,120 @@ async def delete_scenario_constraint(
 
 # endregion constraint
 
+# region bulk
+
+BULK_KINDS = {
+    'resource': Resource,
+    'task': Task,
+    'constraint': Constraint,
+}
+
+def validate_bulk_forms(
+        kind: str,
+        forms: List[BasePlannerSolverForm],
+) -> List[Tuple[BulkItemResult, Optional[PlannerSolverBaseModel]]]:
+    """
+    builds the models of the forms in one pass, the invalid ones keep their error and are not stored
+    """
+    items = []
+    for index, form in enumerate(forms):
+        result = BulkItemResult(kind=kind, index=index)
+        base_model = None
+        try:
+            base_model = form.to_base_model()
+            if not isinstance(base_model, BULK_KINDS[kind]):
+                raise TypeException(f"{form.type} is not a {kind} type")
+            if kind == 'constraint':
+                base_model.check_attachment()
+        except (TypeException, ConstraintAttachTypeException, ValidationError) as e:
+            result.error = str(e)
+            base_model = None
+        items.append((result, base_model))
+    return items
+
+async def store_bulk(
+        uuid_scenario: str,
+        form: BulkCreateForm,
+) -> BulkCreateResponse:
+    scenario_document = await mongodb_service.get_scenario_document(uuid_scenario)
+
+    if not scenario_document:
+        raise HTTPException(status_code=404, detail='scenario not found')
+
+    items = validate_bulk_forms('resource', form.resources) \
+        + validate_bulk_forms('task', form.tasks) \
+        + validate_bulk_forms('constraint', form.constraints)
+
+    results = await mongodb_service.store_documents_bulk(scenario_document, items)
+
+    failed = sum(1 for result in results if result.error is not None)
+    return BulkCreateResponse(created=len(results) - failed, failed=failed, items=results)
+
+@app.post('/scenario/{uuid_scenario}/bulk')
+async def post_scenario_bulk(
+        uuid_scenario: str,
+        bulk_form: BulkCreateForm,
+) -> BulkCreateResponse:
+    """
+    Creates resources, tasks and constraints at once, in this order: an item can link
+    the items before it by the uuid given in its data, e.g. a constraint can point to
+    a task of the same request, a task can list its resources in resource_uuids and a
+    task-level constraint names its task in task_uuid. The items that fail are reported
+    one by one, the others are stored anyway
+    """
+    return await store_bulk(uuid_scenario, bulk_form)
+
+@app.post('/scenario/{uuid_scenario}/resource/bulk')
+async def post_scenario_resources(
+        uuid_scenario: str,
+        resource_forms: List[BasePlannerSolverForm],
+) -> BulkCreateResponse:
+    return await store_bulk(uuid_scenario, BulkCreateForm(resources=resource_forms))
+
+@app.post('/scenario/{uuid_scenario}/task/bulk')
+async def post_scenario_tasks(
+        uuid_scenario: str,
+        task_forms: List[BasePlannerSolverForm],
+) -> BulkCreateResponse:
+    return await store_bulk(uuid_scenario, BulkCreateForm(tasks=task_forms))
+
+@app.post('/scenario/{uuid_scenario}/constraint/bulk')
+async def post_scenario_constraints(
+        uuid_scenario: str,
+        constraint_forms: List[BasePlannerSolverForm],
+) -> BulkCreateResponse:
+    return await store_bulk(uuid_scenario, BulkCreateForm(constraints=constraint_forms))
+
+# endregion bulk
+
 # region execution
 
 @app.post('/scenario/{uuid_scenario}/execution')
 async def launch_scenario(
         uuid_scenario: str,
+        solver_profile: Optional[str] = None,
+        heuristic_only: bool = False,
+        rolling_window: Optional[int] = None,
+        rolling_overlap: int = 0,
+        rolling_window_time_limit: Optional[float] = None,
+        time_budget: Optional[float] = None,
+        work_budget: Optional[float] = None,
+        priority: Optional[int] = None,
 ) -> ExecutionDocument:
-    """Launches the execution of a scenario"""
+    """
+    Launches the execution of a scenario, optionally with a named solver profile.
+    heuristic_only skips CpSat and answers with the dispatching rules plan,
+    rolling_window solves very long scenarios in windows of that many tasks,
+    each sharing rolling_overlap tasks with the next one.
+    time_budget (wall seconds) and work_budget (CpSat deterministic time) bound the search.
+
+    The execution is queued by scenario size (tasks and constraints), priority overrides
+    the one given by the size
+    """
+    if rolling_window is not None and (rolling_window < 1 or not 0 <= rolling_overlap < rolling_window):
+        raise HTTPException(status_code=422, detail='rolling_overlap must be lower than rolling_window')
+    if (time_budget is not None and time_budget <= 0) or (work_budget is not None and work_budget <= 0):
+        raise HTTPException(status_code=422, detail='the budgets must be positive')
 
     # retrieve the scenario
     scenario = await mongodb_service.get_scenario_document(uuid = uuid_scenario)
@@ -352,14 +505,67 @@ async def launch_scenario(
     execution_document = await mongodb_service.store_scenario_execution_document(
         uuid_scenario=uuid_scenario,
         document=ExecutionDocument(
-            type="async_execution"
+            type="async_execution",
+            solver_profile=solver_profile,
+            heuristic_only=heuristic_only,
+            rolling_window=rolling_window,
+            rolling_overlap=rolling_overlap,
+            rolling_window_time_limit=rolling_window_time_limit,
+            time_budget=time_budget,
+            work_budget=work_budget,
         )
     )
 
+    tasks, constraints = await mongodb_service.count_scenario_entities(uuid_scenario)
+
     # then I send the signal to the workers
-    rabbitmq_service.publish_execution_trigger(data={
+    await rabbitmq_publisher_service.publish_execution_trigger(size=tasks + constraints, priority=priority, data={
+        "uuid_scenario": uuid_scenario,
+        "uuid_execution": execution_document.uuid,
+        "solver_profile": solver_profile,
+        "heuristic_only": heuristic_only,
+        "rolling_window": rolling_window,
+        "rolling_overlap": rolling_overlap,
+        "rolling_window_time_limit": rolling_window_time_limit,
+        "time_budget": time_budget,
+        "work_budget": work_budget,
+    })
+
+    return execution_document
+
+@app.delete('/scenario/{uuid_scenario}/execution/{uuid}')
+async def cancel_execution(
+        uuid_scenario: str,
+        uuid: str,
+) -> ExecutionDocument:
+    """
+    Cancels an execution: a queued one is skipped, a running one stops its search
+    and keeps the best plan found so far
+    """
+    found = await mongodb_service.get_scenario_execution_document(
+        uuid_scenario=uuid_scenario,
+        uuid=uuid,
+    )
+
+    if not found:
+        raise HTTPException(status_code=404, detail='execution not found')
+
+    # the status (or the error) is only set once the solve is over
+    if found.status != WorkerTaskOutputStatus.UNKNOWN or found.cancelled or found.error is not None:
+        raise HTTPException(status_code=409, detail='execution already finished')
+
+    execution_document = await mongodb_service.update_scenario_execution_document(
+        uuid_scenario=uuid_scenario,
+        uuid=uuid,
+        values={"cancel_requested": True}
+    )
+    # the api returns the execution with its scenario
+    await execution_document.fetch_all_links()
+
+    await rabbitmq_publisher_service.publish_execution_control(data={
+        "action": "cancel",
         "uuid_scenario": uuid_scenario,
-        "uuid_execution": execution_document.uuid
+        "uuid_execution": uuid,
     })
 
     return execution_document
@@ -87,6 +87,15 @@ class RabbitmqConnectionConfig(BaseModel):
     username: str
     password: str
 
+class RabbitmqSizeClassConfig(BaseModel):
+    name: str
+    max_size: Optional[int] = None # tasks plus constraints, None for the last class
+
+class RabbitmqConsumerConfig(BaseModel):
+    size_class: str
+    prefetch: int = 1 # messages each consumer holds at once
+    concurrency: int = 1 # consumers of the class in this runner
+
 class RabbitmqConfig(YamlBaseSettings):
     """
     rabbitmq service config
@@ -99,6 +108,33 @@ class RabbitmqConfig(YamlBaseSettings):
 
     connection: RabbitmqConnectionConfig
 
+    # region routing
+
+    size_classes: List[RabbitmqSizeClassConfig] = Field(default=[
+        RabbitmqSizeClassConfig(name='small', max_size=1000),
+        RabbitmqSizeClassConfig(name='medium', max_size=20000),
+        RabbitmqSizeClassConfig(name='large'),
+    ]) # by increasing max_size, each class has its own trigger queue
+    max_priority: int = Field(default=9) # the smaller scenarios of a class get the higher priorities
+    consumers: List[RabbitmqConsumerConfig] = Field(default=[
+        RabbitmqConsumerConfig(size_class='small'),
+        RabbitmqConsumerConfig(size_class='medium'),
+        RabbitmqConsumerConfig(size_class='large'),
+    ]) # the classes consumed by the runner
+    consumer_mode: Literal['event_loop', 'threads'] = Field(default='event_loop') # event_loop keeps one asyncio loop and connection for the whole runner
+    reconnect_delay: float = Field(default=5.0) # seconds before the event_loop and control consumers reconnect to a lost broker
+
+    # endregion routing
+
+    # region publisher
+
+    publisher_channels: int = Field(default=4) # confirm channels of the async publisher used by the api
+    publisher_batch_size: int = Field(default=100) # queued messages written at once
+    publisher_confirm_timeout: float = Field(default=10.0) # seconds
+    publisher_retries: int = Field(default=1) # publishes again a message lost with its connection or channel
+
+    # endregion publisher
+
 class MongodbConnectionConfig(BaseModel):
     host: str
     port: str | int
@@ -117,6 +153,7 @@ class MongodbConfig(YamlBaseSettings):
     )
 
     connection: MongodbConnectionConfig
+    bulk_chunk_size: int = Field(default=1000) # documents per insert_many of the bulk endpoints
 
 class ApiConfig(YamlBaseSettings):
     model_config = SettingsConfigDict(
@@ -127,4 +164,88 @@ class ApiConfig(YamlBaseSettings):
 
     host: str
     port: str|int
-    log_level: str
\ No newline at end of file
+    log_level: str
+
+class MetricsConfig(YamlBaseSettings):
+    """
+    the Prometheus metrics, /metrics on the api and a sidecar listener on the runners
+    """
+    model_config = SettingsConfigDict(
+        yaml_file="configs/metrics.yaml",
+        env_prefix="METRICS_",
+        case_sensitive=False
+    )
+
+    enabled: bool = Field(default=True)
+    runner_host: str = Field(default='0.0.0.0')
+    runner_port: int = Field(default=9100) # 0 picks a free port
+
+class WorkerConfig(YamlBaseSettings):
+    """
+    worker service config, tunes the way the solves are executed
+    """
+    model_config = SettingsConfigDict(
+        yaml_file="configs/worker.yaml",
+        env_prefix="WORKER_",
+        case_sensitive=False
+    )
+
+    # region pool
+
+    pool_size: Optional[int] = Field(default=None) # processes used by the pooled solves, defaults to the container cpu quota
+    pool_max_tasks_per_child: Optional[int] = Field(default=None) # recycles a child process after this many solves
+    pool_start_method: Literal['spawn', 'forkserver'] = Field(default='forkserver')
+    pool_preload_modules: List[str] = Field(default=['ortools.sat.python.cp_model']) # imported once before the children are forked
+    pool_preload_module_types: bool = Field(default=True) # the children also load the module types of the module paths
+    pool_executions: bool = Field(default=False) # run_execution solves in the pool processes instead of a thread of the runner
+
+    # endregion pool
+
+    # region preprocessing
+
+    horizon_estimator: Literal['sum', 'list_schedule'] = Field(default='list_schedule')
+    tighten_domains: bool = Field(default=True) # creates the task variables within their precedence time windows
+    heuristic_presolve: bool = Field(default=True) # hints CpSat and bounds the horizon with the dispatching rules plan
+    heuristic_rules: List[Literal['spt', 'lpt', 'mwkr']] = Field(default=['mwkr', 'spt', 'lpt'])
+
+    # endregion preprocessing
+
+    # region cache
+
+    model_cache_size: int = Field(default=32) # built models kept in memory, 0 disables the memory tier
+    model_cache_dir: Optional[str] = Field(default=None) # where built models are stored on disk, None disables the disk tier
+    model_cache_disk_entries: int = Field(default=1024)
+
+    # endregion cache
+
+    # region incremental
+
+    incremental_models: int = Field(default=4) # scenarios whose last built model is kept and patched on change, 0 disables
+    incremental_max_delta: float = Field(default=0.2) # above this share of changed entities (over the tasks) the model is rebuilt
+
+    # endregion incremental
+
+    # region decomposition
+
+    decomposition: bool = Field(default=True) # solves the independent parts of a scenario (no shared resource nor constraint) separately
+
+    # endregion decomposition
+
+    # region rolling horizon
+
+    rolling_window_time_limit: Optional[float] = Field(default=10.0) # seconds per window, when the execution doesn't set it
+
+    # endregion rolling horizon
+
+    # region streaming
+
+    incumbent_min_interval: float = Field(default=1.0) # seconds between two streamed improving solutions
+
+    # endregion streaming
+
+    # region execution
+
+    execution_solver: str = Field(default='profiled_solver') # the solver type the runner solves the executions with
+    execution_target: str = Field(default='min_time') # the target type the runner solves the executions for
+
+    # endregion execution
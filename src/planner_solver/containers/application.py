@@ -3,9 +3,12 @@ import sys
 
 from dependency_injector import containers, providers
 from planner_solver.config.models import TimeConfig, ModuleConfig, MongodbConfig, RabbitmqConfig, LoggingConfig, \
-    ApiConfig
+    ApiConfig, WorkerConfig, MetricsConfig
+from planner_solver.services.metrics_service import MetricsService
+from planner_solver.services.model_cache_service import ModelCacheService
 from planner_solver.services.module_loader_service import ModuleLoaderService
 from planner_solver.services.mongodb_service import MongodbService
+from planner_solver.services.rabbitmq_publisher_service import RabbitmqPublisherService
 from planner_solver.services.rabbitmq_service import RabbitmqService
 from planner_solver.services.time_service import TimeService
 from planner_solver.containers.singletons import types_service
@@ -32,6 +35,8 @@ class ApplicationContainer(containers.DeclarativeContainer):
     mongodb_config = providers.Singleton(MongodbConfig)
     rabbitmq_config = providers.Singleton(RabbitmqConfig)
     api_config = providers.Singleton(ApiConfig)
+    worker_config = providers.Singleton(WorkerConfig)
+    metrics_config = providers.Singleton(MetricsConfig)
 
     # endregion config
 
@@ -51,21 +56,44 @@ class ApplicationContainer(containers.DeclarativeContainer):
         config=time_config,
     )
 
+    metrics_service = providers.Singleton(
+        MetricsService,
+        config=metrics_config,
+    )
+
     mongodb_service = providers.Singleton(
         MongodbService,
         config=mongodb_config,
         types_service=types_service,
+        metrics_service=metrics_service,
     )
 
     rabbitmq_service = providers.Singleton(
         RabbitmqService,
         config=rabbitmq_config,
+        metrics_service=metrics_service,
+    )
+
+    rabbitmq_publisher_service = providers.Singleton(
+        RabbitmqPublisherService,
+        config=rabbitmq_config,
+        rabbitmq_service=rabbitmq_service,
+        metrics_service=metrics_service,
+    )
+
+    model_cache_service = providers.Singleton(
+        ModelCacheService,
+        config=worker_config,
     )
 
     worker_service = providers.Singleton(
         WorkerService,
         mongodb_service=mongodb_service,
         rabbitmq_service=rabbitmq_service,
+        config=worker_config,
+        model_cache_service=model_cache_service,
+        metrics_service=metrics_service,
+        module_config=module_config,
     )
 
     module_loader_service = providers.Singleton(
@@ -7,7 +7,6 @@ from planner_solver.decorators.parameters import Parameter
 class ConstraintType:
     """
     Decorates a class as a constraint
-    todo define whether or not such class is a task or scenario constraint
     """
     def __init__(
             self,
@@ -21,6 +20,7 @@ class ConstraintType:
     def __call__(self, cls: Type):
         setattr(cls, '__ps_type_name', self.type_name)
         setattr(cls, '__ps_type_type', 'constraint')
+        setattr(cls, '__ps_attachable_to', tuple(self.attachable_to))
 
         types_service.register_constraint_type(cls, self.type_name)
 
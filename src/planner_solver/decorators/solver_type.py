@@ -1,6 +1,7 @@
 from typing import Type
 
 from planner_solver.containers.singletons import types_service
+from planner_solver.decorators.parameters import Parameter
 
 class SolverType:
     """
@@ -18,3 +19,5 @@ class SolverType:
 
         return cls
 
+class SolverParameter(Parameter):
+    pass
@@ -6,5 +6,9 @@ class WorkerStatusException(Exception):
         self.__worker_status = worker_status
         self.__message = message if message is not None else ''
 
+    @property
+    def worker_status(self) -> int:
+        return self.__worker_status
+
     def __str__(self):
         return f"Worker failed with status {str(self.__worker_status)}: {self.__message}"
\ No newline at end of file
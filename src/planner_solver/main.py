@@ -1,11 +1,16 @@
+import asyncio
 import subprocess
 import json
 import logging
 
+import pika
+
 from planner_solver.containers.application import ApplicationContainer
+from planner_solver.containers.singletons import types_service
 from datetime import datetime
 
 from planner_solver.services.types_service import TypesService
+from planner_solver.services.execution_control_service import ExecutionBudget
 
 def run():
     container = ApplicationContainer()
@@ -26,6 +31,29 @@ def run():
 
     subprocess.run(cmd)
 
+def migrate_run():
+    """
+    brings the documents stored by older versions up to date, safe to run more than once
+    """
+    logger = logging.getLogger(__name__)
+    container = ApplicationContainer()
+    container.init_resources()
+
+    mongodb_service = container.mongodb_service()
+    rabbitmq_service = container.rabbitmq_service()
+
+    # the triggers queued before the size classes
+    rabbitmq_service.forward_legacy_triggers()
+
+    async def migrate():
+        updated = await mongodb_service.migrate_scenario_uuid()
+        logger.info(f"Migration done: {updated}")
+        failed = await mongodb_service.migrate_uuid_index()
+        if failed:
+            raise SystemExit(f"The unique uuid index is missing on {failed}, see the logged duplicates")
+
+    asyncio.run(migrate())
+
 def runner_run():
     logger = logging.getLogger(__name__)
     container = ApplicationContainer()
@@ -36,14 +64,19 @@ def runner_run():
     mongodb_service = container.mongodb_service()
     rabbitmq_service = container.rabbitmq_service()
     worker_service = container.worker_service()
+    metrics_service = container.metrics_service()
+    worker_config = container.worker_config()
 
     module_loader.load_all()
+    # the runner has no api, the metrics are served by a sidecar listener
+    metrics_service.start_server()
 
     logger.info(f"System time: {time_service.convert(datetime.now())}")
     logger.info(f"Loaded {len(module_loader.loaded_modules)} modules")
 
     async def process_execution_message(data):
         """Process execution trigger messages from RabbitMQ"""
+        metrics_service.executions_in_flight.inc()
         try:
             logger.info(f"Processing execution request: {data}")
 
@@ -54,23 +87,73 @@ def runner_run():
                 logger.error("Missing required fields: uuid_scenario or uuid_execution")
                 return
 
+            execution = await mongodb_service.get_scenario_execution_document(
+                uuid_scenario=uuid_scenario,
+                uuid=uuid_execution
+            )
+            if execution is not None and execution.cancel_requested:
+                logger.info(f"Execution {uuid_execution} cancelled before it started")
+                await mongodb_service.update_scenario_execution_document(
+                    uuid_scenario=uuid_scenario,
+                    uuid=uuid_execution,
+                    values={"cancelled": True}
+                )
+                return
+
+            budget = ExecutionBudget.from_message(data)
+
             logger.info(f"Starting execution {uuid_execution} for scenario {uuid_scenario}")
 
-            # TODO: Implement the actual execution logic here
+            scenario = await mongodb_service.load_scenario(uuid_scenario)
+            if scenario is None:
+                logger.error(f"Scenario {uuid_scenario} not found, execution {uuid_execution} not run")
+                await worker_service.store_execution_error(uuid_scenario, uuid_execution, 'scenario not found')
+                return
+            logger.info(f"Loaded scenario {uuid_scenario} with {len(scenario.get_tasks())} tasks")
 
-            # 1. Fetch scenario from MongoDB using scenario_uuid (async)
-            # 2. Create solver and target based on message parameters
-            # 3. Use worker_service to solve the scenario
-            # 4. Update execution status in MongoDB (async)
+            solver_profile = data.get('solver_profile')
+            solver = types_service.get(worker_config.execution_solver).model_validate(
+                {"profile": solver_profile} if solver_profile else {}
+            )
+            target = types_service.get(worker_config.execution_target).model_validate({})
 
-            logger.info(f"Execution {uuid_execution} completed successfully")
+            output = await worker_service.run_execution(
+                scenario, solver, target, uuid_execution, budget,
+                heuristic_only=bool(data.get('heuristic_only')),
+                rolling_window=data.get('rolling_window'),
+                rolling_overlap=data.get('rolling_overlap') or 0,
+                rolling_window_time_limit=data.get('rolling_window_time_limit'),
+            )
+
+            logger.info(f"Execution {uuid_execution} completed with status {output.status.name}")
 
         except Exception as e:
             logger.error(f"Error processing execution message: {e}")
             raise
+        finally:
+            metrics_service.executions_in_flight.dec()
+
+    def process_control_message(data):
+        """Process the execution control messages, on the control consumer thread"""
+        if data.get('action') == 'cancel' and data.get('uuid_execution'):
+            worker_service.cancel_execution(data['uuid_execution'])
+
+    rabbitmq_service.start_control_consumer(process_control_message)
+
+    # the triggers queued before the size classes, in case the migration was not run
+    try:
+        rabbitmq_service.forward_legacy_triggers()
+    except pika.exceptions.AMQPError as e:
+        logger.warning(f"Could not forward the legacy triggers: {e!r}")
 
-    logger.info("Starting RabbitMQ consumer for execution_trigger queue...")
+    logger.info("Starting RabbitMQ consumers for the execution_trigger queues...")
 
     # Start consuming messages with async support - this will block until interrupted
-    rabbitmq_service.start_consuming_async(process_execution_message)
+    try:
+        if container.rabbitmq_config().consumer_mode == 'event_loop':
+            rabbitmq_service.start_consuming_event_loop(process_execution_message)
+        else:
+            rabbitmq_service.start_consuming_async(process_execution_message)
+    finally:
+        worker_service.shutdown_pool()
 
@@ -1,11 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any, Set, Tuple
+from typing import ClassVar, List, Optional, Dict, Any, Set, Tuple
 from enum import Enum, IntEnum
 
 from ortools.sat.python.cp_model import CpModel, CpSolver, IntVar, IntervalVar
 from pydantic import BaseModel
 
-from planner_solver.exceptions.type_exceptions import TypeException
+from planner_solver.exceptions.type_exceptions import TypeException, ConstraintAttachTypeException
 from planner_solver.models.forms import BasePlannerSolverForm
 from planner_solver.models.stored_documents import BasePlannerSolverDocument
 
@@ -177,6 +177,19 @@ class Constraint(ABC, PlannerSolverBaseModel):
     in this file)
     """
 
+    task_uuid: str | None = None
+    """the task the constraint is attached to, None for the scenario-level ones"""
+
+    def check_attachment(self) -> None:
+        """
+        raises if the constraint is attached to something its type doesn't support,
+        see ConstraintType::attachable_to
+        """
+        attached_to = 'scenario' if self.task_uuid is None else 'task'
+        if attached_to not in getattr(self, '__ps_attachable_to', ('task', 'scenario')):
+            type_name = getattr(self, '__ps_type_name', type(self).__name__)
+            raise ConstraintAttachTypeException(f"{type_name} cannot be attached to a {attached_to}")
+
     @abstractmethod
     def attach_task_constraint(self, model: CpModel, task: "Task") -> None:
         pass
@@ -185,6 +198,16 @@ class Constraint(ABC, PlannerSolverBaseModel):
     def attach_scenario_constraint(self, model: CpModel) -> None:
         pass
 
+    def get_precedences(self, task: Optional["Task"] = None) -> Optional[List[Tuple["Task", "Task"]]]:
+        """
+        describes the constraint as a list of (before, after) task couples,
+        task is the owner for task-level constraints and None for scenario-level ones
+
+        returns None when the constraint cannot be described this way, so that
+        the preprocessing (e.g. the horizon estimation) falls back to safe values
+        """
+        return None
+
 class Resource(ABC, PlannerSolverBaseModel):
     """
     the resource identifies all the stuffs that are linked
@@ -207,6 +230,15 @@ class Resource(ABC, PlannerSolverBaseModel):
     def attach_scenario_resource(self, model: CpModel) -> None:
         pass
 
+    def is_exclusive(self) -> Optional[bool]:
+        """
+        True when the tasks attached to this resource can never overlap (e.g. a machine),
+        False when the resource doesn't restrict the timing of the tasks
+
+        returns None when unknown, so that the preprocessing falls back to safe values
+        """
+        return None
+
 class TaskStatus(Enum):
     """
     The status of a task
@@ -230,15 +262,57 @@ class Task(ABC, PlannerSolverBaseModel):
     by itself is not usable, as per every other type you need to
     provide a decorated type that can be manipulated
     """
+
+    resource_uuids: List[str] = []
+    """the resources the task runs on, attached to it when the scenario is loaded"""
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.__status = TaskStatus.CREATED
+        self.__time_window: Tuple[int, Optional[int]] = (0, None)
+        self.__release_date: int = 0
         self.cp_sat: None | CpSatTask = None
         self.result: None | ResultTask = None
 
     def get_task_status(self) -> TaskStatus:
         return self.__status
 
+    def get_time_window(self) -> Tuple[int, Optional[int]]:
+        """
+        the earliest start and the latest end (None if bounded only by the horizon)
+        the task variables should be created within
+        """
+        return self.__time_window
+
+    def update_time_window(self, earliest_start: int, latest_end: Optional[int]):
+        """
+        set by the worker preprocessing, right before generate_cp_sat
+        """
+        self.__time_window = (earliest_start, latest_end)
+
+    def get_release_date(self) -> int:
+        """
+        the task cannot start before this, honored by the preprocessing
+        and thus by the time window of the task
+        """
+        return self.__release_date
+
+    def update_release_date(self, release_date: int):
+        """
+        set by the caller of the worker, e.g. the boundary conditions of a rolling horizon window
+        """
+        self.__release_date = release_date
+
+    def get_fixed_interval(self) -> Optional[Tuple[int, int]]:
+        """
+        the (start, end) that external factors set on a FIXED task, None when the task
+        has to be planned (a FIXED task without a result is planned as well)
+        """
+        if self.__status != TaskStatus.FIXED or self.result is None \
+                or self.result.start is None or self.result.end is None:
+            return None
+        return self.result.start, self.result.end
+
     def update_task_status(self, task_status: TaskStatus):
         """
         Only the solver should set this to PLANNED
@@ -325,21 +399,52 @@ class Task(ABC, PlannerSolverBaseModel):
         """
         pass
 
+    def replace_resource(self, resource: Resource, canonical: Resource) -> None:
+        """
+        points the task to another instance of the same resource, used by the worker
+        to keep a single instance per resource.
+
+        override it if get_resources doesn't return the stored list
+        """
+        resources = self.get_resources()
+        for i, res in enumerate(resources):
+            if res is resource:
+                resources[i] = canonical
+
 class Target(ABC, PlannerSolverBaseModel):
     """
     the target function definition, that instructs the model
     on the min/maxes that it needs to set as target
     """
+    minimizes_makespan: ClassVar[bool] = False
+    """
+    set by the targets whose optimal plans end within any feasible makespan:
+    only for those the horizon can be cut to the makespan of a known plan
+    """
 
     @abstractmethod
     def attach_target(
             self,
             model: CpModel,
             horizon: int,
-            tasks: List[Task]
+            tasks: List[Task],
+            lower_bound: int = 0,
     ) -> None:
+        """
+        horizon is an upper bound of the makespan, lower_bound a proven lower bound of it
+        """
         pass
 
+    def combine_objectives(self, objectives: List[float]) -> Optional[float]:
+        """
+        the objective of the whole scenario, given the objectives of its independent
+        components solved separately (e.g. the max of the makespans)
+
+        returns None when the target cannot be split this way, so that the
+        scenario is always solved as a whole
+        """
+        return None
+
 class ScenarioStatus(IntEnum):
     """
     the current status of a scenario
@@ -409,6 +514,36 @@ class Scenario(ABC, PlannerSolverBaseModel):
     def add_resource(self, resource: Resource):
         pass
 
+    def create_subscenario(
+            self,
+            tasks: List[Task],
+            constraints: List[Constraint],
+            resources: List[Resource],
+    ) -> Optional["Scenario"]:
+        """
+        a scenario of the same type and parameters holding only part of the entities,
+        used by the worker to solve the independent parts of a scenario separately.
+
+        override it if the scenario holds more than tasks, constraints and resources,
+        or return None if it cannot be split
+        """
+        from planner_solver.decorators.parameters import Parameter
+
+        subscenario = type(self)()
+        subscenario.label = self.label
+        for name, field in type(self).model_fields.items():
+            if isinstance(field.default, Parameter):
+                setattr(subscenario, name, getattr(self, name))
+
+        for task in tasks:
+            subscenario.add_task(task)
+        for constraint in constraints:
+            subscenario.add_constraint(constraint)
+        for resource in resources:
+            subscenario.add_resource(resource)
+
+        return subscenario
+
 class Solver(ABC, PlannerSolverBaseModel):
     """
     The solvers are a set of extra settings around the
@@ -419,4 +554,11 @@ class Solver(ABC, PlannerSolverBaseModel):
 
     @abstractmethod
     def generate_solver(self, model: CpModel) -> CpSolver:
-        pass
\ No newline at end of file
+        pass
+
+    def get_profile(self) -> Optional[str]:
+        """
+        the name of the parameter set used by this solver, stored alongside the
+        execution to compare the different settings
+        """
+        return None
\ No newline at end of file
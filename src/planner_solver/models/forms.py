@@ -1,4 +1,4 @@
-from typing import TypeVar, Any, Dict, Optional, Generic
+from typing import TypeVar, Any, Dict, Optional, Generic, List, Literal
 
 from pydantic import BaseModel
 
@@ -28,3 +28,29 @@ class BasePlannerSolverForm(BaseModel, Generic[T]):
         model_type: BaseModel = types_service.get(self.type)
 
         return model_type.model_validate(self.data)
+
+class BulkCreateForm(BaseModel):
+    """
+    the entities to create at once in a scenario, stored in this order:
+    an item can link the ones before it by their uuid
+    """
+    resources: List[BasePlannerSolverForm] = []
+    tasks: List[BasePlannerSolverForm] = []
+    constraints: List[BasePlannerSolverForm] = []
+
+class BulkItemResult(BaseModel):
+    """
+    the outcome of a single item of a bulk create
+    """
+    kind: Literal['task', 'resource', 'constraint']
+    index: int
+    """the position of the item in its list"""
+    uuid: Optional[str] = None
+    """set when the item was stored"""
+    error: Optional[str] = None
+    """set when the item was not stored"""
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    failed: int
+    items: List[BulkItemResult]
@@ -5,10 +5,11 @@ from datetime import datetime
 from typing import Optional, Any, Dict, List, Type, TYPE_CHECKING
 
 import pymongo
+from pymongo import IndexModel
 from beanie import Document, Link, before_event, Replace, Insert, PydanticObjectId
 from uuid import uuid4
 
-from pydantic import Field
+from pydantic import Field, BaseModel
 
 from planner_solver.containers.singletons import types_service
 from planner_solver.exceptions.type_exceptions import TypeException
@@ -45,7 +46,46 @@ class BasePlannerSolverDocument(Document, ABC):
     is_deleted: bool = Field(default=False)
     """Beware! soft delete is not implemented as of 20250907"""
 
-class TaskDocument(BasePlannerSolverDocument):
+UUID_UNIQUE_INDEX = IndexModel([("uuid", pymongo.ASCENDING)], name="uuid_unique", unique=True)
+"""
+built by planner-solver-migrate and not at startup: the documents stored
+by older versions may miss their uuid or hold duplicated ones
+"""
+
+def entity_indexes(*text_fields: str, scoped: bool = True) -> List[Any]:
+    """
+    the text index used by the search, plus the ascending ones used by the
+    equality lookups of the documents of a scenario (the uuid one is UUID_UNIQUE_INDEX)
+    """
+    indexes: List[Any] = [
+        [(field, pymongo.TEXT) for field in text_fields],
+    ]
+    if scoped:
+        indexes += [
+            IndexModel([("scenario_uuid", pymongo.ASCENDING), ("uuid", pymongo.ASCENDING)], name="scenario_uuid_uuid"),
+            IndexModel(
+                [("scenario_uuid", pymongo.ASCENDING), ("is_deleted", pymongo.ASCENDING)],
+                name="scenario_uuid_is_deleted"
+            ),
+        ]
+    return indexes
+
+class ScenarioScopedDocument(BasePlannerSolverDocument, ABC):
+    """
+    a document that belongs to a scenario. The uuid of the scenario is stored next to
+    the link, so that the scoped lookups are plain indexed equality filters
+    instead of a $lookup of the scenario
+    """
+    scenario: Optional[Link[ScenarioDocument]] = None
+    scenario_uuid: Optional[str] = None
+    """copy of scenario.uuid, written on insert"""
+
+    @before_event(Replace, Insert)
+    def update_scenario_uuid(self):
+        if isinstance(self.scenario, ScenarioDocument):
+            self.scenario_uuid = self.scenario.uuid
+
+class TaskDocument(ScenarioScopedDocument):
     """
     the saved task entity, used only to store and retrieve task data
     never used directly in the software
@@ -53,8 +93,6 @@ class TaskDocument(BasePlannerSolverDocument):
     label: str
     data: Dict[str, Any] = {}
 
-    scenario: Optional[Link[ScenarioDocument]] = None
-
     @staticmethod
     def from_base_model(base_model: Task) -> "TaskDocument":
         if not hasattr(base_model, 'label'):
@@ -76,14 +114,9 @@ class TaskDocument(BasePlannerSolverDocument):
 
     class Settings:
         name = "ps_tasks"
-        indexes = [
-            [
-                ("uuid", pymongo.TEXT),
-                ("label", pymongo.TEXT)
-            ]
-        ]
+        indexes = entity_indexes("uuid", "label")
 
-class ConstraintDocument(BasePlannerSolverDocument):
+class ConstraintDocument(ScenarioScopedDocument):
     """
     the saved constraint entity, used only to store and retrieve task data
     never used directly in the software
@@ -91,8 +124,6 @@ class ConstraintDocument(BasePlannerSolverDocument):
     label: str
     data: Dict[str, Any] = {}
 
-    scenario: Optional[Link[ScenarioDocument]] = None
-
     @staticmethod
     def from_base_model(base_model: Constraint) -> "ConstraintDocument":
         if not hasattr(base_model, 'label'):
@@ -114,14 +145,9 @@ class ConstraintDocument(BasePlannerSolverDocument):
 
     class Settings:
         name = "ps_constraints"
-        indexes = [
-            [
-                ("uuid", pymongo.TEXT),
-                ("label", pymongo.TEXT)
-            ]
-        ]
+        indexes = entity_indexes("uuid", "label")
 
-class ResourceDocument(BasePlannerSolverDocument):
+class ResourceDocument(ScenarioScopedDocument):
     """
     the saved resource entity, used only to store and retrieve task data
     never used directly in the software
@@ -129,8 +155,6 @@ class ResourceDocument(BasePlannerSolverDocument):
     label: str
     data: Dict[str, Any] = {}
 
-    scenario: Optional[Link[ScenarioDocument]] = None
-
     @staticmethod
     def from_base_model(base_model: Resource) -> "ResourceDocument":
         if not hasattr(base_model, 'label'):
@@ -152,12 +176,7 @@ class ResourceDocument(BasePlannerSolverDocument):
 
     class Settings:
         name = "ps_resources"
-        indexes = [
-            [
-                ("uuid", pymongo.TEXT),
-                ("label", pymongo.TEXT)
-            ]
-        ]
+        indexes = entity_indexes("uuid", "label")
 
 class ScenarioDocument(BasePlannerSolverDocument):
     """
@@ -190,28 +209,129 @@ class ScenarioDocument(BasePlannerSolverDocument):
 
     class Settings:
         name = "ps_scenarios"
-        indexes = [
-            [
-                ("uuid", pymongo.TEXT),
-                ("label", pymongo.TEXT)
-            ]
-        ]
+        indexes = entity_indexes("uuid", "label", scoped=False)
 
-class ExecutionDocument(BasePlannerSolverDocument):
+class IncumbentSolution(BaseModel):
     """
-    keeps track of the execution of a planning scenario
+    an improving solution found while the solver is still running
+    """
+    objective: float
+    bound: float
+    wall_time: float
+    """seconds since the solve started"""
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class ExecutionBuildStats(BaseModel):
+    """
+    how the model of an execution was obtained, and its size
+    """
+    source: str
+    """built, cache (a cached model was loaded) or patched (the retained model was patched)"""
+    phases: Dict[str, float] = {}
+    """seconds spent in each phase of prepare_worker, in order"""
+    variables: int = 0
+    constraints: int = 0
+    intervals: int = 0
+
+    @staticmethod
+    def combine(stats: List["ExecutionBuildStats"]) -> "ExecutionBuildStats":
+        """
+        the total of the models built for the parts of a scenario
+        """
+        phases: Dict[str, float] = {}
+        for single in stats:
+            for phase, seconds in single.phases.items():
+                phases[phase] = phases.get(phase, 0.0) + seconds
+        return ExecutionBuildStats(
+            source='+'.join(sorted({single.source for single in stats})),
+            phases=phases,
+            variables=sum(single.variables for single in stats),
+            constraints=sum(single.constraints for single in stats),
+            intervals=sum(single.intervals for single in stats),
+        )
+
+class ExecutionSolveStats(BaseModel):
+    """
+    the statistics of the CpSat response
     """
-    scenario: Link[ScenarioDocument] | None = None
+    wall_time: float = 0.0
+    user_time: float = 0.0
+    deterministic_time: float = 0.0
+    branches: int = 0
+    conflicts: int = 0
+    objective: Optional[float] = None
+    bound: Optional[float] = None
 
+    @staticmethod
+    def combine(stats: List["ExecutionSolveStats"]) -> "ExecutionSolveStats":
+        """
+        the total work of the solves of the parts of a scenario
+        """
+        return ExecutionSolveStats(
+            wall_time=sum(single.wall_time for single in stats),
+            user_time=sum(single.user_time for single in stats),
+            deterministic_time=sum(single.deterministic_time for single in stats),
+            branches=sum(single.branches for single in stats),
+            conflicts=sum(single.conflicts for single in stats),
+        )
+
+class ExecutionTaskResult(BaseModel):
+    """
+    the planned start and end of a single task
+    """
+    start: int
+    end: int
+
+class ExecutionDocument(ScenarioScopedDocument):
+    """
+    keeps track of the execution of a planning scenario
+    """
     status: WorkerTaskOutputStatus = WorkerTaskOutputStatus.UNKNOWN
 
+    heuristic_only: bool = False
+    """when set, the plan comes from the dispatching rules scheduler only, without CpSat"""
+
+    solver_profile: Optional[str] = None
+    """the named solver profile used, to compare throughput and quality across profiles"""
+
+    rolling_window: Optional[int] = None
+    """when set, the scenario is solved in rolling horizon windows of this many tasks"""
+    rolling_overlap: int = 0
+    """the tasks each rolling window shares with the next one"""
+    rolling_window_time_limit: Optional[float] = None
+    """seconds per rolling window, the worker default when unset"""
+    time_budget: Optional[float] = None
+    """wall seconds the solve may take"""
+    work_budget: Optional[float] = None
+    """CpSat deterministic time the solve may take, gives the same stop point on any machine"""
+    cancel_requested: bool = False
+    """set by the cancel endpoint, the runner skips the execution if it didn't start yet"""
+    cancelled: bool = False
+    """the search was stopped by a cancel, the plan (if any) is the best found so far"""
+    error: Optional[str] = None
+    """why the execution produced no plan, set by the runner"""
+    solver_parameters: Dict[str, Any] = {}
+    """the CpSat parameters actually used by the solver"""
+    objective: Optional[float] = None
+    """the objective value of the final plan"""
+    build_stats: Optional[ExecutionBuildStats] = None
+    """per phase timings and size of the model"""
+    solve_stats: Optional[ExecutionSolveStats] = None
+
+    incumbents: List[IncumbentSolution] = []
+    """the (throttled) improving solutions streamed during the solve"""
+    task_results: Dict[str, ExecutionTaskResult] = {}
+    """the final plan, by task unique id. Used to warm start the next executions"""
+
     def to_base_model(self) -> PlannerSolverBaseModel:
         raise Exception("There is no base model linked to an execution")
 
     class Settings:
         name = "ps_executions"
-        indexes = [
-            [
-                ("uuid", pymongo.TEXT)
-            ]
+        indexes = entity_indexes("uuid") + [
+            # the last successful execution, read by the warm start
+            IndexModel(
+                [("scenario_uuid", pymongo.ASCENDING), ("status", pymongo.ASCENDING), ("updated_at", pymongo.DESCENDING)],
+                name="scenario_uuid_status_updated_at"
+            ),
         ]
\ No newline at end of file
@@ -0,0 +1,60 @@
+import logging
+import math
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CFS_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CFS_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """
+    returns the cpu quota of the container (quota / period), or None
+    when no limit is set. Both cgroup v2 and v1 are supported
+    """
+    cpu_max = _read_file(CGROUP_V2_CPU_MAX)
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(' ')
+        if quota == 'max' or not period:
+            return None
+        return int(quota) / int(period)
+
+    quota = _read_file(CGROUP_V1_CFS_QUOTA)
+    period = _read_file(CGROUP_V1_CFS_PERIOD)
+    if quota is not None and period is not None and int(quota) > 0:
+        return int(quota) / int(period)
+
+    return None
+
+def available_cpu_count() -> int:
+    """
+    the number of cpus this process can actually use
+
+    in a container os.cpu_count() returns the host cores, so the cgroup
+    quota and the scheduler affinity are considered first
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        count = len(os.sched_getaffinity(0))
+    else:
+        count = os.cpu_count() or 1
+
+    try:
+        quota = _cgroup_cpu_quota()
+    except ValueError as e:
+        logger.warning(f"Could not parse the cgroup cpu quota: {e}")
+        quota = None
+
+    if quota is not None:
+        count = min(count, math.ceil(quota))
+
+    return max(count, 1)
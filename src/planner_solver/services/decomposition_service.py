@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, TYPE_CHECKING
+
+import numpy as np
+
+from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.models.stored_documents import ExecutionBuildStats, ExecutionSolveStats
+from planner_solver.services.cpu_quota_service import available_cpu_count
+from planner_solver.services.worker_task_service import WorkerTaskInput, WorkerTaskOutput, ScenarioResult
+
+if TYPE_CHECKING:
+    from planner_solver.models.base_models import Scenario, Task, Constraint, Resource, Target
+    from planner_solver.services.worker_service import WorkerService
+
+logger = logging.getLogger(__name__)
+
+
+class ScenarioComponent:
+    """
+    a set of tasks that shares no resource and no constraint with the rest of the scenario,
+    alongside the scenario-level constraints and resources that only concern them
+    """
+    tasks: List[Task]
+    constraints: List[Constraint]
+    resources: List[Resource]
+
+    def __init__(self):
+        self.tasks = []
+        self.constraints = []
+        self.resources = []
+
+
+class DisjointSet:
+    """
+    union-find over the task unique ids
+    """
+
+    def __init__(self, keys: List[str]):
+        self.__parent: Dict[str, str] = {key: key for key in keys}
+
+    def find(self, key: str) -> str:
+        root = key
+        while self.__parent[root] != root:
+            root = self.__parent[root]
+        # path compression
+        while self.__parent[key] != root:
+            self.__parent[key], key = root, self.__parent[key]
+        return root
+
+    def union(self, a: str, b: str) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.__parent[root_b] = root_a
+
+
+def find_components(
+        scenario: Scenario,
+        tasks: List[Task],
+) -> Optional[List[ScenarioComponent]]:
+    """
+    splits the scenario in its connected components: two tasks are connected when they share
+    a resource or a constraint links them.
+
+    returns None when some constraint cannot be described as precedences, as its
+    tasks (and so the components) are unknown
+    """
+    from planner_solver.models.base_models import Task
+
+    task_ids = {task.get_unique_id() for task in tasks}
+    components = DisjointSet(list(task_ids))
+
+    def link(constraint: Constraint, owner: Optional[Task]) -> Optional[List[str]]:
+        """
+        joins the tasks of the constraint, returning their ids
+        """
+        precedences = constraint.get_precedences(owner)
+        if precedences is None:
+            return None
+
+        linked = [owner.get_unique_id()] if owner is not None else []
+        for before, after in precedences:
+            for task in (before, after):
+                if not isinstance(task, Task) or task.get_unique_id() not in task_ids:
+                    return None
+                linked.append(task.get_unique_id())
+
+        for unique_id in linked[1:]:
+            components.union(linked[0], unique_id)
+        return linked
+
+    resource_tasks: Dict[int, List[str]] = {}
+    for task in tasks:
+        for constraint in task.get_constraints() or []:
+            if link(constraint, task) is None:
+                logger.debug("Scenario not decomposable, unknown task constraint")
+                return None
+
+        for resource in task.get_resources() or []:
+            resource_tasks.setdefault(id(resource), []).append(task.get_unique_id())
+
+    for linked in resource_tasks.values():
+        for unique_id in linked[1:]:
+            components.union(linked[0], unique_id)
+
+    scenario_constraints = []
+    for constraint in scenario.get_constraints() or []:
+        linked = link(constraint, None)
+        if linked is None:
+            logger.debug("Scenario not decomposable, unknown scenario constraint")
+            return None
+        scenario_constraints.append((constraint, linked))
+
+    # the components, in the order of their first task
+    by_root: Dict[str, ScenarioComponent] = {}
+    for task in tasks:
+        root = components.find(task.get_unique_id())
+        if root not in by_root:
+            by_root[root] = ScenarioComponent()
+        by_root[root].tasks.append(task)
+
+    result = list(by_root.values())
+    if not result:
+        return result
+
+    for constraint, linked in scenario_constraints:
+        # a constraint without tasks is kept once
+        root = components.find(linked[0]) if linked else components.find(result[0].tasks[0].get_unique_id())
+        by_root[root].constraints.append(constraint)
+
+    for resource in scenario.get_resources() or []:
+        linked = resource_tasks.get(id(resource))
+        # an unused resource is kept once
+        root = components.find(linked[0]) if linked else components.find(result[0].tasks[0].get_unique_id())
+        by_root[root].resources.append(resource)
+
+    return result
+
+
+def combine_statuses(statuses: List[WorkerTaskOutputStatus]) -> WorkerTaskOutputStatus:
+    """
+    the whole scenario is as good as its worst component
+    """
+    order = [
+        WorkerTaskOutputStatus.MODEL_INVALID,
+        WorkerTaskOutputStatus.INFEASIBLE,
+        WorkerTaskOutputStatus.UNKNOWN,
+        WorkerTaskOutputStatus.FEASIBLE,
+        WorkerTaskOutputStatus.OPTIMAL,
+    ]
+    return min(statuses, key=order.index)
+
+
+def decompose(
+        worker: WorkerService,
+        scenario: Scenario,
+        target: Target,
+) -> Optional[List[Scenario]]:
+    """
+    the independent components of the scenario (tasks sharing no resource
+    nor constraint) as subscenarios, None when the scenario, its constraints
+    or the target cannot be split, or when there is a single component
+    """
+    # the target is probed with no objective, None means it cannot be combined
+    if target.combine_objectives([]) is None:
+        return None
+
+    # a single instance per resource, so that the shared ones are found
+    worker.fetch_resources(scenario)
+    components = find_components(scenario, worker.fetch_tasks(scenario))
+    if components is None or len(components) < 2:
+        return None
+
+    subscenarios = [
+        scenario.create_subscenario(component.tasks, component.constraints, component.resources)
+        for component in components
+    ]
+    if any(subscenario is None for subscenario in subscenarios):
+        return None
+
+    logger.debug(f"Scenario decomposed in {len(subscenarios)} components")
+    return subscenarios
+
+
+def split_search_workers(worker_inputs: List[WorkerTaskInput]) -> int:
+    """
+    the search workers are split between the components solved at the same time,
+    returns how many there are in total
+    """
+    available = worker_inputs[0].solver.parameters.num_workers or available_cpu_count()
+    for worker_input in worker_inputs:
+        worker_input.solver.parameters.num_workers = max(1, available // len(worker_inputs))
+    return available
+
+
+def solve_components(
+        worker: WorkerService,
+        scenario: Scenario,
+        target: Target,
+        worker_inputs: List[WorkerTaskInput],
+        allow_unsolved: bool = False,
+) -> WorkerTaskOutput:
+    """
+    solves the components at the same time and merges their outputs on the scenario,
+    with allow_unsolved a component without a plan leaves the whole scenario without one
+    """
+    available = split_search_workers(worker_inputs)
+
+    with ThreadPoolExecutor(max_workers=min(len(worker_inputs), available)) as executor:
+        # the solve releases the GIL
+        outputs = list(executor.map(
+            lambda worker_input: worker.solve_synchronously(worker_input, allow_unsolved), worker_inputs
+        ))
+
+    return merge_components(worker, scenario, target, worker_inputs, outputs)
+
+
+def merge_components(
+        worker: WorkerService,
+        scenario: Scenario,
+        target: Target,
+        worker_inputs: List[WorkerTaskInput],
+        outputs: List[WorkerTaskOutput],
+) -> WorkerTaskOutput:
+    """
+    the output of the whole scenario, with the plans of its components
+    """
+    status = combine_statuses([output.status for output in outputs])
+    build_stats = ExecutionBuildStats.combine([output.build_stats for output in outputs])
+    solve_stats = ExecutionSolveStats.combine([output.solve_stats for output in outputs])
+
+    if any(output.result is None for output in outputs):
+        return WorkerTaskOutput(
+            wrapped_solver=None,
+            scenario=scenario,
+            status=status,
+            solver_profile=worker_inputs[0].solver_profile,
+            solver_parameters=outputs[0].solver_parameters,
+            build_stats=build_stats,
+            solve_stats=solve_stats
+        )
+
+    result = ScenarioResult(
+        task_ids=[unique_id for output in outputs for unique_id in output.result.task_ids],
+        starts=np.concatenate([output.result.starts for output in outputs]),
+        ends=np.concatenate([output.result.ends for output in outputs]),
+    )
+    worker.assign_scenario_values(scenario, result, status)
+
+    return WorkerTaskOutput(
+        wrapped_solver=None,
+        scenario=scenario,
+        result=result,
+        status=status,
+        solver_profile=worker_inputs[0].solver_profile,
+        solver_parameters=outputs[0].solver_parameters,
+        objective=target.combine_objectives([output.objective for output in outputs]),
+        build_stats=build_stats,
+        solve_stats=solve_stats
+    )
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from typing import Dict, Optional, Any
+
+from ortools.sat.python.cp_model import CpSolver
+
+
+CANCEL_POLL_INTERVAL = 0.1
+"""seconds, a cancel reaching the solver before its search started is sent again at this pace"""
+RECENT_CANCELS = 256
+"""cancels kept for the executions not running yet on this worker"""
+
+class ExecutionBudget:
+    """
+    the limits of a single execution, carried in its trigger message.
+    The deterministic work budget gives the same stop point on any machine
+    """
+    time_budget: Optional[float]
+    """wall seconds"""
+    work_budget: Optional[float]
+    """CpSat deterministic time"""
+
+    def __init__(self, time_budget: Optional[float] = None, work_budget: Optional[float] = None):
+        self.time_budget = time_budget
+        self.work_budget = work_budget
+
+    @staticmethod
+    def from_message(data: Dict[str, Any]) -> "ExecutionBudget":
+        return ExecutionBudget(time_budget=data.get('time_budget'), work_budget=data.get('work_budget'))
+
+    def apply(self, solver: CpSolver) -> None:
+        """
+        tightens the solver limits, the ones of the solver profile are kept when lower
+        """
+        parameters = solver.parameters
+        if self.time_budget is not None:
+            parameters.max_time_in_seconds = min(parameters.max_time_in_seconds, self.time_budget)
+        if self.work_budget is not None:
+            parameters.max_deterministic_time = min(parameters.max_deterministic_time, self.work_budget)
+
+class ExecutionControl:
+    """
+    a running execution, as seen by the cancels coming from the control queue
+    """
+
+    def __init__(self, *solvers: CpSolver, remote_cancelled: Optional[Any] = None):
+        self.solvers = list(solvers)
+        """one per model of the execution, e.g. per component of a decomposed scenario"""
+        self.remote_cancelled = remote_cancelled
+        """the event shared with the pool processes solving the execution, they stop their own search"""
+        self.cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        if self.remote_cancelled is not None:
+            self.remote_cancelled.set()
+        # a no-op until the search has started, see watch
+        self._stop_searches()
+
+    def attach(self, solver: CpSolver) -> None:
+        """
+        adds the solver of a model built while the execution runs, e.g. of a rolling window
+        """
+        self.solvers.append(solver)
+        if self.cancelled.is_set():
+            solver.stop_search()
+
+    def _stop_searches(self) -> None:
+        for solver in self.solvers:
+            solver.stop_search()
+
+    async def watch(self, solve: asyncio.Future) -> None:
+        """
+        stops the search again until the solve ends, for the cancels that
+        arrived while the search was starting
+        """
+        while not solve.done():
+            if self.cancelled.is_set():
+                self._stop_searches()
+            await asyncio.sleep(CANCEL_POLL_INTERVAL)
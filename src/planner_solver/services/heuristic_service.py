@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
+
+from planner_solver.services.horizon_service import SchedulingGraph, ListSchedule, PRIORITY_RULES
+
+if TYPE_CHECKING:
+    from planner_solver.models.base_models import Scenario, Task
+
+logger = logging.getLogger(__name__)
+
+
+class HeuristicScheduler:
+    """
+    a fast pre-solver working directly on the scenario tasks, constraints and exclusive resources:
+    runs a greedy list schedule for each dispatching rule and keeps the shortest one.
+
+    The result is a feasible plan, used either to warm start CpSat or as a sub-second answer
+    """
+
+    def __init__(self, rules: Optional[List[str]] = None):
+        self.__rules = rules if rules else list(PRIORITY_RULES.keys())
+        for rule in self.__rules:
+            if rule not in PRIORITY_RULES:
+                raise ValueError(f"Unknown dispatching rule {rule}, available: {', '.join(PRIORITY_RULES.keys())}")
+
+    def schedule(
+            self,
+            scenario: Scenario,
+            tasks: List[Task],
+            cancelled: Optional[threading.Event] = None
+    ) -> Optional[ListSchedule]:
+        """
+        returns the best schedule, or None when the scenario has constraints or resources
+        that the heuristic doesn't understand (its plan could then be infeasible).
+        Once cancelled is set the rules left are skipped, the best schedule so far is kept
+        """
+        graph = SchedulingGraph.from_scenario(scenario, tasks, strict=True)
+        if graph is None:
+            logger.debug("Scenario not describable as precedences, no heuristic schedule")
+            return None
+
+        order = graph.topological_order()
+        if order is None:
+            logger.warning("Precedence cycle found, no heuristic schedule")
+            return None
+
+        if not graph.fixed_tasks_lead():
+            logger.debug("Fixed tasks after tasks to plan, no heuristic schedule")
+            return None
+
+        best: Optional[ListSchedule] = None
+        for rule in self.__rules:
+            if cancelled is not None and cancelled.is_set():
+                logger.debug(f"Heuristic stopped by a cancel before the rule {rule}")
+                break
+            candidate = graph.list_schedule(order, rule)
+            logger.debug(f"Heuristic rule {rule} makespan {candidate.makespan}")
+            if best is None or candidate.makespan < best.makespan:
+                best = candidate
+
+        return best
+
+    @staticmethod
+    def to_values(schedule: ListSchedule) -> Dict[str, Tuple[int, int]]:
+        """
+        the schedule as (start, end) by task unique id, the same format used by the hints
+        """
+        return {uid: (start, schedule.ends[uid]) for uid, start in schedule.starts.items()}
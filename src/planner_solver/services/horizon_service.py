@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import heapq
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import List, Dict, Tuple, Optional, Hashable, Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from planner_solver.models.base_models import Scenario, Task
+
+logger = logging.getLogger(__name__)
+
+
+class HorizonEstimate:
+    """
+    the bounds of the makespan of a scenario
+    """
+    lower_bound: int
+    """no plan can end before this"""
+    upper_bound: int
+    """a plan ending within this is known to exist, used as the model horizon"""
+
+    def __init__(self, lower_bound: int, upper_bound: int):
+        self.lower_bound = lower_bound
+        self.upper_bound = upper_bound
+
+    def __repr__(self) -> str:
+        return f"HorizonEstimate(lower_bound={self.lower_bound}, upper_bound={self.upper_bound})"
+
+
+class ListSchedule:
+    """
+    a feasible plan for the precedences and exclusive resources of a SchedulingGraph
+    """
+    rule: str
+    starts: Dict[str, int]
+    ends: Dict[str, int]
+    makespan: int
+
+    def __init__(self, rule: str, starts: Dict[str, int], ends: Dict[str, int]):
+        self.rule = rule
+        self.starts = starts
+        self.ends = ends
+        self.makespan = max(ends.values(), default=0)
+
+
+PRIORITY_RULES: Dict[str, Callable[["SchedulingGraph", Dict[str, int], str], int]] = {
+    'spt': lambda graph, tails, uid: graph.max_durations[uid],
+    'lpt': lambda graph, tails, uid: -graph.max_durations[uid],
+    'mwkr': lambda graph, tails, uid: -tails[uid],
+}
+"""dispatching rules, the task with the lowest value is scheduled first:
+shortest processing time, longest processing time, most work remaining"""
+
+
+class SchedulingGraph:
+    """
+    the precedence graph of the tasks, alongside the exclusive resources they use.
+
+    Tasks are indexed by their unique id
+    """
+
+    def __init__(self, tasks: List[Task]):
+        self.tasks: Dict[str, Task] = {task.get_unique_id(): task for task in tasks}
+        self.durations: Dict[str, int] = {uid: task.get_duration() for uid, task in self.tasks.items()}
+        self.max_durations: Dict[str, int] = {uid: task.get_max_duration() for uid, task in self.tasks.items()}
+        self.releases: Dict[str, int] = {uid: task.get_release_date() for uid, task in self.tasks.items()}
+        self.fixed: Dict[str, Tuple[int, int]] = {}
+        """the (start, end) of the FIXED tasks, that never move"""
+        for uid, task in self.tasks.items():
+            fixed = task.get_fixed_interval()
+            if fixed is not None:
+                self.fixed[uid] = fixed
+                self.durations[uid] = self.max_durations[uid] = fixed[1] - fixed[0]
+                self.releases[uid] = fixed[0]
+        self.successors: Dict[str, List[str]] = {uid: [] for uid in self.tasks}
+        self.predecessors: Dict[str, List[str]] = {uid: [] for uid in self.tasks}
+        self.exclusive_resources: Dict[str, List[Hashable]] = {uid: [] for uid in self.tasks}
+        """task -> the keys of the exclusive resources it uses"""
+        self.enforced_resources: set = set()
+        """the exclusive resources whose no-overlap is actually added to the model (scenario-level)"""
+
+    @staticmethod
+    def resource_key(resource) -> Hashable:
+        # the no-overlap is added per resource instance, so is the grouping here
+        return id(resource)
+
+    def add_precedence(self, before: str, after: str) -> None:
+        self.successors[before].append(after)
+        self.predecessors[after].append(before)
+
+    @staticmethod
+    def from_scenario(
+            scenario: Scenario,
+            tasks: List[Task],
+            strict: bool = True
+    ) -> Optional["SchedulingGraph"]:
+        """
+        builds the graph. When strict, returns None as soon as some constraint or resource
+        cannot be described in terms of precedences and exclusive resources, otherwise
+        those are skipped (the graph is then a relaxation of the scenario)
+        """
+        from planner_solver.models.base_models import Task
+
+        graph = SchedulingGraph(tasks)
+
+        def add_precedences(constraint, owner: Optional[Task]) -> bool:
+            precedences = constraint.get_precedences(owner)
+            if precedences is None:
+                return False
+            for before, after in precedences:
+                if not isinstance(before, Task) or not isinstance(after, Task):
+                    return False
+                before_id, after_id = before.get_unique_id(), after.get_unique_id()
+                if before_id not in graph.tasks or after_id not in graph.tasks:
+                    return False
+                graph.add_precedence(before_id, after_id)
+            return True
+
+        for task in tasks:
+            for constraint in task.get_constraints() or []:
+                if not add_precedences(constraint, task) and strict:
+                    return None
+
+            for resource in task.get_resources() or []:
+                exclusive = resource.is_exclusive()
+                if exclusive is None and strict:
+                    return None
+                if exclusive:
+                    graph.exclusive_resources[task.get_unique_id()].append(SchedulingGraph.resource_key(resource))
+
+        for constraint in scenario.get_constraints() or []:
+            if not add_precedences(constraint, None) and strict:
+                return None
+
+        for resource in scenario.get_resources() or []:
+            exclusive = resource.is_exclusive()
+            if exclusive is None and strict:
+                return None
+            if exclusive:
+                graph.enforced_resources.add(SchedulingGraph.resource_key(resource))
+
+        return graph
+
+    def fixed_tasks_lead(self) -> bool:
+        """
+        True when no FIXED task waits for a task still to be planned, so that
+        the fixed tasks can be placed first
+        """
+        return all(
+            pred in self.fixed
+            for uid in self.fixed for pred in self.predecessors[uid]
+        )
+
+    def topological_order(self) -> Optional[List[str]]:
+        """
+        Kahn's algorithm, returns None if the precedences contain a cycle
+        """
+        in_degree = {uid: len(preds) for uid, preds in self.predecessors.items()}
+        ready = deque(uid for uid, degree in in_degree.items() if degree == 0)
+        order: List[str] = []
+
+        while ready:
+            uid = ready.popleft()
+            order.append(uid)
+            for succ in self.successors[uid]:
+                in_degree[succ] -= 1
+                if in_degree[succ] == 0:
+                    ready.append(succ)
+
+        if len(order) != len(self.tasks):
+            return None
+        return order
+
+    def heads(self, order: List[str], durations: Dict[str, int]) -> Dict[str, int]:
+        """
+        the longest path from the start of the graph to the start of each task,
+        i.e. the earliest start (never before the release date)
+        """
+        heads: Dict[str, int] = {}
+        for uid in order:
+            if uid in self.fixed:
+                heads[uid] = self.fixed[uid][0]
+                continue
+            heads[uid] = max([self.releases[uid]] + [heads[pred] + durations[pred] for pred in self.predecessors[uid]])
+        return heads
+
+    def tails(self, order: List[str], durations: Dict[str, int]) -> Dict[str, int]:
+        """
+        the longest path from the start of each task to the end of the graph
+        """
+        tails: Dict[str, int] = {}
+        for uid in reversed(order):
+            tails[uid] = durations[uid] + max((tails[succ] for succ in self.successors[uid]), default=0)
+        return tails
+
+    def list_schedule(self, order: List[str], rule: str) -> ListSchedule:
+        """
+        greedy serial schedule: among the tasks whose predecessors are all planned,
+        the one picked by the dispatching rule starts as soon as its predecessors
+        and its exclusive resources allow it.
+
+        The FIXED tasks keep their place, the others are planned after them on the
+        same exclusive resources (see fixed_tasks_lead)
+        """
+        priority = PRIORITY_RULES[rule]
+        tails = self.tails(order, self.max_durations)
+
+        remaining = {uid: len(preds) for uid, preds in self.predecessors.items()}
+        ready_at: Dict[str, int] = dict(self.releases)
+        resource_free_at: Dict[Hashable, int] = {}
+        starts: Dict[str, int] = {}
+        ends: Dict[str, int] = {}
+
+        for uid, (start, end) in self.fixed.items():
+            starts[uid] = start
+            ends[uid] = end
+            for key in self.exclusive_resources[uid]:
+                resource_free_at[key] = max(resource_free_at.get(key, 0), end)
+            for succ in self.successors[uid]:
+                ready_at[succ] = max(ready_at[succ], end)
+                remaining[succ] -= 1
+
+        # the order index keeps it deterministic
+        position = {uid: i for i, uid in enumerate(order)}
+        heap = [
+            (priority(self, tails, uid), position[uid], uid)
+            for uid, count in remaining.items() if count == 0 and uid not in self.fixed
+        ]
+        heapq.heapify(heap)
+
+        while heap:
+            _, _, uid = heapq.heappop(heap)
+
+            start = ready_at[uid]
+            for key in self.exclusive_resources[uid]:
+                start = max(start, resource_free_at.get(key, 0))
+            end = start + self.max_durations[uid]
+
+            for key in self.exclusive_resources[uid]:
+                resource_free_at[key] = end
+            starts[uid] = start
+            ends[uid] = end
+
+            for succ in self.successors[uid]:
+                if succ in self.fixed:
+                    continue
+                ready_at[succ] = max(ready_at[succ], end)
+                remaining[succ] -= 1
+                if remaining[succ] == 0:
+                    heapq.heappush(heap, (priority(self, tails, succ), position[succ], succ))
+
+        return ListSchedule(rule=rule, starts=starts, ends=ends)
+
+
+class HorizonEstimator(ABC):
+    """
+    evaluates the bounds of the makespan before the model is built
+    """
+
+    @abstractmethod
+    def estimate(self, scenario: Scenario, tasks: List[Task]) -> HorizonEstimate:
+        pass
+
+
+class SumHorizonEstimator(HorizonEstimator):
+    """
+    the trivial estimate: all the tasks one after the other, after the FIXED ones
+    """
+
+    def estimate(self, scenario: Scenario, tasks: List[Task]) -> HorizonEstimate:
+        fixed = [task.get_fixed_interval() for task in tasks]
+        return HorizonEstimate(
+            lower_bound=0,
+            upper_bound=max(
+                [task.get_release_date() for task, interval in zip(tasks, fixed) if interval is None] +
+                [interval[1] for interval in fixed if interval is not None],
+                default=0
+            ) + sum(task.get_max_duration() for task, interval in zip(tasks, fixed) if interval is None)
+        )
+
+
+class ListScheduleHorizonEstimator(HorizonEstimator):
+    """
+    upper bound: a greedy list schedule that respects the precedences and the
+    exclusive resources, picking first the tasks with the most work remaining after them
+
+    lower bound: the longest between the critical path and the load of each exclusive resource
+
+    falls back to the sum estimate when the scenario has constraints or resources
+    that cannot be described as precedences or exclusive resources
+    """
+
+    def __init__(self):
+        self.__fallback = SumHorizonEstimator()
+
+    def estimate(self, scenario: Scenario, tasks: List[Task]) -> HorizonEstimate:
+        if not tasks:
+            return HorizonEstimate(lower_bound=0, upper_bound=0)
+
+        graph = SchedulingGraph.from_scenario(scenario, tasks)
+        if graph is None:
+            logger.debug("Scenario not describable as precedences, falling back to the sum horizon")
+            return self.__fallback.estimate(scenario, tasks)
+
+        order = graph.topological_order()
+        if order is None:
+            logger.warning("Precedence cycle found, falling back to the sum horizon")
+            return self.__fallback.estimate(scenario, tasks)
+
+        if not graph.fixed_tasks_lead():
+            logger.debug("Fixed tasks after tasks to plan, falling back to the sum horizon")
+            return self.__fallback.estimate(scenario, tasks)
+
+        upper_bound = graph.list_schedule(order, 'mwkr').makespan
+        lower_bound = self._lower_bound(graph, order)
+
+        return HorizonEstimate(
+            lower_bound=min(lower_bound, upper_bound),
+            upper_bound=upper_bound
+        )
+
+    def _lower_bound(self, graph: SchedulingGraph, order: List[str]) -> int:
+        tails = graph.tails(order, graph.durations)
+        critical_path = max((graph.releases[uid] + tail for uid, tail in tails.items()), default=0)
+
+        # only the resources whose no-overlap is really in the model count
+        loads: Dict[Hashable, int] = {}
+        for uid, keys in graph.exclusive_resources.items():
+            for key in set(keys):
+                if key in graph.enforced_resources:
+                    loads[key] = loads.get(key, 0) + graph.durations[uid]
+
+        return max(critical_path, max(loads.values(), default=0))
+
+
+def tighten_time_windows(scenario: Scenario, tasks: List[Task], horizon: int) -> int:
+    """
+    sets on every task its earliest start and latest end, by longest path
+    propagation over the precedences (in linear time on the graph size).
+
+    Constraints that are not precedences are ignored, which only makes the
+    windows looser. Returns the number of tightened tasks
+    """
+    graph = SchedulingGraph.from_scenario(scenario, tasks, strict=False)
+
+    order = graph.topological_order()
+    if order is None:
+        logger.warning("Precedence cycle found, task domains are not tightened")
+        for task in tasks:
+            task.update_time_window(task.get_release_date(), None)
+        return 0
+
+    heads = graph.heads(order, graph.durations)
+    tails = graph.tails(order, graph.durations)
+
+    tightened = 0
+    for uid, task in graph.tasks.items():
+        earliest_start = heads[uid]
+        # the tail includes the task itself
+        latest_end = horizon - (tails[uid] - graph.durations[uid])
+
+        if earliest_start + graph.durations[uid] > latest_end:
+            # the horizon is too short anyway, let the solver prove it
+            task.update_time_window(task.get_release_date(), None)
+            continue
+
+        task.update_time_window(earliest_start, latest_end)
+        if earliest_start > 0 or latest_end < horizon:
+            tightened += 1
+
+    return tightened
+
+
+HORIZON_ESTIMATORS = {
+    'sum': SumHorizonEstimator,
+    'list_schedule': ListScheduleHorizonEstimator,
+}
+
+
+def get_horizon_estimator(name: str) -> HorizonEstimator:
+    if name not in HORIZON_ESTIMATORS:
+        raise ValueError(f"Unknown horizon estimator {name}, available: {', '.join(HORIZON_ESTIMATORS.keys())}")
+    return HORIZON_ESTIMATORS[name]()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Optional, Any, Hashable, Iterator, TYPE_CHECKING
+
+from ortools.sat.python.cp_model import CpModel, IntVar, IntervalVar
+
+from planner_solver.services.horizon_service import HorizonEstimate
+from planner_solver.services.model_cache_service import ScenarioFingerprint
+
+if TYPE_CHECKING:
+    from planner_solver.models.base_models import Scenario, Resource, Task, Constraint, WrappedModel
+
+logger = logging.getLogger(__name__)
+
+
+CONSTRAINT_CONTRIBUTIONS = ('task_constraint', 'scenario_constraint')
+
+TARGET_CONTRIBUTION = ('target',)
+
+
+class ModelContributions:
+    """
+    the indices of the proto constraints added by each entity while building a model,
+    so that a single entity can later be removed from it.
+
+    Constraints are keyed by their description, numbered when the same one appears twice
+    """
+
+    def __init__(self, fingerprint: ScenarioFingerprint):
+        self.fingerprint = fingerprint
+        """describes the entities of the scenario being built, replaced on every patch"""
+        self.__indices: Dict[Hashable, List[int]] = {}
+
+    @staticmethod
+    def task_key(unique_id: str) -> Hashable:
+        return 'task', unique_id
+
+    @staticmethod
+    def resource_key(resource: Resource) -> Hashable:
+        return 'resource', resource.uuid if resource.uuid is not None else id(resource)
+
+    def _numbered_keys(self, prefix: Tuple, constraints: List[Constraint]) -> List[Hashable]:
+        seen: Dict[str, int] = {}
+        keys = []
+        for constraint in constraints:
+            description = self.fingerprint.entity_key(constraint)
+            occurrence = seen.get(description, 0)
+            seen[description] = occurrence + 1
+            keys.append((*prefix, description, occurrence))
+        return keys
+
+    def task_constraint_keys(self, task: Task) -> List[Hashable]:
+        return self._numbered_keys(('task_constraint', task.get_unique_id()), task.get_constraints() or [])
+
+    def scenario_constraint_keys(self, scenario: Scenario) -> List[Hashable]:
+        return self._numbered_keys(('scenario_constraint',), scenario.get_constraints() or [])
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.__indices
+
+    def keys(self) -> List[Hashable]:
+        return list(self.__indices.keys())
+
+    @contextmanager
+    def recording(self, model: CpModel, key: Hashable) -> Iterator[None]:
+        """
+        every constraint added to the model within the block belongs to key
+        """
+        before = len(model.proto.constraints)
+        yield
+        self.__indices.setdefault(key, []).extend(range(before, len(model.proto.constraints)))
+
+    def remove(self, model: CpModel, key: Hashable) -> None:
+        """
+        empties the constraints of key: an empty constraint is valid and does nothing,
+        so the other indices stay untouched
+        """
+        for index in self.__indices.pop(key, []):
+            model.proto.constraints[index].Clear()
+
+@contextmanager
+def recording(contributions: Optional[ModelContributions], model: CpModel, key: Hashable) -> Iterator[None]:
+    """
+    ModelContributions.recording, or nothing when there is no recorder
+    """
+    if contributions is None:
+        yield
+        return
+    with contributions.recording(model, key):
+        yield
+
+def clone_wrapped_model(wrapped_model: WrappedModel) -> Optional[WrappedModel]:
+    """
+    a copy of the model, with the named variables pointing to the copy
+    (the intervals of removed entities are dropped).
+    None when some variable cannot be found back by its proto index
+    """
+    from planner_solver.models.base_models import WrappedModel
+
+    model = wrapped_model.model.clone()
+    variables: Dict[str, Any] = {}
+    for name, variable in wrapped_model.variables.items():
+        if isinstance(variable, IntervalVar):
+            if not model.proto.constraints[variable.index].HasField('interval'):
+                continue
+            variables[name] = model.get_interval_var_from_proto_index(variable.index)
+        elif isinstance(variable, IntVar):
+            variables[name] = model.get_int_var_from_proto_index(variable.index)
+        else:
+            return None
+
+    return WrappedModel(
+        model=model,
+        variables=variables
+    )
+
+class RetainedModel:
+    """
+    the last model built for a scenario, alongside what is needed to patch it
+    """
+    wrapped_model: WrappedModel
+    contributions: ModelContributions
+    task_keys: Dict[str, str]
+    """task unique id -> description of the task"""
+    task_variables: Dict[str, Tuple[int, int, int]]
+    """task unique id -> (start, end, interval) proto indices"""
+    resource_keys: Dict[Any, Tuple[str, bool, Tuple[str, ...]]]
+    """resource uuid -> (description, scenario-level, unique ids of the tasks using it)"""
+    horizon_estimate: HorizonEstimate
+    """the makespan bounds the model was built (or last patched) with"""
+
+    def __init__(
+            self,
+            wrapped_model: WrappedModel,
+            contributions: ModelContributions,
+            task_keys: Dict[str, str],
+            task_variables: Dict[str, Tuple[int, int, int]],
+            resource_keys: Dict[Any, Tuple[str, bool, Tuple[str, ...]]],
+            horizon_estimate: HorizonEstimate,
+    ):
+        self.wrapped_model = wrapped_model
+        self.contributions = contributions
+        self.task_keys = task_keys
+        self.task_variables = task_variables
+        self.resource_keys = resource_keys
+        self.horizon_estimate = horizon_estimate
+
+    def constraint_keys(self) -> List[Hashable]:
+        return [key for key in self.contributions.keys() if key[0] in CONSTRAINT_CONTRIBUTIONS]
+
+    def bind_task(self, task: Task, model: Optional[CpModel] = None) -> None:
+        """
+        points a (freshly loaded) task to its variables in the retained model,
+        or in a clone of it
+        """
+        from planner_solver.models.base_models import CpSatTask
+
+        model = model if model is not None else self.wrapped_model.model
+        start, end, interval = self.task_variables[task.get_unique_id()]
+        # the indices come from a model built by the task itself, no need to validate them
+        task.cp_sat = CpSatTask.model_construct(
+            start=model.get_int_var_from_proto_index(start),
+            end=model.get_int_var_from_proto_index(end),
+            interval=model.get_interval_var_from_proto_index(interval) if interval >= 0 else None,
+        )
+
+class RetainedModelStore:
+    """
+    the retained models of the most recently built scenarios, by scenario uuid.
+
+    A retained model is patched in place: it is taken out of the store while patched,
+    so that the executions of the same scenario on other threads never see it half patched
+    """
+
+    def __init__(self, size: int):
+        self.__size = size
+        self.__models: OrderedDict[str, RetainedModel] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def is_enabled(self) -> bool:
+        return self.__size > 0
+
+    def take(self, uuid_scenario: str) -> Optional[RetainedModel]:
+        """
+        removes the retained model from the store, to be put back once patched
+        """
+        with self.__lock:
+            return self.__models.pop(uuid_scenario, None)
+
+    def put(self, uuid_scenario: str, retained: RetainedModel) -> None:
+        if self.__size <= 0:
+            return
+        with self.__lock:
+            self.__models[uuid_scenario] = retained
+            self.__models.move_to_end(uuid_scenario)
+            while len(self.__models) > self.__size:
+                self.__models.popitem(last=False)
+
+    def discard(self, uuid_scenario: str) -> None:
+        with self.__lock:
+            self.__models.pop(uuid_scenario, None)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+from typing import List, Dict, Tuple, Optional, Callable, TYPE_CHECKING
+
+from ortools.sat.python.cp_model import CpSolverSolutionCallback
+
+from planner_solver.models.stored_documents import IncumbentSolution
+
+if TYPE_CHECKING:
+    from planner_solver.models.base_models import Task
+
+
+class StreamedIncumbent:
+    """
+    an improving solution, with the plan of every task at that point of the search
+    """
+    incumbent: IncumbentSolution
+    values: Dict[str, Tuple[int, int]]
+    """task unique id -> (start, end)"""
+
+    def __init__(
+            self,
+            incumbent: IncumbentSolution,
+            values: Dict[str, Tuple[int, int]]
+    ):
+        self.incumbent = incumbent
+        self.values = values
+
+class IncumbentSolutionCallback(CpSolverSolutionCallback):
+    """
+    called by CpSat on every improving solution, forwards at most one
+    solution every min_interval seconds to the given sink.
+
+    Beware! this runs on the solver thread
+    """
+
+    def __init__(
+            self,
+            tasks: List[Task],
+            min_interval: float,
+            sink: Callable[[StreamedIncumbent], None]
+    ):
+        super().__init__()
+        self.__tasks = tasks
+        self.__min_interval = min_interval
+        self.__sink = sink
+        self.__last_emitted: Optional[float] = None
+        self.solution_count = 0
+        self.emitted_count = 0
+        self.has_pending = False
+        """an improving solution was skipped by the throttle and never emitted"""
+
+    def on_solution_callback(self) -> None:
+        self.solution_count += 1
+
+        now = time.monotonic()
+        if self.__last_emitted is not None and now - self.__last_emitted < self.__min_interval:
+            self.has_pending = True
+            return
+
+        values: Dict[str, Tuple[int, int]] = {}
+        for task in self.__tasks:
+            values[task.get_unique_id()] = (self.value(task.cp_sat.start), self.value(task.cp_sat.end))
+
+        self.__sink(StreamedIncumbent(
+            incumbent=IncumbentSolution(
+                objective=self.objective_value,
+                bound=self.best_objective_bound,
+                wall_time=self.wall_time,
+            ),
+            values=values
+        ))
+        self.__last_emitted = now
+        self.emitted_count += 1
+        self.has_pending = False
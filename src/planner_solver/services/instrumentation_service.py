@@ -0,0 +1,46 @@
+import time
+from typing import Dict
+
+from ortools.sat.cp_model_pb2 import CpSolverStatus
+from ortools.sat.python.cp_model import CpModel, CpSolver
+
+from planner_solver.models.stored_documents import ExecutionSolveStats
+
+
+class PhaseTimer:
+    """
+    the seconds elapsed in each phase, each lap closes the current one
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.__last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.__last
+        self.__last = now
+
+def model_size(model: CpModel) -> Dict[str, int]:
+    proto = model.proto
+    return {
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+        "intervals": sum(1 for constraint in proto.constraints if constraint.HasField('interval')),
+    }
+
+def read_solve_stats(solver: CpSolver) -> ExecutionSolveStats:
+    """
+    reads the statistics from the response of the last solve
+    """
+    response = solver.response_proto
+    has_objective = response.status in (CpSolverStatus.OPTIMAL, CpSolverStatus.FEASIBLE)
+    return ExecutionSolveStats(
+        wall_time=response.wall_time,
+        user_time=response.user_time,
+        deterministic_time=response.deterministic_time,
+        branches=response.num_branches,
+        conflicts=response.num_conflicts,
+        objective=response.objective_value if has_objective else None,
+        bound=response.best_objective_bound if has_objective else None,
+    )
@@ -0,0 +1,108 @@
+import functools
+import inspect
+import logging
+import threading
+from typing import Tuple, Optional, Any
+from wsgiref.simple_server import WSGIServer
+
+from prometheus_client import CollectorRegistry, Gauge, Histogram, start_http_server
+from prometheus_client.exposition import choose_encoder
+
+from planner_solver.config.models import MetricsConfig
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""seconds, for the calls to the api, mongodb and rabbitmq"""
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+"""seconds, for the builds, the solves and the time spent in the queue"""
+
+def _timed_coroutine(method, histogram: Histogram, name: str):
+    @functools.wraps(method)
+    async def timed(*args, **kwargs):
+        with histogram.labels(method=name).time():
+            return await method(*args, **kwargs)
+    return timed
+
+class MetricsService:
+    """
+    holds the metrics of the process (each api or runner process has its own registry)
+    and exposes them in the Prometheus formats
+    """
+
+    def __init__(self, config: MetricsConfig):
+        self.__config = config
+        self.__server: Optional[WSGIServer] = None
+        self.__server_thread: Optional[threading.Thread] = None
+        self.registry = CollectorRegistry()
+
+        self.http_request_seconds = Histogram(
+            'planner_solver_http_request_seconds', 'Latency of the api requests, by route template',
+            ('method', 'route', 'status'), buckets=LATENCY_BUCKETS, registry=self.registry,
+        )
+        self.mongodb_call_seconds = Histogram(
+            'planner_solver_mongodb_call_seconds', 'Latency of the MongodbService calls',
+            ('method',), buckets=LATENCY_BUCKETS, registry=self.registry,
+        )
+        self.rabbitmq_publish_seconds = Histogram(
+            'planner_solver_rabbitmq_publish_seconds', 'Latency of the RabbitMQ publishes',
+            ('destination',), buckets=LATENCY_BUCKETS, registry=self.registry,
+        )
+        self.queue_wait_seconds = Histogram(
+            'planner_solver_queue_wait_seconds', 'Time between the trigger of an execution and its consumption',
+            ('queue',), buckets=DURATION_BUCKETS, registry=self.registry,
+        )
+        self.build_seconds = Histogram(
+            'planner_solver_build_seconds', 'Time spent preparing the model of a solve',
+            ('source',), buckets=DURATION_BUCKETS, registry=self.registry,
+        )
+        self.solve_seconds = Histogram(
+            'planner_solver_solve_seconds', 'Wall time of the CpSat solves',
+            ('status',), buckets=DURATION_BUCKETS, registry=self.registry,
+        )
+        self.executions_in_flight = Gauge(
+            'planner_solver_executions_in_flight', 'Executions being processed right now',
+            registry=self.registry,
+        )
+
+        logger.info("service loaded")
+
+    def render(self, accept: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        the exposition of the registry and its content type, OpenMetrics
+        when the accept header asks for it, the Prometheus text format otherwise
+        """
+        encoder, content_type = choose_encoder(accept or '')
+        return encoder(self.registry), content_type
+
+    def instrument_coroutines(self, service: Any, histogram: Histogram) -> None:
+        """
+        times every public coroutine method of the service instance,
+        labeled with the method name
+        """
+        for name, method in inspect.getmembers(service, inspect.iscoroutinefunction):
+            if not name.startswith('_'):
+                setattr(service, name, _timed_coroutine(method, histogram, name))
+
+    def start_server(self) -> None:
+        """
+        serves the registry on a daemon thread, for the processes without the api
+        """
+        if not self.__config.enabled or self.__server is not None:
+            return
+
+        self.__server, self.__server_thread = start_http_server(
+            self.__config.runner_port, self.__config.runner_host, registry=self.registry
+        )
+        logger.info(f"Metrics served on {self.__config.runner_host}:{self.__server.server_port}/metrics")
+
+    def stop_server(self) -> None:
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server_thread.join()
+            self.__server = None
+            self.__server_thread = None
+
+    def get_server_port(self) -> Optional[int]:
+        return self.__server.server_port if self.__server is not None else None
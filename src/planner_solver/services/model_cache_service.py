@@ -0,0 +1,405 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import importlib.metadata
+import inspect
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional, Any, TYPE_CHECKING
+
+import ortools
+from ortools.sat.python.cp_model import CpModel, IntVar, IntervalVar
+
+from planner_solver.config.models import WorkerConfig
+from planner_solver.decorators.parameters import Parameter
+
+if TYPE_CHECKING:
+    from planner_solver.models.base_models import Scenario, Resource, Task, Target, WrappedModel
+
+logger = logging.getLogger(__name__)
+
+
+MODEL_CACHE_VERSION = 1
+"""bump it when the way the models are built or cached changes, the entries of older builds are then missed"""
+
+class NotCacheableException(Exception):
+    """
+    the scenario holds something that cannot be described in a stable way,
+    its model is then always built from scratch
+    """
+    pass
+
+# region fingerprint
+
+def _type_name(entity: Any) -> str:
+    return _class_name(type(entity))
+
+@functools.cache
+def _class_name(cls: type) -> str:
+    # the module types are built by their own code, a change of their source is a change of the model
+    return f"{getattr(cls, '__ps_type_name', cls.__qualname__)}:{cls.__module__}.{cls.__qualname__}" \
+        f"@{_source_digest(cls)}"
+
+def _source_digest(cls: type) -> str:
+    try:
+        with open(inspect.getsourcefile(cls), 'rb') as source:
+            return hashlib.sha256(source.read()).hexdigest()[:16]
+    except (TypeError, OSError):
+        return 'unknown'
+
+@functools.cache
+def builder_version() -> str:
+    """
+    salts the cache keys, so that the disk tier shared across deployments
+    never serves a model built by another version of the builder or of CpSat
+    """
+    try:
+        package_version = importlib.metadata.version('planner-solver')
+    except importlib.metadata.PackageNotFoundError:
+        package_version = 'unknown'
+    return f"{MODEL_CACHE_VERSION}:{package_version}:{ortools.__version__}"
+
+@functools.cache
+def _parameter_names(cls: type) -> Tuple[str, ...]:
+    # the parameters are declared as fields, with the Parameter as default
+    return tuple(sorted(
+        name for name, field in cls.model_fields.items()
+        if isinstance(field.default, Parameter)
+    ))
+
+class ScenarioFingerprint:
+    """
+    a canonical description of everything that ends up in the model of a scenario,
+    entities referencing each other are described by task unique id and resource
+    uuid (or position, when the resource was never stored)
+    """
+
+    def __init__(self, resources: List[Resource]):
+        self.__resource_refs: Dict[int, Any] = {
+            id(resource): resource.uuid if resource.uuid is not None else i
+            for i, resource in enumerate(resources)
+        }
+
+    def _value(self, value: Any) -> Any:
+        from planner_solver.models.base_models import Task, Resource, PlannerSolverBaseModel
+
+        if isinstance(value, Parameter):
+            # unset parameters still hold their descriptor
+            return None
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, (list, tuple)):
+            return [self._value(v) for v in value]
+        if isinstance(value, dict):
+            return {str(k): self._value(v) for k, v in value.items()}
+        if isinstance(value, Task):
+            return {"task": value.get_unique_id()}
+        if isinstance(value, Resource):
+            if id(value) not in self.__resource_refs:
+                raise NotCacheableException(f"Resource {value.label} is not part of the scenario")
+            return {"resource": self.__resource_refs[id(value)]}
+        if isinstance(value, PlannerSolverBaseModel) and value.uuid is not None:
+            return {"entity": _type_name(value), "uuid": value.uuid}
+
+        raise NotCacheableException(f"Cannot describe a value of type {type(value).__name__}")
+
+    def _entity(self, entity: Any) -> Dict[str, Any]:
+        return {
+            "type": _type_name(entity),
+            "parameters": {name: self._value(getattr(entity, name)) for name in _parameter_names(type(entity))},
+        }
+
+    def entity_key(self, entity: Any) -> str:
+        """
+        the description of a single entity without its children, to compare
+        two versions of it within the same process
+        """
+        return json.dumps(self._entity(entity), separators=(',', ':'))
+
+    def _resource_ref(self, resource: Resource) -> Any:
+        if id(resource) not in self.__resource_refs:
+            raise NotCacheableException(f"Resource {resource.label} is not part of the scenario")
+        return self.__resource_refs[id(resource)]
+
+    def describe(
+            self,
+            scenario: Scenario,
+            tasks: List[Task],
+            resources: List[Resource],
+            scenario_resources: List[Resource],
+            target: Target,
+            settings: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        return {
+            "scenario": _type_name(scenario),
+            "resources": [self._entity(resource) for resource in resources],
+            "scenario_resources": [self._resource_ref(resource) for resource in scenario_resources],
+            "tasks": [
+                {
+                    **self._entity(task),
+                    "unique_id": task.get_unique_id(),
+                    "status": task.get_task_status().name,
+                    "release_date": task.get_release_date(),
+                    "fixed": task.get_fixed_interval(),
+                    "constraints": [self._entity(constraint) for constraint in task.get_constraints() or []],
+                    "resources": [self._resource_ref(resource) for resource in task.get_resources() or []],
+                }
+                for task in tasks
+            ],
+            "constraints": [self._entity(constraint) for constraint in scenario.get_constraints() or []],
+            "target": self._entity(target),
+            "settings": self._value(settings),
+        }
+
+def scenario_cache_key(
+        scenario: Scenario,
+        tasks: List[Task],
+        resources: List[Resource],
+        scenario_resources: List[Resource],
+        target: Target,
+        settings: Dict[str, Any],
+) -> Optional[str]:
+    """
+    the sha256 of the canonical description of the scenario, or None when
+    it cannot be described. settings are the worker options that change the built model
+    """
+    try:
+        description = ScenarioFingerprint(resources).describe(
+            scenario, tasks, resources, scenario_resources, target, settings
+        )
+    except NotCacheableException as e:
+        logger.debug(f"Scenario model not cacheable: {e}")
+        return None
+
+    encoded = json.dumps([builder_version(), description], sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+# endregion fingerprint
+
+class CachedModel:
+    """
+    a built model: its proto, plus the proto index of every named variable
+    and of the variables of each task
+    """
+    model_proto: bytes
+    variables: Dict[str, Tuple[str, int]]
+    """variable name -> (kind, proto index), kind is int or interval"""
+    tasks: Dict[str, Tuple[int, int, int]]
+    """task unique id -> (start, end, interval) proto indices"""
+    hints: Optional[Dict[str, Tuple[int, int]]]
+    """the heuristic plan computed while building, used when no other hint is given"""
+
+    def __init__(
+            self,
+            model_proto: bytes,
+            variables: Dict[str, Tuple[str, int]],
+            tasks: Dict[str, Tuple[int, int, int]],
+            hints: Optional[Dict[str, Tuple[int, int]]] = None,
+    ):
+        self.model_proto = model_proto
+        self.variables = variables
+        self.tasks = tasks
+        self.hints = hints
+
+    @staticmethod
+    def from_built_model(
+            wrapped_model: WrappedModel,
+            tasks: List[Task],
+            hints: Optional[Dict[str, Tuple[int, int]]] = None,
+    ) -> Optional["CachedModel"]:
+        """
+        returns None when some variable cannot be indexed
+        """
+        variables: Dict[str, Tuple[str, int]] = {}
+        for name, variable in wrapped_model.variables.items():
+            if isinstance(variable, IntervalVar):
+                variables[name] = ('interval', variable.index)
+            elif isinstance(variable, IntVar):
+                variables[name] = ('int', variable.index)
+            else:
+                logger.debug(f"Variable {name} of type {type(variable).__name__} cannot be cached")
+                return None
+
+        task_indices: Dict[str, Tuple[int, int, int]] = {}
+        for task in tasks:
+            if task.cp_sat is None or task.cp_sat.start is None or task.cp_sat.end is None:
+                return None
+            interval = task.cp_sat.interval.index if task.cp_sat.interval is not None else -1
+            task_indices[task.get_unique_id()] = (task.cp_sat.start.index, task.cp_sat.end.index, interval)
+
+        return CachedModel(
+            model_proto=wrapped_model.model.proto.SerializeToString(),
+            variables=variables,
+            tasks=task_indices,
+            hints=hints,
+        )
+
+    def to_index(self) -> Dict[str, Any]:
+        return {
+            "variables": self.variables,
+            "tasks": self.tasks,
+            "hints": self.hints,
+        }
+
+    @staticmethod
+    def from_index(model_proto: bytes, index: Dict[str, Any]) -> "CachedModel":
+        hints = index.get("hints")
+        return CachedModel(
+            model_proto=model_proto,
+            variables={name: (kind, i) for name, (kind, i) in index["variables"].items()},
+            tasks={uid: (start, end, interval) for uid, (start, end, interval) in index["tasks"].items()},
+            hints={uid: (start, end) for uid, (start, end) in hints.items()} if hints is not None else None,
+        )
+
+    def load_model(self) -> Tuple[CpModel, Dict[str, Any]]:
+        """
+        a new model parsed from the proto, alongside its named variables
+        """
+        model = CpModel()
+        model.proto.ParseFromString(self.model_proto)
+        model.rebuild_var_and_constant_map()
+
+        variables: Dict[str, Any] = {}
+        for name, (kind, index) in self.variables.items():
+            if kind == 'interval':
+                variables[name] = model.get_interval_var_from_proto_index(index)
+            else:
+                variables[name] = model.get_int_var_from_proto_index(index)
+
+        return model, variables
+
+class ModelCacheService:
+    """
+    keeps the built models by scenario cache key, in an in-memory LRU
+    and (if a directory is configured) on disk, so that re-executing
+    an unchanged scenario skips the whole model building
+    """
+
+    def __init__(self, config: WorkerConfig):
+        self.__size = config.model_cache_size
+        self.__directory = config.model_cache_dir
+        self.__disk_entries = config.model_cache_disk_entries
+        self.__memory: OrderedDict[str, CachedModel] = OrderedDict()
+        # the executions prepare their models on concurrent threads
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.__directory:
+            os.makedirs(self.__directory, exist_ok=True)
+
+    def is_enabled(self) -> bool:
+        return self.__size > 0 or bool(self.__directory)
+
+    def get(self, key: str) -> Optional[CachedModel]:
+        with self.__lock:
+            cached = self.__memory.get(key)
+            if cached is not None:
+                self.__memory.move_to_end(key)
+
+        if cached is None:
+            # the disk is read outside of the lock
+            cached = self._read_disk(key)
+            if cached is not None:
+                self._put_memory(key, cached)
+
+        with self.__lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached
+
+    def put(self, key: str, cached: CachedModel) -> None:
+        self._put_memory(key, cached)
+        self._write_disk(key, cached)
+
+    def clear(self) -> None:
+        """
+        empties the memory tier only
+        """
+        with self.__lock:
+            self.__memory.clear()
+
+    def _put_memory(self, key: str, cached: CachedModel) -> None:
+        if self.__size <= 0:
+            return
+        with self.__lock:
+            self.__memory[key] = cached
+            self.__memory.move_to_end(key)
+            while len(self.__memory) > self.__size:
+                self.__memory.popitem(last=False)
+
+    # region disk
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return os.path.join(self.__directory, f"{key}.pb"), os.path.join(self.__directory, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[CachedModel]:
+        if not self.__directory:
+            return None
+
+        proto_path, index_path = self._paths(key)
+        try:
+            # the index is written last, so it is the marker of a complete entry
+            with open(index_path) as f:
+                index = json.load(f)
+            with open(proto_path, 'rb') as f:
+                model_proto = f.read()
+            return CachedModel.from_index(model_proto, index)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Discarding unreadable cached model {key}: {e}")
+            return None
+
+    def _write_disk(self, key: str, cached: CachedModel) -> None:
+        if not self.__directory:
+            return
+
+        proto_path, index_path = self._paths(key)
+        try:
+            for path, content, mode in (
+                    (proto_path, cached.model_proto, 'wb'),
+                    (index_path, json.dumps(cached.to_index()), 'w'),
+            ):
+                # unique per thread too, two executions may store the same key at once
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, mode) as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            # the disk tier is best effort
+            logger.warning(f"Could not write cached model {key}: {e}")
+            return
+
+        self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """
+        removes the least recently written entries above the configured amount
+        """
+        try:
+            entries = [
+                entry for entry in os.scandir(self.__directory)
+                if entry.is_file() and entry.name.endswith('.json')
+            ]
+            if len(entries) <= self.__disk_entries:
+                return
+
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.__disk_entries]:
+                key = entry.name[:-len('.json')]
+                for path in self._paths(key):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+        except OSError as e:
+            logger.warning(f"Could not prune the model cache: {e}")
+
+    # endregion disk
@@ -1,25 +1,85 @@
 import asyncio
+import functools
 import logging
-from typing import List, Optional, Union, Literal
+from datetime import datetime
+from typing import List, Optional, Union, Literal, Dict, Any, Tuple, Set, Type
 
-from beanie import init_beanie
+from uuid import uuid4
+
+from beanie import init_beanie, PydanticObjectId, UpdateResponse
+from beanie.operators import Push, In
 from beanie.exceptions import DocumentNotFound
+import pymongo
+from bson import DBRef
 from pymongo import AsyncMongoClient
+from pymongo.errors import BulkWriteError, OperationFailure
 
 from planner_solver.config.models import MongodbConfig
-from planner_solver.models.base_models import Scenario, Resource, Task, Constraint
+from planner_solver.models.base_models import Scenario, Resource, Task, Constraint, PlannerSolverBaseModel
+from planner_solver.exceptions.type_exceptions import TypeException
+from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.models.forms import BulkItemResult
 from planner_solver.models.stored_documents import TaskDocument, ConstraintDocument, ResourceDocument, ScenarioDocument, \
-    ExecutionDocument
+    ExecutionDocument, IncumbentSolution, BasePlannerSolverDocument, UUID_UNIQUE_INDEX
+from planner_solver.services.metrics_service import MetricsService
 from planner_solver.services.types_service import TypesService
 
 logger = logging.getLogger(__name__)
 
+LINK_PREFIX = '_ps_link_'
+
 MODELS = [
     TaskDocument,
     ConstraintDocument,
     ResourceDocument,
     ScenarioDocument,
+    ExecutionDocument,
+]
+
+SCENARIO_SCOPED_MODELS = [
+    TaskDocument,
+    ConstraintDocument,
+    ResourceDocument,
+    ExecutionDocument,
 ]
+"""the documents that store the scenario_uuid next to the scenario link"""
+
+LINK_DOCUMENTS: Dict[str, Type[BasePlannerSolverDocument]] = {
+    'task': TaskDocument,
+    'resource': ResourceDocument,
+    'constraint': ConstraintDocument,
+}
+"""the document retrieved for each Parameter link type"""
+
+ENTITY_PROJECTION = {"_id": 1, "uuid": 1, "type": 1, "data": 1}
+"""the only fields needed to rebuild a base model"""
+
+@functools.cache
+def parameter_links(cls: type) -> Tuple[Tuple[str, str], ...]:
+    """
+    the (attribute, link type) of the linked Parameters of a class,
+    as marked by Parameter.__set_name__
+    """
+    return tuple(
+        (name[len(LINK_PREFIX):], getattr(cls, name))
+        for name in dir(cls)
+        if name.startswith(LINK_PREFIX)
+    )
+
+def _link_uuid(value: Any, uuids_by_id: Dict[Any, str]) -> Optional[str]:
+    """
+    the uuid a stored link points to: the plain uuid, the snapshot of
+    the hydrated document or a DBRef
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, DBRef):
+        return uuids_by_id.get(value.id)
+    if isinstance(value, dict):
+        if value.get("uuid") is not None:
+            return value["uuid"]
+        return uuids_by_id.get(value.get("_id", value.get("id")))
+    return None
 
 class MongoConnectionFactory:
     def __init__(self):
@@ -65,12 +125,15 @@ class MongodbService:
             self,
             config: MongodbConfig,
             types_service: TypesService,
+            metrics_service: Optional[MetricsService] = None,
     ):
         self.__config = config
         self.__connection = config.connection
         self.__types_service = types_service
         self.__beanie_initialized = False
         self.__connection_factory = MongoConnectionFactory()
+        if metrics_service is not None:
+            metrics_service.instrument_coroutines(self, metrics_service.mongodb_call_seconds)
         logger.info("service loaded")
         logger.debug("host: " + str(config.connection.host) + ":" + str(config.connection.port))
 
@@ -80,6 +143,57 @@ class MongodbService:
         )
         return client  # Return client if you need it elsewhere
 
+    async def migrate_scenario_uuid(self) -> Dict[str, int]:
+        """
+        writes scenario_uuid on the documents stored before it existed,
+        reading the scenario from their link. Returns the updated documents by collection
+        """
+        await self.__connect()
+
+        scenarios = await ScenarioDocument.find_all().to_list()
+        updated: Dict[str, int] = {}
+        for document_type in SCENARIO_SCOPED_MODELS:
+            collection = document_type.get_pymongo_collection()
+            updated[collection.name] = 0
+            for scenario in scenarios:
+                result = await collection.update_many(
+                    {"scenario.$id": scenario.id, "scenario_uuid": None},
+                    {"$set": {"scenario_uuid": scenario.uuid}},
+                )
+                updated[collection.name] += result.modified_count
+            logger.info(f"Set scenario_uuid on {updated[collection.name]} documents of {collection.name}")
+
+        return updated
+
+    async def migrate_uuid_index(self) -> List[str]:
+        """
+        gives a uuid to the documents stored without one and builds the unique uuid index.
+        Returns the collections where it could not be built because of duplicated uuids,
+        which are logged to be fixed by hand
+        """
+        await self.__connect()
+
+        failed: List[str] = []
+        for document_type in MODELS:
+            collection = document_type.get_pymongo_collection()
+            result = await collection.update_many({"uuid": None}, [{"$set": {"uuid": {"$toString": "$_id"}}}])
+            if result.modified_count:
+                logger.info(f"Set uuid on {result.modified_count} documents of {collection.name}")
+
+            try:
+                await collection.create_indexes([UUID_UNIQUE_INDEX])
+            except OperationFailure as e:
+                duplicated = await (await collection.aggregate([
+                    {"$group": {"_id": "$uuid", "count": {"$sum": 1}}},
+                    {"$match": {"count": {"$gt": 1}}},
+                    {"$limit": 20},
+                ])).to_list()
+                logger.error(f"Could not build the unique uuid index of {collection.name}: {e}. "
+                             f"Duplicated uuids (first 20): {[d['_id'] for d in duplicated]}")
+                failed.append(collection.name)
+
+        return failed
+
     async def clear_all_collections(self):
         await self.__connect()
 
@@ -101,43 +215,67 @@ class MongodbService:
         Returns:
             The same model with Parameter links resolved to actual objects
         """
-        await self.__connect()
+        await self.hydrate_parameter_links_many([base_model], uuid_scenario)
 
-        attribs = dir(base_model)
-        # Get all Parameter attributes from the model class
-        for attr_name in attribs:
-            link_attr_name = f"_ps_link_{attr_name}"
+        return base_model
 
-            if hasattr(base_model, attr_name) and hasattr(base_model, link_attr_name):
-                link_type: Literal['task', 'resource', 'constraint'] = getattr(base_model, link_attr_name)
-                link_value = getattr(base_model, attr_name)
+    async def hydrate_parameter_links_many(
+            self,
+            base_models: List[Union[Task, Constraint, Resource, Scenario]],
+            uuid_scenario: Optional[str] = None
+    ) -> None:
+        """
+        Hydrates the Parameter links of many base models at once: the linked uuids are
+        collected by link type and each type is fetched with a single $in query
+        (scoped to the scenario when given), then assigned back.
+        A uuid that is not found is set to None
+        """
+        await self.__connect()
 
-                if type(link_value) is not str or link_value is None:
+        # (model, attribute, link type, uuid) of every link still to resolve
+        links = []
+        for base_model in base_models:
+            for attr_name, link_type in parameter_links(type(base_model)):
+                link_value = getattr(base_model, attr_name, None)
+                if type(link_value) is not str:
                     continue
-
-                actual_value = None
-                if link_type == 'task':
-                    actual_value = await self.get_task_document(
-                        uuid_scenario=uuid_scenario,
-                        uuid=link_value
-                    )
-                elif link_type == 'resource':
-                    actual_value = await self.get_resource_document(
-                        uuid_scenario=uuid_scenario,
-                        uuid=link_value
-                    )
-                elif link_type == 'constraint':
-                    actual_value = await self.get_constraint_document(
-                        uuid_scenario=uuid_scenario,
-                        uuid=link_value,
-                    )
-                else:
+                if link_type not in LINK_DOCUMENTS:
                     raise Exception(f"Link type {link_type} not recognized")
+                links.append((base_model, attr_name, link_type, link_value))
+
+        if not links:
+            return
+
+        uuids_by_type: Dict[str, Set[str]] = {}
+        for _, _, link_type, link_value in links:
+            uuids_by_type.setdefault(link_type, set()).add(link_value)
+
+        link_types = list(uuids_by_type)
+        found = await asyncio.gather(*[
+            self._find_linked_documents(LINK_DOCUMENTS[link_type], uuids_by_type[link_type], uuid_scenario)
+            for link_type in link_types
+        ])
+        documents = {
+            (link_type, document.uuid): document
+            for link_type, type_documents in zip(link_types, found)
+            for document in type_documents
+        }
+
+        for base_model, attr_name, link_type, link_value in links:
+            logger.debug(f"Transforming the value of type {link_type} using uuid {link_value}")
+            setattr(base_model, attr_name, documents.get((link_type, link_value)))
+
+    async def _find_linked_documents(
+            self,
+            document_type: Type[BasePlannerSolverDocument],
+            uuids: Set[str],
+            uuid_scenario: Optional[str],
+    ) -> List[BasePlannerSolverDocument]:
+        conditions = [In(document_type.uuid, list(uuids))]
+        if uuid_scenario is not None:
+            conditions.append(document_type.scenario_uuid == uuid_scenario)
 
-                logger.debug(f"Transforming the value of type {link_type} using uuid {link_value}")
-                setattr(base_model, attr_name, actual_value)
-
-        return base_model
+        return await document_type.find(*conditions).to_list()
 
     # region task
 
@@ -152,8 +290,7 @@ class MongodbService:
         await self.__connect()
 
         return await TaskDocument.find(
-            ResourceDocument.scenario.uuid == uuid_scenario,
-            fetch_links=True
+            TaskDocument.scenario_uuid == uuid_scenario,
         ).to_list()
 
     async def get_task_document(
@@ -164,9 +301,8 @@ class MongodbService:
         await self.__connect()
 
         return await TaskDocument.find(
-            TaskDocument.scenario.uuid == uuid_scenario,
+            TaskDocument.scenario_uuid == uuid_scenario,
             TaskDocument.uuid == uuid,
-            fetch_links=True
         ).first_or_none()
 
     async def store_task_document(
@@ -200,8 +336,7 @@ class MongodbService:
 
         await TaskDocument.find(
             TaskDocument.uuid == uuid,
-            TaskDocument.scenario.uuid == uuid_scenario,
-            fetch_links=True
+            TaskDocument.scenario_uuid == uuid_scenario,
         ).delete()
 
     # endregion task
@@ -221,8 +356,7 @@ class MongodbService:
         await self.__connect()
 
         return await ConstraintDocument.find(
-            ConstraintDocument.scenario.uuid == uuid_scenario,
-            fetch_links=True,
+            ConstraintDocument.scenario_uuid == uuid_scenario,
         ).to_list()
 
     async def get_constraint_document(
@@ -233,8 +367,7 @@ class MongodbService:
         await self.__connect()
         return await ConstraintDocument.find(
             ConstraintDocument.uuid == uuid,
-            ConstraintDocument.scenario.uuid == uuid_scenario,
-            fetch_links=True
+            ConstraintDocument.scenario_uuid == uuid_scenario,
         ).first_or_none()
 
     async def store_constraint_document(
@@ -268,8 +401,7 @@ class MongodbService:
 
         await ConstraintDocument.find(
             ConstraintDocument.uuid == uuid,
-            ConstraintDocument.scenario.uuid == uuid_scenario,
-            fetch_links=True
+            ConstraintDocument.scenario_uuid == uuid_scenario,
         ).delete()
 
     async def get_constraint_document_by_uuid(self, uuid: str) -> ConstraintDocument | None:
@@ -298,8 +430,7 @@ class MongodbService:
         await self.__connect()
 
         return await ResourceDocument.find(
-            ResourceDocument.scenario.uuid == uuid_scenario,
-            fetch_links=True
+            ResourceDocument.scenario_uuid == uuid_scenario,
         ).to_list()
 
     async def get_resource_document(
@@ -310,9 +441,8 @@ class MongodbService:
         await self.__connect()
 
         return await ResourceDocument.find(
-            ResourceDocument.scenario.uuid == uuid_scenario,
+            ResourceDocument.scenario_uuid == uuid_scenario,
             ResourceDocument.uuid == uuid,
-            fetch_links=True
         ).first_or_none()
 
     async def store_resource_document(
@@ -345,9 +475,8 @@ class MongodbService:
         await self.__connect()
 
         await ResourceDocument.find(
-            ResourceDocument.scenario.uuid == uuid_scenario,
+            ResourceDocument.scenario_uuid == uuid_scenario,
             ResourceDocument.uuid == uuid,
-            fetch_links=True,
         ).delete()
 
     # endregion resource
@@ -403,8 +532,222 @@ class MongodbService:
 
         return found
 
+    async def count_scenario_entities(self, uuid_scenario: str) -> Tuple[int, int]:
+        """
+        the number of tasks and constraints of the scenario, used to route its executions by size
+        """
+        await self.__connect()
+
+        return await asyncio.gather(
+            TaskDocument.find(TaskDocument.scenario_uuid == uuid_scenario).count(),
+            ConstraintDocument.find(ConstraintDocument.scenario_uuid == uuid_scenario).count(),
+        )
+
     # endregion scenario
 
+    # region bulk
+
+    async def store_documents_bulk(
+            self,
+            scenario: ScenarioDocument,
+            items: List[Tuple[BulkItemResult, Optional[PlannerSolverBaseModel]]],
+    ) -> List[BulkItemResult]:
+        """
+        stores many tasks, resources and constraints of the scenario at once.
+        Each item comes with its result, the ones whose result already has an error
+        (e.g. they failed validation) are skipped.
+
+        An item keeps the uuid given in its data, so that the Parameter links can point
+        to the items before it in the batch as well as to the stored entities (one query
+        per link type). The documents are written with unordered insert_many,
+        bulk_chunk_size at a time, and a failed write only fails its own item
+        """
+        await self.__connect()
+
+        pending = [(result, base_model) for result, base_model in items if result.error is None]
+
+        # the uuids of the batch are known before anything is written
+        batch: Dict[Tuple[str, str], BulkItemResult] = {}
+        for result, base_model in pending:
+            if base_model.uuid is None:
+                base_model.uuid = str(uuid4())
+            if (result.kind, base_model.uuid) in batch:
+                result.error = f"Duplicate {result.kind} uuid {base_model.uuid} in the batch"
+            else:
+                batch[(result.kind, base_model.uuid)] = result
+
+        uuids_by_type: Dict[str, Set[str]] = {}
+        for result, base_model in pending:
+            for attr_name, link_type in parameter_links(type(base_model)):
+                link_value = getattr(base_model, attr_name, None)
+                if type(link_value) is str and (link_type, link_value) not in batch:
+                    uuids_by_type.setdefault(link_type, set()).add(link_value)
+
+        link_types = list(uuids_by_type)
+        found = await asyncio.gather(*[
+            self._find_linked_documents(LINK_DOCUMENTS[link_type], uuids_by_type[link_type], scenario.uuid)
+            for link_type in link_types
+        ])
+        linked: Dict[Tuple[str, str], BasePlannerSolverDocument] = {
+            (link_type, document.uuid): document
+            for link_type, type_documents in zip(link_types, found)
+            for document in type_documents
+        }
+
+        documents: List[Tuple[BulkItemResult, BasePlannerSolverDocument]] = []
+        for result, base_model in pending:
+            if result.error is None:
+                result.error = self._link_bulk_item(base_model, batch, linked)
+            if result.error is not None:
+                continue
+
+            try:
+                document = LINK_DOCUMENTS[result.kind].from_base_model(base_model)
+            except TypeException as e:
+                result.error = str(e)
+                continue
+            # the id is set here, so that the items after it can embed it as a link
+            document.id = PydanticObjectId()
+            document.uuid = base_model.uuid
+            document.scenario = scenario
+            document.scenario_uuid = scenario.uuid
+            documents.append((result, document))
+            linked[(result.kind, document.uuid)] = document
+
+        await self._insert_bulk_documents(documents)
+
+        return [result for result, _ in items]
+
+    def _link_bulk_item(
+            self,
+            base_model: PlannerSolverBaseModel,
+            batch: Dict[Tuple[str, str], BulkItemResult],
+            linked: Dict[Tuple[str, str], BasePlannerSolverDocument],
+    ) -> Optional[str]:
+        """
+        points the links of the item to the documents, returns the error if one is missing
+        """
+        for attr_name, link_type in parameter_links(type(base_model)):
+            link_value = getattr(base_model, attr_name, None)
+            if type(link_value) is not str:
+                continue
+            document = linked.get((link_type, link_value))
+            if document is None:
+                if (link_type, link_value) in batch:
+                    return f"{attr_name} links to the {link_type} {link_value}, not stored before it in the batch"
+                return f"{attr_name} links to the missing {link_type} {link_value}"
+            setattr(base_model, attr_name, document)
+        return None
+
+    async def _insert_bulk_documents(
+            self,
+            documents: List[Tuple[BulkItemResult, BasePlannerSolverDocument]],
+    ) -> None:
+        chunk_size = max(1, self.__config.bulk_chunk_size)
+
+        for document_type in LINK_DOCUMENTS.values():
+            of_type = [(result, document) for result, document in documents if type(document) is document_type]
+            for start in range(0, len(of_type), chunk_size):
+                chunk = of_type[start:start + chunk_size]
+                try:
+                    await document_type.insert_many([document for _, document in chunk], ordered=False)
+                except BulkWriteError as e:
+                    for write_error in e.details.get('writeErrors', []):
+                        chunk[write_error['index']][0].error = write_error.get('errmsg', 'write failed')
+                for result, document in chunk:
+                    if result.error is None:
+                        result.uuid = document.uuid
+
+    # endregion bulk
+
+    # region scenario graph
+
+    async def load_scenario(self, uuid_scenario: str) -> Optional[Scenario]:
+        """
+        loads a whole scenario, ready to be built by the worker: the tasks, resources and
+        constraints are read concurrently with one indexed query each, only the fields
+        needed to rebuild them, and their links are wired in memory.
+
+        Every resource is a scenario-level one (the worker keeps a single instance per uuid)
+        and is also attached to the tasks listing it in resource_uuids, the constraints are
+        attached to their task_uuid or, without one, to the scenario.
+        Returns None if the scenario doesn't exist
+        """
+        await self.__connect()
+
+        scoped = {"scenario_uuid": uuid_scenario}
+        raw_scenario, raw_tasks, raw_resources, raw_constraints = await asyncio.gather(
+            ScenarioDocument.get_pymongo_collection().find_one({"uuid": uuid_scenario}, ENTITY_PROJECTION),
+            TaskDocument.get_pymongo_collection().find(scoped, ENTITY_PROJECTION).to_list(),
+            ResourceDocument.get_pymongo_collection().find(scoped, ENTITY_PROJECTION).to_list(),
+            ConstraintDocument.get_pymongo_collection().find(scoped, ENTITY_PROJECTION).to_list(),
+        )
+
+        if raw_scenario is None:
+            return None
+
+        # the uuid of every entity by its object id, for the links stored as DBRef
+        uuids_by_id = {
+            raw["_id"]: raw["uuid"]
+            for raws in (raw_tasks, raw_resources, raw_constraints)
+            for raw in raws
+        }
+        index: Dict[str, Dict[str, PlannerSolverBaseModel]] = {'task': {}, 'resource': {}, 'constraint': {}}
+        links = []
+
+        def rebuild(raw: Dict[str, Any], link_type: Optional[str]) -> Any:
+            model_type = self.__types_service.get(raw["type"])
+            data = dict(raw.get("data") or {})
+            # the links are wired once everything is rebuilt, the stored snapshots are not validated
+            stored_links = [
+                (attr_name, target_type, data.pop(attr_name))
+                for attr_name, target_type in parameter_links(model_type)
+                if attr_name in data
+            ]
+
+            base_model = model_type.model_validate(data | {"uuid": raw["uuid"]})
+            links.extend((base_model, *stored_link) for stored_link in stored_links)
+            if link_type is not None:
+                index[link_type][raw["uuid"]] = base_model
+            return base_model
+
+        scenario: Scenario = rebuild(raw_scenario, None)
+        for raw in raw_tasks:
+            scenario.add_task(rebuild(raw, 'task'))
+        resources = [rebuild(raw, 'resource') for raw in raw_resources]
+        constraints = [rebuild(raw, 'constraint') for raw in raw_constraints]
+
+        for base_model, attr_name, target_type, value in links:
+            target_uuid = _link_uuid(value, uuids_by_id)
+            target = index.get(target_type, {}).get(target_uuid)
+            if target is None:
+                logger.warning(f"{attr_name} of {base_model.uuid} links to the missing {target_type} {target_uuid}")
+            setattr(base_model, attr_name, target)
+
+        for task in index['task'].values():
+            for resource_uuid in task.resource_uuids:
+                if resource_uuid not in index['resource']:
+                    logger.warning(f"task {task.uuid} runs on the missing resource {resource_uuid}")
+                    continue
+                task.add_resource(index['resource'][resource_uuid])
+
+        for resource in resources:
+            scenario.add_resource(resource)
+        for constraint in constraints:
+            if constraint.task_uuid is None:
+                scenario.add_constraint(constraint)
+            elif constraint.task_uuid in index['task']:
+                index['task'][constraint.task_uuid].add_constraint(constraint)
+            else:
+                logger.warning(f"constraint {constraint.uuid} is attached to the missing task {constraint.task_uuid}")
+
+        logger.debug(f"Loaded scenario {uuid_scenario}: {len(raw_tasks)} tasks, "
+                     f"{len(raw_resources)} resources, {len(raw_constraints)} constraints")
+
+        return scenario
+
+    # endregion scenario graph
+
     # region execution
 
     async def get_scenario_execution_document(
@@ -415,13 +758,32 @@ class MongodbService:
         await self.__connect()
 
         found = await ExecutionDocument.find(
-            ExecutionDocument.scenario.uuid == uuid_scenario,
+            ExecutionDocument.scenario_uuid == uuid_scenario,
             ExecutionDocument.uuid == uuid,
-            fetch_links=True
         ).first_or_none()
 
+        # the api returns the execution with its scenario
+        if found is not None:
+            await found.fetch_all_links()
+
         return found
 
+    async def get_last_successful_execution_document(
+            self,
+            uuid_scenario: str,
+    ) -> ExecutionDocument | None:
+        """
+        the most recent execution of the scenario that produced a plan
+        """
+        await self.__connect()
+
+        return await ExecutionDocument.find(
+            ExecutionDocument.scenario_uuid == uuid_scenario,
+            In(ExecutionDocument.status, [WorkerTaskOutputStatus.OPTIMAL, WorkerTaskOutputStatus.FEASIBLE]),
+        ).sort(
+            (ExecutionDocument.updated_at, pymongo.DESCENDING)
+        ).first_or_none()
+
     async def store_scenario_execution_document(
             self,
             uuid_scenario: str,
@@ -441,6 +803,48 @@ class MongodbService:
 
         return stored_document
 
+    async def update_scenario_execution_document(
+            self,
+            uuid_scenario: str,
+            uuid: str,
+            values: Dict[str, Any]
+    ) -> ExecutionDocument:
+        """
+        sets the given fields on an existing execution, in a single round trip.
+        The returned execution has its scenario link not fetched
+        """
+        await self.__connect()
+
+        # the update skips the before_event hooks, updated_at is set here
+        updated = await ExecutionDocument.find_one(
+            ExecutionDocument.scenario_uuid == uuid_scenario,
+            ExecutionDocument.uuid == uuid,
+        ).update({"$set": values | {"updated_at": datetime.now()}}, response_type=UpdateResponse.NEW_DOCUMENT)
+
+        if not updated:
+            raise DocumentNotFound(f"Execution not found for uuid {uuid}")
+
+        return updated
+
+    async def push_scenario_execution_incumbent(
+            self,
+            uuid_scenario: str,
+            uuid: str,
+            incumbent: IncumbentSolution
+    ) -> None:
+        """
+        appends an improving solution to the execution, without rewriting the whole document
+        """
+        await self.__connect()
+
+        result = await ExecutionDocument.find_one(
+            ExecutionDocument.scenario_uuid == uuid_scenario,
+            ExecutionDocument.uuid == uuid,
+        ).update(Push({ExecutionDocument.incumbents: incumbent.model_dump()}))
+
+        if result.matched_count == 0:
+            raise DocumentNotFound(f"Execution not found for uuid {uuid}")
+
     async def delete_scenario_execution_document(
             self,
             uuid_scenario: str,
@@ -450,8 +854,7 @@ class MongodbService:
 
         await ExecutionDocument.find(
             ExecutionDocument.uuid == uuid,
-            ExecutionDocument.scenario.uuid == uuid_scenario,
-            fetch_links=True
+            ExecutionDocument.scenario_uuid == uuid_scenario,
         ).delete()
 
     # endregion execution
@@ -0,0 +1,314 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List, Deque
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+from planner_solver.config.models import RabbitmqConfig
+from planner_solver.services.metrics_service import MetricsService
+from planner_solver.services.rabbitmq_service import RabbitmqService, pika_call, trigger_queue, INCUMBENT_EXCHANGE, \
+    CONTROL_EXCHANGE
+
+logger = logging.getLogger(__name__)
+
+
+class PublishException(Exception):
+    """
+    the message could not be confirmed, e.g. the connection was lost before its confirm
+    """
+    pass
+
+class PublishNackedException(PublishException):
+    """
+    the broker refused the message, it is not published again
+    """
+    pass
+
+class PendingPublish:
+    """
+    a message waiting to be written, and then confirmed by the broker
+    """
+
+    def __init__(self, exchange: str, routing_key: str, body: bytes, properties: Optional[pika.BasicProperties]):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties
+        self.confirmed: asyncio.Future = asyncio.get_running_loop().create_future()
+
+class PublisherChannel:
+    """
+    a channel in confirm mode, with the messages it published still waiting for their confirm
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.__delivery_tags = itertools.count(1)
+        self.__unconfirmed: Dict[int, PendingPublish] = {}
+
+    @property
+    def unconfirmed_count(self) -> int:
+        return len(self.__unconfirmed)
+
+    def publish(self, pending: PendingPublish) -> None:
+        self.channel.basic_publish(
+            exchange=pending.exchange,
+            routing_key=pending.routing_key,
+            body=pending.body,
+            properties=pending.properties,
+        )
+        # the broker numbers the messages of a confirm channel from 1
+        self.__unconfirmed[next(self.__delivery_tags)] = pending
+
+    def on_confirm(self, frame) -> None:
+        """
+        the broker confirms in batches: multiple covers every tag up to the given one
+        """
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        tags = [
+            tag for tag in self.__unconfirmed
+            if tag == method.delivery_tag or (method.multiple and tag <= method.delivery_tag)
+        ]
+        for tag in tags:
+            pending = self.__unconfirmed.pop(tag)
+            if pending.confirmed.done():
+                continue
+            if acked:
+                pending.confirmed.set_result(None)
+            else:
+                pending.confirmed.set_exception(PublishNackedException(f"Message to {pending.routing_key} nacked"))
+
+    def fail_all(self, error: Exception) -> None:
+        for pending in self.__unconfirmed.values():
+            if not pending.confirmed.done():
+                pending.confirmed.set_exception(error)
+        self.__unconfirmed.clear()
+
+
+class RabbitmqPublisherService:
+    """
+    an asyncio native publisher for the api process, so that publishing doesn't
+    block the event loop. The messages are queued and written in batches over a pool
+    of confirm channels, each publish waits for the confirm of its own message
+    """
+
+    def __init__(
+            self,
+            config: RabbitmqConfig,
+            rabbitmq_service: RabbitmqService,
+            metrics_service: Optional[MetricsService] = None,
+    ):
+        self.__config = config
+        self.__rabbitmq_service = rabbitmq_service
+        self.__metrics_service = metrics_service
+        self.__connection: Optional[AsyncioConnection] = None
+        self.__channels: List[PublisherChannel] = []
+        self.__connecting: Optional[asyncio.Future] = None
+        self.__queue: Optional[asyncio.Queue] = None
+        self.__flusher: Optional[asyncio.Task] = None
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        logger.info("service loaded")
+
+    # region connection
+
+    async def _connect(self) -> None:
+        """
+        opens the connection and the channel pool, once for the concurrent callers
+        """
+        if self.__connection is not None and self.__connection.is_open and self.__channels:
+            return
+        if self.__connecting is not None:
+            return await asyncio.shield(self.__connecting)
+
+        self.__connecting = asyncio.get_running_loop().create_future()
+        try:
+            await self._open()
+            self.__connecting.set_result(None)
+        except Exception as e:
+            self.__connecting.set_exception(e)
+            # the waiters get the exception, nobody else has to retrieve it
+            self.__connecting.exception()
+            raise
+        finally:
+            self.__connecting = None
+
+    async def _open(self) -> None:
+        loop = asyncio.get_running_loop()
+        opened: asyncio.Future = loop.create_future()
+
+        def on_open_error(_connection, error):
+            if not opened.done():
+                opened.set_exception(PublishException(f"Could not connect to RabbitMQ: {error!r}"))
+
+        def on_close(_connection, reason):
+            if not opened.done():
+                opened.set_exception(PublishException(f"Could not connect to RabbitMQ: {reason!r}"))
+            self._on_connection_closed(reason)
+
+        connection = AsyncioConnection(
+            self.__rabbitmq_service._connection_parameters(),
+            on_open_callback=lambda _connection: opened.set_result(None),
+            on_open_error_callback=on_open_error,
+            on_close_callback=on_close,
+            custom_ioloop=loop,
+        )
+        await opened
+        self.__connection = connection
+
+        channels = []
+        for i in range(self.__config.publisher_channels):
+            channel = await pika_call(lambda callback: connection.channel(on_open_callback=callback))
+            if i == 0:
+                await self._declare(channel)
+            publisher_channel = PublisherChannel(channel)
+            await pika_call(lambda callback: channel.confirm_delivery(
+                ack_nack_callback=publisher_channel.on_confirm, callback=callback
+            ))
+            channel.add_on_close_callback(lambda _channel, reason: self._on_channel_closed(_channel, reason))
+            channels.append(publisher_channel)
+
+        self.__channels = channels
+        logger.debug(f"Publisher connected to RabbitMQ with {len(channels)} channels")
+
+    async def _declare(self, channel) -> None:
+        for size_class in self.__config.size_classes:
+            await pika_call(lambda callback, name=size_class.name: channel.queue_declare(
+                queue=trigger_queue(name),
+                durable=True,
+                arguments={'x-max-priority': self.__config.max_priority},
+                callback=callback,
+            ))
+        await pika_call(lambda callback: channel.exchange_declare(
+            exchange=INCUMBENT_EXCHANGE, exchange_type='topic', durable=True, callback=callback
+        ))
+        await pika_call(lambda callback: channel.exchange_declare(
+            exchange=CONTROL_EXCHANGE, exchange_type='fanout', durable=True, callback=callback
+        ))
+
+    def _on_connection_closed(self, reason) -> None:
+        logger.warning(f"Publisher connection closed: {reason!r}")
+        error = PublishException(f"Connection lost before the confirm: {reason!r}")
+        for publisher_channel in self.__channels:
+            publisher_channel.fail_all(error)
+        self.__channels = []
+        self.__connection = None
+
+    def _on_channel_closed(self, channel, reason) -> None:
+        for publisher_channel in list(self.__channels):
+            if publisher_channel.channel is channel:
+                logger.warning(f"Publisher channel closed: {reason!r}")
+                publisher_channel.fail_all(PublishException(f"Channel closed before the confirm: {reason!r}"))
+                self.__channels.remove(publisher_channel)
+
+    async def close(self) -> None:
+        if self.__flusher is not None:
+            self.__flusher.cancel()
+            self.__flusher = None
+        if self.__connection is not None and self.__connection.is_open:
+            self.__connection.close()
+
+    # endregion connection
+
+    # region batches
+
+    def _start_flusher(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self.__loop is not loop:
+            # the connection lives on the loop that opened it
+            self.__loop = loop
+            self.__connection, self.__channels, self.__connecting, self.__flusher = None, [], None, None
+        if self.__flusher is None or self.__flusher.done():
+            self.__queue = asyncio.Queue()
+            self.__flusher = asyncio.create_task(self._flush_forever(self.__queue))
+        return self.__queue
+
+    async def _flush_forever(self, queue: asyncio.Queue) -> None:
+        while True:
+            batch = deque([await queue.get()])
+            while len(batch) < self.__config.publisher_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            try:
+                await self._connect()
+                self._write(batch)
+            except Exception as e:
+                # only the ones left were not written, the others wait for their confirm
+                error = e if isinstance(e, PublishException) else PublishException(f"Could not write the message: {e!r}")
+                for pending in batch:
+                    if not pending.confirmed.done():
+                        pending.confirmed.set_exception(error)
+
+    def _write(self, batch: Deque[PendingPublish]) -> None:
+        """
+        spreads the batch over the channels, the least busy first, removing
+        each message from the batch once written.
+        pika buffers the frames and writes them out together
+        """
+        while batch:
+            if not self.__channels:
+                raise PublishException("No open channel to publish on")
+            min(self.__channels, key=lambda c: c.unconfirmed_count).publish(batch[0])
+            batch.popleft()
+
+    # endregion batches
+
+    async def publish(
+            self,
+            exchange: str,
+            routing_key: str,
+            data: Dict[str, Any],
+            properties: Optional[pika.BasicProperties] = None,
+    ) -> None:
+        """
+        publishes the message and waits for its confirm. A message lost with its
+        connection or channel is published again, up to publisher_retries times
+        """
+        body = json.dumps(data).encode('utf-8')
+        start = time.perf_counter()
+
+        for attempt in itertools.count():
+            pending = PendingPublish(exchange, routing_key, body, properties)
+            self._start_flusher().put_nowait(pending)
+            try:
+                await asyncio.wait_for(asyncio.shield(pending.confirmed), self.__config.publisher_confirm_timeout)
+                break
+            except PublishNackedException:
+                raise
+            except PublishException as e:
+                if attempt >= self.__config.publisher_retries:
+                    raise
+                logger.warning(f"Publishing to {routing_key} again: {e}")
+            except asyncio.TimeoutError:
+                raise PublishException(f"No confirm for the message to {routing_key}")
+
+        if self.__metrics_service is not None:
+            self.__metrics_service.rabbitmq_publish_seconds.labels(
+                destination=exchange or routing_key
+            ).observe(time.perf_counter() - start)
+
+    async def publish_execution_trigger(
+            self,
+            data: Dict[str, Any],
+            size: int = 0,
+            priority: Optional[int] = None,
+    ) -> None:
+        """
+        the async version of RabbitmqService.publish_execution_trigger
+        """
+        queue, data, priority = self.__rabbitmq_service.route_execution_trigger(data, size, priority)
+        await self.publish('', queue, {**data, "enqueued_at": time.time()}, pika.BasicProperties(
+            delivery_mode=2,  # Make message persistent
+            priority=priority,
+        ))
+
+    async def publish_execution_control(self, data: Dict[str, Any]) -> None:
+        """
+        the async version of RabbitmqService.publish_execution_control
+        """
+        await self.publish(CONTROL_EXCHANGE, '', data)
@@ -1,72 +1,344 @@
 import json
 import logging
 import asyncio
-from typing import Dict, Any, Callable
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional, List, Set, Tuple
 
 import pika
-from planner_solver.config.models import RabbitmqConfig
+from pika.adapters.asyncio_connection import AsyncioConnection
+from planner_solver.config.models import RabbitmqConfig, RabbitmqSizeClassConfig, RabbitmqConsumerConfig
+from planner_solver.services.metrics_service import MetricsService
 
 logger = logging.getLogger(__name__)
 
+TRIGGER_QUEUE = 'execution_trigger'
+"""prefix of the trigger queues, one per size class"""
+INCUMBENT_EXCHANGE = 'execution_incumbent'
+"""topic exchange, the routing key is the execution uuid"""
+CONTROL_EXCHANGE = 'execution_control'
+"""fanout exchange, every runner receives the cancels as it is not known which one runs the execution"""
+
 class RabbitmqService:
     """
     a singleton to handle the communication with rabbitmq
     """
 
-    def __init__(self, config: RabbitmqConfig):
+    def __init__(self, config: RabbitmqConfig, metrics_service: Optional[MetricsService] = None):
         self.__config = config
-        self.__connection = None
-        self.__channel = None
+        self.__metrics_service = metrics_service
+        # a blocking connection is not thread safe: every publishing thread
+        # (consumer threads, the executor of the event loop) gets its own
+        self.__local = threading.local()
+        self.__connections: List[pika.BlockingConnection] = []
+        self.__connections_lock = threading.Lock()
+        # the incumbents are published apart from the default executor of the loop, taken by the solves
+        self.__publish_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='publish')
         logger.info("service loaded")
         logger.debug("host: " + str(config.connection.host) + ":" + str(config.connection.port))
 
-    def _get_connection(self):
-        """Establish connection to RabbitMQ if not already connected"""
-        if self.__connection is None or self.__connection.is_closed:
-            credentials = pika.PlainCredentials(
+    def _get_channel(self):
+        """The publishing channel of the calling thread, connected to RabbitMQ if not already"""
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None or connection.is_closed:
+            connection = pika.BlockingConnection(self._connection_parameters())
+            channel = connection.channel()
+            # Declare the execution_trigger queues as persistent
+            self._declare_trigger_queues(channel)
+            # and the exchange where the improving solutions are streamed
+            channel.exchange_declare(exchange=INCUMBENT_EXCHANGE, exchange_type='topic', durable=True)
+            # and the one of the execution controls
+            channel.exchange_declare(exchange=CONTROL_EXCHANGE, exchange_type='fanout', durable=True)
+            self.__local.connection = connection
+            self.__local.channel = channel
+            with self.__connections_lock:
+                self.__connections = [c for c in self.__connections if not c.is_closed] + [connection]
+            logger.debug(f"Connected to RabbitMQ from thread {threading.current_thread().name}")
+        return self.__local.channel
+
+    def _connection_parameters(self) -> pika.ConnectionParameters:
+        return pika.ConnectionParameters(
+            host=self.__config.connection.host,
+            port=int(self.__config.connection.port),
+            credentials=pika.PlainCredentials(
                 self.__config.connection.username,
                 self.__config.connection.password
             )
-            parameters = pika.ConnectionParameters(
-                host=self.__config.connection.host,
-                port=int(self.__config.connection.port),
-                credentials=credentials
+        )
+
+    def _declare_trigger_queues(self, channel) -> None:
+        for size_class in self.__config.size_classes:
+            channel.queue_declare(
+                queue=trigger_queue(size_class.name),
+                durable=True,
+                arguments={'x-max-priority': self.__config.max_priority}
             )
-            self.__connection = pika.BlockingConnection(parameters)
-            self.__channel = self.__connection.channel()
-            # Declare the execution_trigger queue as persistent
-            self.__channel.queue_declare(queue='execution_trigger', durable=True)
-            logger.debug("Connected to RabbitMQ")
-
-    def _publish_message(self, data: Dict[str, Any]) -> None:
-        """Publish a message to the execution_trigger queue"""
-        body = json.dumps(data)
-        self._get_connection()
 
-        self.__channel.basic_publish(
+    # region routing
+
+    def size_class_for(self, size: int) -> RabbitmqSizeClassConfig:
+        """
+        the first class fitting the scenario size (tasks plus constraints)
+        """
+        for size_class in self.__config.size_classes:
+            if size_class.max_size is None or size <= size_class.max_size:
+                return size_class
+        return self.__config.size_classes[-1]
+
+    def priority_for(self, size: int, size_class: RabbitmqSizeClassConfig) -> int:
+        """
+        shortest first within the class: the priority decreases linearly with the size
+        """
+        lower = 0
+        for other in self.__config.size_classes:
+            if other is size_class:
+                break
+            lower = other.max_size
+        if size_class.max_size is None:
+            # the open class splits its sizes in steps as wide as the class below it
+            width = max(1, lower)
+        else:
+            width = max(1, size_class.max_size - lower)
+        step = (size - lower) * (self.__config.max_priority + 1) // width
+        return max(0, self.__config.max_priority - step)
+
+    # endregion routing
+
+    def _observe_publish(self, destination: str, start: float) -> None:
+        if self.__metrics_service is not None:
+            self.__metrics_service.rabbitmq_publish_seconds.labels(destination=destination).observe(time.perf_counter() - start)
+
+    def _observe_queue_wait(self, queue: str, data: Dict[str, Any]) -> None:
+        """the enqueued_at epoch is set by the publisher, clocks are expected in sync"""
+        if self.__metrics_service is not None and isinstance(data.get('enqueued_at'), (int, float)):
+            wait = max(0.0, time.time() - data['enqueued_at'])
+            self.__metrics_service.queue_wait_seconds.labels(queue=queue).observe(wait)
+
+    def _publish_message(self, queue: str, data: Dict[str, Any], priority: int) -> None:
+        """Publish a message to one of the execution_trigger queues"""
+        body = json.dumps({**data, "enqueued_at": time.time()})
+        channel = self._get_channel()
+
+        start = time.perf_counter()
+        channel.basic_publish(
             exchange='',
-            routing_key='execution_trigger',
+            routing_key=queue,
             body=body,
             properties=pika.BasicProperties(
                 delivery_mode=2,  # Make message persistent
+                priority=priority,
             )
         )
-        logger.debug(f"Published message to execution_trigger queue: {body}")
+        self._observe_publish(queue, start)
+        logger.debug(f"Published message to {queue} queue with priority {priority}: {body}")
+
+    def route_execution_trigger(
+            self,
+            data: Dict[str, Any],
+            size: int,
+            priority: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, Any], int]:
+        """
+        the queue of the scenario size class, the message and its priority,
+        which defaults to the one given by the size
+        """
+        size_class = self.size_class_for(size)
+        if priority is None:
+            priority = self.priority_for(size, size_class)
+        priority = min(max(priority, 0), self.__config.max_priority)
+
+        return (
+            trigger_queue(size_class.name),
+            {**data, "size": size, "size_class": size_class.name, "priority": priority},
+            priority,
+        )
+
+    def publish_execution_trigger(
+            self,
+            data: Dict[str, Any],
+            size: int = 0,
+            priority: Optional[int] = None,
+    ) -> None:
+        """
+        Public method to publish to the execution_trigger queue of the scenario size class,
+        priority defaults to the one given by the size
+        """
+        queue, data, priority = self.route_execution_trigger(data, size, priority)
+        self._publish_message(queue=queue, data=data, priority=priority)
 
-    def publish_execution_trigger(self, data: Dict[str, Any]) -> None:
-        """Public method to publish to execution_trigger queue"""
-        self._publish_message(data)
+    def publish_incumbent(self, uuid_execution: str, data: Dict[str, Any]) -> None:
+        """Publish an improving solution to the incumbent exchange, routed by execution"""
+        body = json.dumps(data)
+        channel = self._get_channel()
+
+        start = time.perf_counter()
+        channel.basic_publish(
+            exchange=INCUMBENT_EXCHANGE,
+            routing_key=uuid_execution,
+            body=body,
+        )
+        self._observe_publish(INCUMBENT_EXCHANGE, start)
+        logger.debug(f"Published incumbent for execution {uuid_execution}")
+
+    async def publish_incumbent_async(self, uuid_execution: str, data: Dict[str, Any]) -> None:
+        """
+        publish_incumbent from an event loop, on the publishing thread of the service: it never
+        waits for a free thread of the default executor, and the incumbents keep their order
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            self.__publish_executor,
+            functools.partial(self.publish_incumbent, uuid_execution, data),
+        )
+
+    def publish_execution_control(self, data: Dict[str, Any]) -> None:
+        """Publish a control message (e.g. a cancel) to all the runners"""
+        body = json.dumps(data)
+        channel = self._get_channel()
+
+        start = time.perf_counter()
+        channel.basic_publish(
+            exchange=CONTROL_EXCHANGE,
+            routing_key='',
+            body=body,
+        )
+        self._observe_publish(CONTROL_EXCHANGE, start)
+        logger.debug(f"Published execution control: {body}")
+
+    def forward_legacy_triggers(self) -> int:
+        """
+        moves the messages left in the single execution_trigger queue of the older
+        versions to the queue of their size class, then deletes it.
+        Returns the forwarded messages
+        """
+        connection = pika.BlockingConnection(self._connection_parameters())
+        try:
+            channel = connection.channel()
+            try:
+                channel.queue_declare(queue=TRIGGER_QUEUE, passive=True)
+            except pika.exceptions.ChannelClosedByBroker:
+                logger.info(f"No legacy {TRIGGER_QUEUE} queue to forward")
+                return 0
+            self._declare_trigger_queues(channel)
+
+            forwarded = 0
+            while True:
+                method, properties, body = channel.basic_get(queue=TRIGGER_QUEUE)
+                if method is None:
+                    break
+                data = json.loads(body)
+                # the older messages carry no size, they are routed as the smallest
+                queue, data, priority = self.route_execution_trigger(data, data.get('size', 0), data.get('priority'))
+                channel.basic_publish(
+                    exchange='',
+                    routing_key=queue,
+                    body=json.dumps(data),
+                    properties=pika.BasicProperties(delivery_mode=2, priority=priority)
+                )
+                channel.basic_ack(delivery_tag=method.delivery_tag)
+                forwarded += 1
+
+            channel.queue_delete(queue=TRIGGER_QUEUE, if_empty=True)
+            logger.info(f"Forwarded {forwarded} messages of the legacy {TRIGGER_QUEUE} queue")
+            return forwarded
+        finally:
+            if connection.is_open:
+                connection.close()
+
+    def start_control_consumer(self, callback_function: Callable[[Dict[str, Any]], None]) -> threading.Thread:
+        """
+        Consume the control messages on a daemon thread, with its own connection
+        (the blocking connection of the triggers cannot be shared across threads).
+        Each runner gets an exclusive queue, dropped when it disconnects: the thread
+        reconnects after reconnect_delay, the controls sent meanwhile are lost
+        """
+        def consume():
+            while True:
+                try:
+                    self._consume_controls(callback_function)
+                    logger.warning("Lost the connection of the execution controls")
+                except pika.exceptions.AMQPError as e:
+                    logger.error(f"Could not consume the execution controls: {e!r}")
+                time.sleep(self.__config.reconnect_delay)
+
+        thread = threading.Thread(target=consume, name='execution-control', daemon=True)
+        thread.start()
+        return thread
+
+    def _consume_controls(self, callback_function: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        consumes the control messages until the connection is closed
+        """
+        connection = pika.BlockingConnection(self._connection_parameters())
+        try:
+            channel = connection.channel()
+            channel.exchange_declare(exchange=CONTROL_EXCHANGE, exchange_type='fanout', durable=True)
+            queue = channel.queue_declare(queue='', exclusive=True).method.queue
+            channel.queue_bind(exchange=CONTROL_EXCHANGE, queue=queue)
+
+            def wrapper(ch, method, properties, body):
+                try:
+                    callback_function(json.loads(body))
+                except Exception as e:
+                    # a control is best effort, it must not stop the consumer
+                    logger.error(f"Error processing control message: {e}")
+
+            channel.basic_consume(queue=queue, on_message_callback=wrapper, auto_ack=True)
+            logger.info("Starting to consume messages from the execution_control exchange...")
+            channel.start_consuming()
+        finally:
+            if connection.is_open:
+                connection.close()
 
     def start_consuming_async(self, async_callback_function: Callable) -> None:
-        """Start consuming messages from the execution_trigger queue with async support"""
-        self._get_connection()
+        """
+        Start consuming messages from the execution_trigger queues of the configured size classes,
+        with async support. Each consumer has its own connection and thread, so that the classes
+        don't wait on each other
+        """
+        consumers = self.__config.consumers
+        known = {size_class.name for size_class in self.__config.size_classes}
+        unknown = [consumer.size_class for consumer in consumers if consumer.size_class not in known]
+        if unknown:
+            raise ValueError(f"Unknown size classes {unknown}")
+
+        threads: List[threading.Thread] = []
+        for consumer in consumers:
+            for i in range(consumer.concurrency):
+                thread = threading.Thread(
+                    target=self._consume_trigger_queue,
+                    args=(consumer, async_callback_function),
+                    name=f"trigger-{consumer.size_class}-{i}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        logger.info(f"Consuming {', '.join(c.size_class for c in consumers)} triggers with {len(threads)} consumers")
+        logger.info("To stop consuming, press CTRL+C")
+
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            logger.info("Stopping consumer...")
+            self.close()
+
+    def _consume_trigger_queue(self, consumer: RabbitmqConsumerConfig, async_callback_function: Callable) -> None:
+        """a blocking consumer, on the calling thread"""
+        queue = trigger_queue(consumer.size_class)
+        connection = pika.BlockingConnection(self._connection_parameters())
+        channel = connection.channel()
+        self._declare_trigger_queues(channel)
 
         def wrapper(ch, method, properties, body):
             """Wrapper to handle async message processing and acknowledgment"""
             try:
                 # Parse the JSON message
                 data = json.loads(body)
-                logger.info(f"Received message: {data}")
+                logger.info(f"Received message from {queue}: {data}")
+                self._observe_queue_wait(queue, data)
 
                 # Run the async callback in the event loop
                 loop = asyncio.new_event_loop()
@@ -85,64 +357,169 @@ class RabbitmqService:
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
         # Set up the consumer
-        self.__channel.basic_qos(prefetch_count=1)  # Process one message at a time
-        self.__channel.basic_consume(
-            queue='execution_trigger',
+        channel.basic_qos(prefetch_count=consumer.prefetch)
+        channel.basic_consume(
+            queue=queue,
             on_message_callback=wrapper
         )
 
-        logger.info("Starting to consume messages from execution_trigger queue...")
+        logger.info(f"Starting to consume messages from {queue} queue...")
+        try:
+            channel.start_consuming()
+        finally:
+            if connection.is_open:
+                connection.close()
+
+    # region event loop consumer
+
+    def start_consuming_event_loop(self, async_callback_function: Callable) -> None:
+        """
+        Start consuming the execution_trigger queues of the configured size classes on a single,
+        long lived event loop (and so a single mongodb client). Every message is handled by its own
+        asyncio task, up to the concurrency of its class, and the blocking work they offload with
+        asyncio.to_thread shares one executor as large as the total concurrency.
+        The messages are acked from the loop thread
+        """
+        consumers = self.__config.consumers
+        max_workers = sum(consumer.concurrency for consumer in consumers)
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='execution'))
+
+        logger.info(f"Consuming {', '.join(c.size_class for c in consumers)} triggers "
+                    f"on one event loop, up to {max_workers} at once")
         logger.info("To stop consuming, press CTRL+C")
 
         try:
-            self.__channel.start_consuming()
+            loop.run_until_complete(self._consume_forever(async_callback_function))
         except KeyboardInterrupt:
             logger.info("Stopping consumer...")
-            self.__channel.stop_consuming()
+        finally:
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
             self.close()
 
-    def start_consuming(self, callback_function) -> None:
-        """Start consuming messages from the execution_trigger queue (sync version)"""
-        self._get_connection()
+    async def _consume_forever(self, async_callback_function: Callable) -> None:
+        while True:
+            try:
+                await self._consume_connection(async_callback_function)
+                logger.warning("Lost the connection to RabbitMQ")
+            except pika.exceptions.AMQPError as e:
+                logger.error(f"Could not consume from RabbitMQ: {e!r}")
+            await asyncio.sleep(self.__config.reconnect_delay)
 
-        def wrapper(ch, method, properties, body):
-            """Wrapper to handle message processing and acknowledgment"""
+    async def _consume_connection(self, async_callback_function: Callable) -> None:
+        """
+        consumes until the connection is closed. The unacked messages go back to
+        their queue with it, the running handlers are left to finish
+        """
+        loop = asyncio.get_running_loop()
+        opened: asyncio.Future = loop.create_future()
+        closed: asyncio.Future = loop.create_future()
+
+        def on_open_error(_connection, error):
+            if not opened.done():
+                opened.set_exception(pika.exceptions.AMQPConnectionError(error))
+
+        def on_close(_connection, reason):
+            if not opened.done():
+                opened.set_exception(pika.exceptions.AMQPConnectionError(reason))
+            if not closed.done():
+                closed.set_result(reason)
+
+        connection = AsyncioConnection(
+            self._connection_parameters(),
+            on_open_callback=lambda _connection: opened.set_result(None),
+            on_open_error_callback=on_open_error,
+            on_close_callback=on_close,
+            custom_ioloop=loop,
+        )
+        await opened
+
+        handlers: Set[asyncio.Task] = set()
+        for consumer in self.__config.consumers:
+            queue = trigger_queue(consumer.size_class)
+            channel = await pika_call(lambda callback: connection.channel(on_open_callback=callback))
+            for size_class in self.__config.size_classes:
+                await pika_call(lambda callback, name=size_class.name: channel.queue_declare(
+                    queue=trigger_queue(name),
+                    durable=True,
+                    arguments={'x-max-priority': self.__config.max_priority},
+                    callback=callback,
+                ))
+            await pika_call(lambda callback: channel.basic_qos(prefetch_count=consumer.prefetch, callback=callback))
+
+            semaphore = asyncio.Semaphore(consumer.concurrency)
+
+            def on_message(ch, method, properties, body, queue=queue, semaphore=semaphore):
+                handler = loop.create_task(self._handle_delivery(
+                    ch, method.delivery_tag, body, queue, semaphore, async_callback_function
+                ))
+                handlers.add(handler)
+                handler.add_done_callback(handlers.discard)
+
+            channel.basic_consume(queue=queue, on_message_callback=on_message)
+            logger.info(f"Starting to consume messages from {queue} queue...")
+
+        try:
+            await closed
+        except asyncio.CancelledError:
+            if connection.is_open:
+                connection.close()
+            raise
+
+    async def _handle_delivery(
+            self,
+            channel,
+            delivery_tag: int,
+            body: bytes,
+            queue: str,
+            semaphore: asyncio.Semaphore,
+            async_callback_function: Callable,
+    ) -> None:
+        """processes one message on the loop, acking it from the loop thread"""
+        async with semaphore:
             try:
-                # Parse the JSON message
                 data = json.loads(body)
-                logger.info(f"Received message: {data}")
+                logger.info(f"Received message from {queue}: {data}")
+                self._observe_queue_wait(queue, data)
 
-                # Call the provided callback function
-                callback_function(data)
+                await async_callback_function(data)
 
-                # Acknowledge the message after successful processing
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                if channel.is_open:
+                    channel.basic_ack(delivery_tag=delivery_tag)
 
             except Exception as e:
                 logger.error(f"Error processing message: {e}")
                 # Reject the message and don't requeue it to avoid infinite loops
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                if channel.is_open:
+                    channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
 
-        # Set up the consumer
-        self.__channel.basic_qos(prefetch_count=1)  # Process one message at a time
-        self.__channel.basic_consume(
-            queue='execution_trigger',
-            on_message_callback=wrapper
-        )
+    # endregion event loop consumer
 
-        logger.info("Starting to consume messages from execution_trigger queue...")
-        logger.info("To stop consuming, press CTRL+C")
+    def close(self) -> None:
+        """Close the connections to RabbitMQ, once the publishing threads are done"""
+        self.__publish_executor.shutdown(wait=True)
+        with self.__connections_lock:
+            connections, self.__connections = self.__connections, []
+        for connection in connections:
+            if not connection.is_closed:
+                connection.close()
+        logger.debug(f"Closed {len(connections)} RabbitMQ connections")
 
-        try:
-            self.__channel.start_consuming()
-        except KeyboardInterrupt:
-            logger.info("Stopping consumer...")
-            self.__channel.stop_consuming()
-            self.close()
+def trigger_queue(size_class: str) -> str:
+    return f"{TRIGGER_QUEUE}.{size_class}"
 
-    def close(self) -> None:
-        """Close the connection to RabbitMQ"""
-        if self.__connection and not self.__connection.is_closed:
-            self.__connection.close()
-            logger.debug("Closed RabbitMQ connection")
+async def pika_call(call: Callable[[Callable], Any]) -> Any:
+    """
+    awaits an asynchronous pika call, given the way to start it with its completion callback
+    """
+    future = asyncio.get_running_loop().create_future()
+
+    def callback(result=None):
+        if not future.done():
+            future.set_result(result)
 
+    call(callback)
+    return await future
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from typing import List, Dict, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from planner_solver.models.base_models import Resource
+
+
+class ResourceIndex:
+    """
+    the unique resources of a scenario, keyed by uuid (or by identity when
+    the resource was never stored)
+    """
+
+    def __init__(self):
+        self.__by_key: Dict[Any, Resource] = {}
+        self.resources: List[Resource] = []
+        """the canonical instances, scenario-level first"""
+        self.scenario_resources: List[Resource] = []
+        """the canonical instances of the scenario-level resources"""
+        self.duplicates_removed = 0
+
+    @staticmethod
+    def key(resource: Resource) -> Any:
+        return resource.uuid if resource.uuid is not None else id(resource)
+
+    def add(self, resource: Resource) -> Resource:
+        """
+        indexes the resource, returning its canonical instance
+        """
+        key = self.key(resource)
+        canonical = self.__by_key.get(key)
+        if canonical is None:
+            self.__by_key[key] = resource
+            self.resources.append(resource)
+            return resource
+
+        self.duplicates_removed += 1
+        return canonical
+
+    def add_scenario_resource(self, resource: Resource) -> Resource:
+        is_new = self.key(resource) not in self.__by_key
+        canonical = self.add(resource)
+        if is_new:
+            self.scenario_resources.append(canonical)
+        return canonical
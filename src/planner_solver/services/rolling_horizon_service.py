@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import logging
+from typing import List, Dict, Tuple, Optional, Hashable, TYPE_CHECKING
+
+from planner_solver.exceptions.worker_exceptions import WorkerStatusException, WorkerException
+from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.models.stored_documents import ExecutionBuildStats, ExecutionSolveStats
+from planner_solver.services.execution_control_service import ExecutionControl
+from planner_solver.services.horizon_service import SchedulingGraph
+from planner_solver.services.worker_task_service import WorkerTaskOutput, ScenarioResult
+
+if TYPE_CHECKING:
+    from planner_solver.models.base_models import Scenario, Solver, Target
+    from planner_solver.services.worker_service import WorkerService
+
+logger = logging.getLogger(__name__)
+
+
+class RollingWindow:
+    """
+    the tasks solved together in one step of the rolling horizon
+    """
+    task_ids: List[str]
+    frozen_ids: List[str]
+    """the early portion of the window, fixed once it is solved. The others overlap the next window"""
+
+    def __init__(self, task_ids: List[str], frozen_ids: List[str]):
+        self.task_ids = task_ids
+        self.frozen_ids = frozen_ids
+
+
+def precedence_order(graph: SchedulingGraph) -> Optional[List[str]]:
+    """
+    the tasks by earliest start, every task after its predecessors.
+    None if the precedences contain a cycle
+    """
+    order = graph.topological_order()
+    if order is None:
+        return None
+
+    heads = graph.heads(order, graph.durations)
+    # the topological position breaks the ties of zero duration predecessors
+    position = {uid: i for i, uid in enumerate(order)}
+    return sorted(order, key=lambda uid: (heads[uid], position[uid]))
+
+def rolling_windows(order: List[str], window_size: int, overlap: int) -> List[RollingWindow]:
+    """
+    slices the ordered tasks in windows of window_size tasks, each sharing overlap tasks
+    with the next one. The last window freezes all of its tasks
+    """
+    if window_size < 1 or not 0 <= overlap < window_size:
+        raise ValueError(f"Invalid rolling window {window_size} with overlap {overlap}")
+
+    windows: List[RollingWindow] = []
+    start = 0
+    while start < len(order):
+        task_ids = order[start:start + window_size]
+        if start + window_size >= len(order):
+            frozen_ids = task_ids
+        else:
+            frozen_ids = order[start:start + window_size - overlap]
+        windows.append(RollingWindow(task_ids=task_ids, frozen_ids=frozen_ids))
+        start += len(frozen_ids)
+
+    return windows
+
+
+class BoundaryConditions:
+    """
+    the frozen part of the plan, as seen by the tasks of the next windows:
+    they cannot start before the end of their frozen predecessors, nor before
+    the exclusive resources they use are freed by the frozen tasks
+    """
+
+    def __init__(self, graph: SchedulingGraph):
+        self.__graph = graph
+        self.values: Dict[str, Tuple[int, int]] = {}
+        """the (start, end) of the frozen tasks"""
+        self.__resource_free_at: Dict[Hashable, int] = {}
+
+    def freeze(self, unique_id: str, start: int, end: int) -> None:
+        self.values[unique_id] = (start, end)
+        for key in self.__graph.exclusive_resources[unique_id]:
+            if key in self.__graph.enforced_resources:
+                self.__resource_free_at[key] = max(self.__resource_free_at.get(key, 0), end)
+
+    def release_date(self, unique_id: str) -> int:
+        release_date = self.__graph.releases[unique_id]
+        for pred in self.__graph.predecessors[unique_id]:
+            if pred in self.values:
+                release_date = max(release_date, self.values[pred][1])
+        for key in self.__graph.exclusive_resources[unique_id]:
+            release_date = max(release_date, self.__resource_free_at.get(key, 0))
+        return release_date
+
+def solve_rolling(
+        worker: WorkerService,
+        scenario: Scenario,
+        solver: Solver,
+        target: Target,
+        window_size: int,
+        overlap: int = 0,
+        time_limit: Optional[float] = None,
+        hints: Optional[Dict[str, Tuple[int, int]]] = None,
+        control: Optional[ExecutionControl] = None,
+) -> WorkerTaskOutput:
+    """
+    solves a long scenario one window of window_size tasks at a time, in precedence order.
+    Each window is solved with a short time limit, its early portion is frozen and the
+    next one starts from it: its tasks get as release dates the end of their frozen
+    predecessors and of the frozen tasks on their exclusive resources.
+    The last overlap tasks of a window are solved again in the next one.
+
+    Each window is limited to time_limit seconds, when given.
+
+    The stitched plan is feasible but not proven optimal. Falls back to a single model
+    when the scenario fits a window or cannot be described as precedences.
+
+    A cancel through the control stops the running window and the ones left,
+    the scenario is then left without a plan
+    """
+    from planner_solver.models.base_models import Task
+
+    worker.fetch_resources(scenario)
+    tasks = worker.fetch_tasks(scenario)
+
+    graph = SchedulingGraph.from_scenario(scenario, tasks) if len(tasks) > window_size else None
+    order = precedence_order(graph) if graph is not None else None
+    if order is None:
+        logger.debug("Scenario solved without rolling horizon")
+        worker_input = worker.prepare_worker(scenario, solver, target, hints)
+        if control is not None:
+            control.attach(worker_input.solver)
+        return worker.solve_synchronously(worker_input, allow_unsolved=control is not None)
+
+    windows = rolling_windows(order, window_size, overlap)
+    logger.debug(f"Scenario split in {len(windows)} rolling windows")
+
+    boundary = BoundaryConditions(graph)
+    release_dates = {uid: task.get_release_date() for uid, task in graph.tasks.items()}
+    window_hints = dict(hints) if hints is not None else {}
+    outputs: List[WorkerTaskOutput] = []
+    try:
+        for window in windows:
+            if control is not None and control.cancelled.is_set():
+                break
+            window_tasks: List[Task] = [graph.tasks[uid] for uid in window.task_ids]
+            for task in window_tasks:
+                task.update_release_date(boundary.release_date(task.get_unique_id()))
+
+            # the scenario constraints reaching outside the window are boundary conditions
+            window_ids = set(window.task_ids)
+            constraints = [
+                constraint for constraint in scenario.get_constraints() or []
+                if all(
+                    linked.get_unique_id() in window_ids
+                    for precedence in constraint.get_precedences(None) for linked in precedence
+                )
+            ]
+            subscenario = scenario.create_subscenario(window_tasks, constraints, scenario.get_resources())
+            if subscenario is None:
+                raise WorkerException("The scenario cannot be split in rolling windows")
+
+            worker_input = worker.prepare_worker(subscenario, solver, target, window_hints or None)
+            if time_limit:
+                # a lower limit of the solver profile is kept
+                parameters = worker_input.solver.parameters
+                parameters.max_time_in_seconds = min(parameters.max_time_in_seconds, time_limit)
+            if control is not None:
+                control.attach(worker_input.solver)
+
+            output = worker.solve_synchronously(worker_input, allow_unsolved=control is not None)
+            outputs.append(output)
+            if output.result is None:
+                # stopped before any plan of the window, by the cancel or by the window limit
+                break
+            values = output.result.to_values()
+            for uid in window.frozen_ids:
+                boundary.freeze(uid, *values[uid])
+
+            # the overlapping tasks start from their previous plan
+            window_hints.update(values)
+    finally:
+        for uid, release_date in release_dates.items():
+            graph.tasks[uid].update_release_date(release_date)
+
+    build_stats = ExecutionBuildStats.combine([output.build_stats for output in outputs])
+    solve_stats = ExecutionSolveStats.combine([output.solve_stats for output in outputs])
+    if len(outputs) < len(windows) or outputs[-1].result is None:
+        if control is None or not control.cancelled.is_set():
+            raise WorkerStatusException(int(outputs[-1].status), 'A rolling window has no plan within its limit')
+        logger.debug(f"Rolling horizon cancelled after {len(outputs)}/{len(windows)} windows")
+        return WorkerTaskOutput(
+            wrapped_solver=None,
+            scenario=scenario,
+            status=WorkerTaskOutputStatus.UNKNOWN,
+            build_stats=build_stats,
+            solve_stats=solve_stats
+        )
+
+    result = ScenarioResult.from_values(boundary.values)
+    worker.assign_scenario_values(scenario, result, WorkerTaskOutputStatus.FEASIBLE)
+
+    return WorkerTaskOutput(
+        wrapped_solver=None,
+        scenario=scenario,
+        result=result,
+        status=WorkerTaskOutputStatus.FEASIBLE,
+        solver_profile=worker_input.solver_profile,
+        solver_parameters=output.solver_parameters,
+        build_stats=build_stats,
+        solve_stats=solve_stats
+    )
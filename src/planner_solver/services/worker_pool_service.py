@@ -0,0 +1,199 @@
+import importlib
+import logging
+import multiprocessing
+import multiprocessing.managers
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import List, Optional, Any
+
+import numpy as np
+from ortools.sat.cp_model_pb2 import CpSolverStatus
+from ortools.sat.python.cp_model import CpModel, CpSolver
+
+from planner_solver.config.models import WorkerConfig, ModuleConfig
+from planner_solver.models.stored_documents import ExecutionSolveStats
+from planner_solver.services.cpu_quota_service import available_cpu_count
+from planner_solver.services.execution_control_service import CANCEL_POLL_INTERVAL
+from planner_solver.services.instrumentation_service import read_solve_stats
+from planner_solver.services.module_loader_service import ModuleLoaderService
+from planner_solver.services.worker_task_service import WorkerTaskInput, ScenarioResult
+
+logger = logging.getLogger(__name__)
+
+
+class SerializedWorkerTask:
+    """
+    the picklable version of a WorkerTaskInput, sent to the pool processes.
+    Only the model proto, the solver parameters and the indices of the task
+    variables travel, the scenario stays in the parent process
+    """
+    model_proto: bytes
+    solver_parameters: bytes
+    start_indices: np.ndarray
+    end_indices: np.ndarray
+    """the model indices of the task variables, aligned on the scenario tasks"""
+
+    def __init__(
+            self,
+            model_proto: bytes,
+            solver_parameters: bytes,
+            start_indices: np.ndarray,
+            end_indices: np.ndarray
+    ):
+        self.model_proto = model_proto
+        self.solver_parameters = solver_parameters
+        self.start_indices = start_indices
+        self.end_indices = end_indices
+
+    @staticmethod
+    def from_worker_task_input(task: WorkerTaskInput) -> "SerializedWorkerTask":
+        start_indices, end_indices = ScenarioResult.variable_indices(task.scenario.get_tasks())
+
+        return SerializedWorkerTask(
+            model_proto=task.wrapped_model.model.proto.SerializeToString(),
+            solver_parameters=task.solver.parameters.SerializeToString(),
+            start_indices=start_indices,
+            end_indices=end_indices
+        )
+
+class SerializedWorkerResult:
+    """
+    what a pool process sends back to the parent
+    """
+    status: int
+    starts: Optional[np.ndarray]
+    ends: Optional[np.ndarray]
+    """aligned on the scenario tasks, None when no solution was found"""
+    objective: Optional[float]
+    solve_stats: Optional[ExecutionSolveStats]
+
+    def __init__(
+            self,
+            status: int,
+            starts: Optional[np.ndarray] = None,
+            ends: Optional[np.ndarray] = None,
+            objective: Optional[float] = None,
+            solve_stats: Optional[ExecutionSolveStats] = None
+    ):
+        self.status = status
+        self.starts = starts
+        self.ends = ends
+        self.objective = objective
+        self.solve_stats = solve_stats
+
+def _preload_pool_modules(module_names: List[str], module_paths: List[str]) -> None:
+    """
+    pool initializer, imports the configured modules once per child
+    (a no-op when they were already preloaded by the forkserver),
+    then the module types found in the module paths
+    """
+    for module_name in module_names:
+        importlib.import_module(module_name)
+
+    if module_paths:
+        ModuleLoaderService(ModuleConfig.model_construct(module_paths=module_paths)).load_all()
+
+def _solve_cancellable(solver: CpSolver, model: CpModel, cancelled: Any) -> CpSolverStatus:
+    """
+    solves in the pool process, stopping the search once the parent sets the cancelled event
+    """
+    done = threading.Event()
+
+    def watch():
+        while not done.is_set():
+            if cancelled.is_set():
+                solver.stop_search()
+            done.wait(CANCEL_POLL_INTERVAL)
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        return solver.solve(model)
+    finally:
+        done.set()
+        watcher.join()
+
+def solve_serialized_task(task: SerializedWorkerTask, cancelled: Optional[Any] = None) -> SerializedWorkerResult:
+    """
+    runs inside the pool process, rebuilds the model from its proto and solves it,
+    cancelled is a manager event set by the parent to stop the search
+    """
+    model = CpModel()
+    model.proto.ParseFromString(task.model_proto)
+
+    solver = CpSolver()
+    solver.parameters.ParseFromString(task.solver_parameters)
+
+    status = solver.solve(model) if cancelled is None else _solve_cancellable(solver, model, cancelled)
+
+    if status != CpSolverStatus.OPTIMAL and status != CpSolverStatus.FEASIBLE:
+        return SerializedWorkerResult(status=int(status), solve_stats=read_solve_stats(solver))
+
+    solution = np.asarray(solver.response_proto.solution, dtype=np.int64)
+    return SerializedWorkerResult(
+        status=int(status),
+        starts=solution[task.start_indices],
+        ends=solution[task.end_indices],
+        objective=solver.objective_value,
+        solve_stats=read_solve_stats(solver)
+    )
+
+class WorkerPool:
+    """
+    the process pool of the worker, booted on its first use
+    """
+
+    def __init__(self, config: WorkerConfig, module_config: Optional[ModuleConfig] = None):
+        self.__config = config
+        self.__module_config = module_config
+        self.__executor: Optional[ProcessPoolExecutor] = None
+        self.__manager: Optional[multiprocessing.managers.SyncManager] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self.__executor is None:
+            context = multiprocessing.get_context(self.__config.pool_start_method)
+            if self.__config.pool_start_method == 'forkserver':
+                context.set_forkserver_preload(self.__config.pool_preload_modules)
+
+            # resolved here, the children could run from another directory
+            module_paths = [
+                os.path.abspath(path) for path in self.__module_config.module_paths
+            ] if self.__config.pool_preload_module_types and self.__module_config is not None else []
+
+            pool_size = self.__config.pool_size or available_cpu_count()
+            self.__executor = ProcessPoolExecutor(
+                max_workers=pool_size,
+                mp_context=context,
+                initializer=_preload_pool_modules,
+                initargs=(self.__config.pool_preload_modules, module_paths),
+                max_tasks_per_child=self.__config.pool_max_tasks_per_child,
+            )
+            # serves the cancel events of the pooled executions
+            self.__manager = context.Manager()
+            logger.info(f"Process pool started with {pool_size} processes")
+
+        return self.__executor
+
+    def submit(self, task: WorkerTaskInput, cancelled: Optional[Any] = None) -> Future:
+        """
+        solves the task in a pool process, see solve_serialized_task
+        """
+        return self._get_executor().submit(
+            solve_serialized_task, SerializedWorkerTask.from_worker_task_input(task), cancelled
+        )
+
+    def cancel_event(self) -> Any:
+        """
+        an event shared with the pool processes, to stop the searches of an execution
+        """
+        self._get_executor()
+        return self.__manager.Event()
+
+    def shutdown(self) -> None:
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+            self.__manager.shutdown()
+            self.__manager = None
+            logger.info("Process pool stopped")
@@ -1,16 +1,39 @@
 from __future__ import annotations
 
-import copy
+import asyncio
 import logging
-from typing import List, TYPE_CHECKING
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional, Any, Callable, Awaitable, TYPE_CHECKING
 
+from google.protobuf import json_format
 from ortools.sat.cp_model_pb2 import CpSolverStatus
 from ortools.sat.python.cp_model import CpModel, CpSolver
 
-from planner_solver.exceptions.worker_exceptions import WorkerStatusException
+from planner_solver.config.models import WorkerConfig, ModuleConfig
+from planner_solver.exceptions.worker_exceptions import WorkerStatusException, WorkerException
 from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.models.stored_documents import IncumbentSolution, ExecutionTaskResult, ExecutionBuildStats, \
+    ExecutionSolveStats
+from planner_solver.services.decomposition_service import decompose, solve_components, split_search_workers, \
+    merge_components
+from planner_solver.services.execution_control_service import ExecutionBudget, ExecutionControl, RECENT_CANCELS
+from planner_solver.services.heuristic_service import HeuristicScheduler
+from planner_solver.services.horizon_service import HorizonEstimator, HorizonEstimate, get_horizon_estimator, \
+    tighten_time_windows, SumHorizonEstimator
+from planner_solver.services.incremental_model_service import ModelContributions, RetainedModel, \
+    RetainedModelStore, TARGET_CONTRIBUTION, recording, clone_wrapped_model
+from planner_solver.services.incumbent_service import StreamedIncumbent, IncumbentSolutionCallback
+from planner_solver.services.instrumentation_service import PhaseTimer, model_size, read_solve_stats
+from planner_solver.services.metrics_service import MetricsService
+from planner_solver.services.model_cache_service import ModelCacheService, CachedModel, ScenarioFingerprint, \
+    scenario_cache_key
 from planner_solver.services.mongodb_service import MongodbService
 from planner_solver.services.rabbitmq_service import RabbitmqService
+from planner_solver.services.resource_index_service import ResourceIndex
+from planner_solver.services.rolling_horizon_service import solve_rolling
+from planner_solver.services.worker_pool_service import WorkerPool, SerializedWorkerResult
+from planner_solver.services.worker_task_service import WorkerTaskInput, WorkerTaskOutput, ScenarioResult
 
 if TYPE_CHECKING:
     from planner_solver.models.base_models import Scenario, Solver, Resource, Task, Target, WrappedModel, Constraint, \
@@ -18,47 +41,6 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
-class WorkerTaskInput:
-    """
-    this class wraps everything needed to execute one worker task
-    it is booted directly by the worker service and then sent to be worked
-    based on the worker settings
-    """
-
-    wrapped_model: WrappedModel
-    scenario: Scenario
-    solver: CpSolver
-
-    def __init__(
-            self,
-            wrapped_model: WrappedModel,
-            scenario: Scenario,
-            solver: CpSolver
-    ):
-        self.wrapped_model = wrapped_model
-        self.scenario = scenario
-        self.solver = solver
-
-
-class WorkerTaskOutput:
-    """
-    this wraps everything that returns from a worker execution
-    on the main thread. Side effects are handled outside
-    """
-    status: WorkerTaskOutputStatus
-    wrapped_solver: WrappedSolver
-    scenario: Scenario
-
-    def __init__(
-            self,
-            status: WorkerTaskOutputStatus,
-            wrapped_solver: WrappedSolver,
-            scenario: Scenario
-    ):
-        self.status = status
-        self.wrapped_solver = wrapped_solver
-        self.scenario = scenario
-
 class WorkerService:
     """
     This service handles the solver and uses it in a scenario
@@ -69,9 +51,26 @@ class WorkerService:
             self,
             mongodb_service: MongodbService,
             rabbitmq_service: RabbitmqService,
+            config: Optional[WorkerConfig] = None,
+            horizon_estimator: Optional[HorizonEstimator] = None,
+            model_cache_service: Optional[ModelCacheService] = None,
+            metrics_service: Optional[MetricsService] = None,
+            module_config: Optional[ModuleConfig] = None,
     ):
         self.__mongodb_service = mongodb_service
         self.__rabbitmq_service = rabbitmq_service
+        self.__config = config if config is not None else WorkerConfig.model_construct()
+        self.__horizon_estimator = horizon_estimator if horizon_estimator is not None \
+            else get_horizon_estimator(self.__config.horizon_estimator)
+        self.__heuristic_scheduler = HeuristicScheduler(self.__config.heuristic_rules)
+        self.__model_cache_service = model_cache_service if model_cache_service is not None \
+            else ModelCacheService(self.__config)
+        self.__retained_models = RetainedModelStore(self.__config.incremental_models)
+        self.__pool = WorkerPool(self.__config, module_config)
+        self.__metrics_service = metrics_service
+        self.__running: Dict[str, ExecutionControl] = {}
+        self.__recent_cancels: OrderedDict[str, None] = OrderedDict()
+        self.__running_lock = threading.Lock()
 
     def _boot_model(self) -> WrappedModel:
         from planner_solver.models.base_models import WrappedModel
@@ -85,43 +84,46 @@ class WorkerService:
 
     # region resources
 
-    def _fetch_resources(
+    def fetch_resources(
             self,
             scenario: Scenario,
-    ) -> List[Resource]:
+    ) -> ResourceIndex:
         """
         returns empty resources, with both their type
         and their actual data, but without altering the current
         model nor calling their specific methods
-        """
 
-        non_unique_resources: List[Resource] = []
+        the same resource can be referenced by many tasks and by the scenario:
+        only one instance per uuid (or per identity, when not stored) is kept
+        and the tasks are pointed to it
+        """
+        resource_index = ResourceIndex()
 
-        # First I get scenario-wide resources
+        # First I get scenario-wide resources, so that they are the canonical ones
         for res in scenario.get_resources():
-            non_unique_resources.append(res)
+            resource_index.add_scenario_resource(res)
 
         # then I get task-specific resources
         for task in scenario.get_tasks():
             task_res = task.get_resources()
             if task_res and len(task_res):
-                for res in task_res:
-                    non_unique_resources.append(res)
-
-        # and finally I only consider one resource per id
-        resources: List[Resource] = []
-        # todo implement removal of extra resources
+                for res in list(task_res):
+                    canonical = resource_index.add(res)
+                    if canonical is not res:
+                        task.replace_resource(res, canonical)
 
-        return non_unique_resources
+        return resource_index
 
     def _prepare_resources(
             self,
             wrapped_model: WrappedModel,
-            resources: List[Resource]
+            resources: List[Resource],
+            contributions: Optional[ModelContributions] = None,
     ) -> List[Resource]:
         # todo if needed define a sort order here
         for res in resources:
-            res.prepare_resource(wrapped_model.model)
+            with recording(contributions, wrapped_model.model, ModelContributions.resource_key(res)):
+                res.prepare_resource(wrapped_model.model)
 
         return resources
 
@@ -129,7 +131,7 @@ class WorkerService:
 
     # region tasks
 
-    def _fetch_tasks(
+    def fetch_tasks(
             self,
             scenario: Scenario,
     ) -> List[Task]:
@@ -141,66 +143,652 @@ class WorkerService:
 
     def _evaluate_horizon(
             self,
+            scenario: Scenario,
+            tasks: List[Task],
+            target: Target,
+    ) -> HorizonEstimate:
+        """
+        the estimate of the configured estimator. Its upper bound is a feasible makespan,
+        which may cut the better plans of the targets that do not minimize it:
+        those keep the (looser) sum horizon
+        """
+        estimate = self.__horizon_estimator.estimate(scenario, tasks)
+        if target.minimizes_makespan or isinstance(self.__horizon_estimator, SumHorizonEstimator):
+            return estimate
+
+        return HorizonEstimate(
+            lower_bound=estimate.lower_bound,
+            upper_bound=max(estimate.upper_bound, SumHorizonEstimator().estimate(scenario, tasks).upper_bound)
+        )
+
+    def _tighten_task_domains(
+            self,
+            scenario: Scenario,
             tasks: List[Task],
+            horizon: int,
     ) -> int:
-        return sum(task.get_max_duration() for task in tasks)
+        """
+        preprocessing pass that narrows the time window of every task
+        based on its position in the precedence graph
+        """
+        if not self.__config.tighten_domains:
+            for task in tasks:
+                task.update_time_window(task.get_release_date(), None)
+            return 0
+
+        return tighten_time_windows(scenario, tasks, horizon)
 
     def _create_tasks_vars(
             self,
             wrapped_model: WrappedModel,
             tasks: List[Task],
             horizon: int,
+            contributions: Optional[ModelContributions] = None,
     ) -> List[Task]:
         for task in tasks:
             # first I create the task variables with their name
-            task.generate_cp_sat(wrapped_model, horizon)
+            with recording(contributions, wrapped_model.model, ModelContributions.task_key(task.get_unique_id())):
+                fixed = task.get_fixed_interval()
+                if fixed is not None:
+                    self._create_fixed_task_vars(wrapped_model, task, *fixed)
+                else:
+                    task.generate_cp_sat(wrapped_model, horizon)
 
         return tasks
 
+    def _create_fixed_task_vars(
+            self,
+            wrapped_model: WrappedModel,
+            task: Task,
+            start: int,
+            end: int,
+    ) -> None:
+        """
+        a FIXED task is folded into constants: no search variable, and a constant
+        interval that the resources see as any other
+        """
+        from planner_solver.models.base_models import CpSatTask
+
+        model = wrapped_model.model
+        unique_id = task.get_unique_id()
+        wrapped_model.variables[f"{unique_id}_start"] = model.new_constant(start)
+        wrapped_model.variables[f"{unique_id}_end"] = model.new_constant(end)
+        wrapped_model.variables[f"{unique_id}_interval"] = model.new_fixed_size_interval_var(
+            start, end - start, f"{unique_id}_interval"
+        )
+
+        task.cp_sat = CpSatTask.model_construct(
+            start=wrapped_model.variables[f"{unique_id}_start"],
+            end=wrapped_model.variables[f"{unique_id}_end"],
+            interval=wrapped_model.variables[f"{unique_id}_interval"],
+        )
+
     def _link_task_constraints(
             self,
             model: CpModel,
             tasks: List[Task],
+            contributions: Optional[ModelContributions] = None,
     ) -> None:
         """
         appends the task-defined constraints to the model
         """
+        task_ids = {task.get_unique_id() for task in tasks}
+        fixed_ids = {task.get_unique_id() for task in tasks if task.get_fixed_interval() is not None}
         for task in tasks:
             constraints = task.get_constraints()
             if constraints and len(constraints):
-                for constraint in constraints:
-                    constraint.attach_task_constraint(model, task)
+                keys = contributions.task_constraint_keys(task) if contributions is not None \
+                    else [None] * len(constraints)
+                for key, constraint in zip(keys, constraints):
+                    if self._is_skipped_constraint(constraint, task, task_ids, fixed_ids):
+                        continue
+                    with recording(contributions, model, key):
+                        constraint.attach_task_constraint(model, task)
+
+    @staticmethod
+    def _is_skipped_constraint(
+            constraint: Constraint,
+            task: Task,
+            task_ids: set,
+            fixed_ids: set,
+    ) -> bool:
+        """
+        True when the constraint is not added to the model, as it either:
+        - reaches a task that is not part of the model: it is a boundary condition
+          of a partial scenario (see solve_rolling), already carried by the release dates
+        - only links FIXED tasks, whose values are constants
+        """
+        from planner_solver.models.base_models import Task
+
+        precedences = constraint.get_precedences(task)
+        if precedences is None:
+            return False
+
+        linked_ids = [
+            linked.get_unique_id()
+            for precedence in precedences for linked in precedence if isinstance(linked, Task)
+        ]
+        if any(unique_id not in task_ids for unique_id in linked_ids):
+            return True
+        return task.get_unique_id() in fixed_ids and all(unique_id in fixed_ids for unique_id in linked_ids)
 
     def _link_task_resources(
             self,
             model: CpModel,
             tasks: List[Task],
+            contributions: Optional[ModelContributions] = None,
+            only: Optional[List[Resource]] = None,
     ):
         """
-        appends the resource-defined constraints to the model
+        appends the resource-defined constraints to the model,
+        only for the given resources if any
         """
+        allowed = {id(resource) for resource in only} if only is not None else None
         for task in tasks:
             resources = task.get_resources()
             if resources and len(resources):
+                # a task can point twice to the same canonical resource
+                attached = set()
                 for resource in resources:
-                    resource.attach_task_resource(model, task)
+                    if id(resource) in attached or (allowed is not None and id(resource) not in allowed):
+                        continue
+                    attached.add(id(resource))
+                    with recording(contributions, model, ModelContributions.resource_key(resource)):
+                        resource.attach_task_resource(model, task)
 
     # endregion tasks
 
+    # region heuristic
+
+    def _apply_heuristic_presolve(
+            self,
+            scenario: Scenario,
+            tasks: List[Task],
+            horizon_estimate: HorizonEstimate,
+            target: Target,
+    ) -> Optional[Dict[str, Tuple[int, int]]]:
+        """
+        runs the dispatching rules scheduler: its plan is returned to be used as hints and,
+        for the makespan targets, its makespan becomes the horizon when shorter than the estimate
+        """
+        schedule = self.__heuristic_scheduler.schedule(scenario, tasks)
+        if schedule is None:
+            return None
+
+        logger.debug(f"Heuristic presolve ({schedule.rule}) makespan {schedule.makespan}")
+        if target.minimizes_makespan and schedule.makespan < horizon_estimate.upper_bound:
+            horizon_estimate.upper_bound = schedule.makespan
+            horizon_estimate.lower_bound = min(horizon_estimate.lower_bound, schedule.makespan)
+
+        return HeuristicScheduler.to_values(schedule)
+
+    def solve_heuristic(
+            self,
+            scenario: Scenario,
+            control: Optional[ExecutionControl] = None,
+    ) -> WorkerTaskOutput:
+        """
+        answers with the dispatching rules plan only, without building the CpSat model.
+        Use it when latency matters more than optimality.
+        A cancel through the control skips the rules left, the best plan so far is kept
+        """
+        self.fetch_resources(scenario)
+        tasks = self.fetch_tasks(scenario)
+
+        cancelled = control.cancelled if control is not None else None
+        schedule = self.__heuristic_scheduler.schedule(scenario, tasks, cancelled)
+        if schedule is None and cancelled is not None and cancelled.is_set():
+            return WorkerTaskOutput(wrapped_solver=None, scenario=scenario, status=WorkerTaskOutputStatus.UNKNOWN)
+        if schedule is None:
+            raise WorkerException("The scenario cannot be planned by the heuristic scheduler")
+
+        result = ScenarioResult.from_values(HeuristicScheduler.to_values(schedule))
+        self.assign_scenario_values(
+            scenario=scenario,
+            result=result,
+            solver_status=WorkerTaskOutputStatus.FEASIBLE
+        )
+
+        return WorkerTaskOutput(
+            wrapped_solver=None,
+            scenario=scenario,
+            result=result,
+            status=WorkerTaskOutputStatus.FEASIBLE,
+            solver_profile=f"heuristic-{schedule.rule}",
+        )
+
+    # endregion heuristic
+
+    # region hints
+
+    async def load_warm_start_hints(
+            self,
+            uuid_scenario: str,
+    ) -> Dict[str, Tuple[int, int]]:
+        """
+        reads the task plan of the last successful execution of the scenario,
+        to be used as prepare_worker hints
+        """
+        execution = await self.__mongodb_service.get_last_successful_execution_document(uuid_scenario)
+
+        if execution is None:
+            return {}
+
+        return {
+            unique_id: (result.start, result.end)
+            for unique_id, result in execution.task_results.items()
+        }
+
+    def _apply_hints(
+            self,
+            model: CpModel,
+            tasks: List[Task],
+            hints: Dict[str, Tuple[int, int]],
+    ) -> int:
+        """
+        hints the start and end of every task still present in the scenario,
+        returns the number of hinted tasks
+        """
+        hinted = 0
+        for task in tasks:
+            hint = hints.get(task.get_unique_id())
+            if hint is None or task.get_fixed_interval() is not None:
+                continue
+
+            start, end = hint
+            model.add_hint(task.cp_sat.start, start)
+            model.add_hint(task.cp_sat.end, end)
+            hinted += 1
+
+        return hinted
+
+    # endregion hints
+
+    # region cache
+
+    def _model_cache_key(
+            self,
+            scenario: Scenario,
+            tasks: List[Task],
+            resource_index: ResourceIndex,
+            target: Target,
+    ) -> Optional[str]:
+        """
+        None when the cache is disabled or the scenario cannot be fingerprinted
+        """
+        if not self.__model_cache_service.is_enabled():
+            return None
+
+        return scenario_cache_key(
+            scenario=scenario,
+            tasks=tasks,
+            resources=resource_index.resources,
+            scenario_resources=resource_index.scenario_resources,
+            target=target,
+            settings={
+                "horizon_estimator": type(self.__horizon_estimator).__qualname__,
+                "tighten_domains": self.__config.tighten_domains,
+                "heuristic_presolve": self.__config.heuristic_presolve,
+                "heuristic_rules": list(self.__config.heuristic_rules),
+            }
+        )
+
+    def _store_cached_model(
+            self,
+            cache_key: str,
+            wrapped_model: WrappedModel,
+            tasks: List[Task],
+            heuristic_hints: Optional[Dict[str, Tuple[int, int]]],
+    ) -> None:
+        cached = CachedModel.from_built_model(wrapped_model, tasks, heuristic_hints)
+        if cached is None:
+            logger.debug("Built model not cacheable")
+            return
+
+        self.__model_cache_service.put(cache_key, cached)
+
+    def _load_cached_model(
+            self,
+            cached: CachedModel,
+            tasks: List[Task],
+            hints: Optional[Dict[str, Tuple[int, int]]],
+    ) -> Optional[WrappedModel]:
+        """
+        rebuilds the model from the cached proto and points every task to its variables,
+        returns None when the cached entry doesn't match the tasks
+        """
+        from planner_solver.models.base_models import WrappedModel, CpSatTask
+
+        if any(task.get_unique_id() not in cached.tasks for task in tasks):
+            return None
+
+        model, variables = cached.load_model()
+        for task in tasks:
+            start, end, interval = cached.tasks[task.get_unique_id()]
+            task.cp_sat = CpSatTask(
+                start=model.get_int_var_from_proto_index(start),
+                end=model.get_int_var_from_proto_index(end),
+                interval=model.get_interval_var_from_proto_index(interval) if interval >= 0 else None,
+            )
+
+        # the stored hints are the ones of the first build
+        model.clear_hints()
+        hints = hints if hints is not None else cached.hints
+        if hints:
+            hinted = self._apply_hints(model, tasks, hints)
+            logger.debug(f"Warm start hints applied to {hinted}/{len(tasks)} tasks")
+
+        return WrappedModel(
+            model=model,
+            variables=variables
+        )
+
+    # endregion cache
+
+    # region incremental
+
+    def _task_keys(
+            self,
+            fingerprint: ScenarioFingerprint,
+            tasks: List[Task],
+    ) -> Dict[str, str]:
+        return {
+            task.get_unique_id(): f"{fingerprint.entity_key(task)}:{task.get_task_status().name}:"
+                                  f"{task.get_release_date()}:{task.get_fixed_interval()}"
+            for task in tasks
+        }
+
+    def _resource_keys(
+            self,
+            fingerprint: ScenarioFingerprint,
+            tasks: List[Task],
+            resource_index: ResourceIndex,
+    ) -> Dict[Any, Tuple[str, bool, Tuple[str, ...]]]:
+        """
+        the description of every resource, with the tasks using it
+        """
+        members: Dict[int, List[str]] = {id(resource): [] for resource in resource_index.resources}
+        for task in tasks:
+            for resource in {id(res): res for res in task.get_resources() or []}.values():
+                members[id(resource)].append(task.get_unique_id())
+
+        scenario_level = {id(resource) for resource in resource_index.scenario_resources}
+        return {
+            resource.uuid: (
+                fingerprint.entity_key(resource),
+                id(resource) in scenario_level,
+                tuple(members[id(resource)])
+            )
+            for resource in resource_index.resources
+        }
+
+    def _retain_model(
+            self,
+            scenario: Scenario,
+            tasks: List[Task],
+            resource_index: ResourceIndex,
+            wrapped_model: WrappedModel,
+            contributions: ModelContributions,
+            horizon_estimate: HorizonEstimate,
+    ) -> None:
+        """
+        keeps a copy of the built model to patch it when the scenario changes
+        """
+        if any(resource.uuid is None for resource in resource_index.resources):
+            logger.debug("Scenario with unsaved resources, its model is not retained")
+            return
+
+        master = clone_wrapped_model(wrapped_model)
+        if master is None:
+            logger.debug("Built model not retainable")
+            return
+
+        self.__retained_models.put(scenario.uuid, RetainedModel(
+            wrapped_model=master,
+            contributions=contributions,
+            task_keys=self._task_keys(contributions.fingerprint, tasks),
+            task_variables={
+                task.get_unique_id(): (
+                    task.cp_sat.start.index,
+                    task.cp_sat.end.index,
+                    task.cp_sat.interval.index if task.cp_sat.interval is not None else -1
+                )
+                for task in tasks
+            },
+            resource_keys=self._resource_keys(contributions.fingerprint, tasks, resource_index),
+            horizon_estimate=horizon_estimate,
+        ))
+
+    def _patch_retained_model(
+            self,
+            retained: RetainedModel,
+            scenario: Scenario,
+            tasks: List[Task],
+            resource_index: ResourceIndex,
+            target: Target,
+            hints: Optional[Dict[str, Tuple[int, int]]],
+    ) -> Optional[WrappedModel]:
+        """
+        applies to the retained model only what changed in the scenario since it was built:
+        added and removed tasks, added and removed constraints, resources whose tasks changed.
+        The target is attached again and every task domain is set on the new horizon.
+
+        returns a copy of the patched model to be solved, or None when the scenario
+        changed too much (or in a way that cannot be patched) and has to be rebuilt
+        """
+        if any(resource.uuid is None for resource in resource_index.resources):
+            return None
+
+        # first, what changed
+        fingerprint = ScenarioFingerprint(resource_index.resources)
+        task_keys = self._task_keys(fingerprint, tasks)
+        for unique_id, key in task_keys.items():
+            if unique_id in retained.task_keys and retained.task_keys[unique_id] != key:
+                logger.debug(f"Task {unique_id} changed, the model is rebuilt")
+                return None
+
+        added_tasks = [task for task in tasks if task.get_unique_id() not in retained.task_keys]
+        removed_tasks = [unique_id for unique_id in retained.task_keys if unique_id not in task_keys]
+
+        contributions = retained.contributions
+        contributions.fingerprint = fingerprint
+
+        constraints: Dict[Any, Tuple[Optional[Task], Constraint]] = {}
+        for task in tasks:
+            for key, constraint in zip(contributions.task_constraint_keys(task), task.get_constraints() or []):
+                constraints[key] = (task, constraint)
+        for key, constraint in zip(contributions.scenario_constraint_keys(scenario), scenario.get_constraints() or []):
+            constraints[key] = (None, constraint)
+
+        previous_constraints = set(retained.constraint_keys())
+        added_constraints = [key for key in constraints if key not in previous_constraints]
+        removed_constraints = [key for key in previous_constraints if key not in constraints]
+
+        resource_keys = self._resource_keys(fingerprint, tasks, resource_index)
+        changed_resources = {
+            key for key in set(resource_keys) | set(retained.resource_keys)
+            if resource_keys.get(key) != retained.resource_keys.get(key)
+        }
+
+        delta = len(added_tasks) + len(removed_tasks) + len(added_constraints) + len(removed_constraints) \
+            + len(changed_resources)
+        if delta > max(1.0, self.__config.incremental_max_delta * len(tasks)):
+            logger.debug(f"{delta} changes since the last build, the model is rebuilt")
+            return None
+
+        # then the patch itself
+        wrapped_model = retained.wrapped_model
+        model = wrapped_model.model
+        added_ids = {task.get_unique_id() for task in added_tasks}
+        # the constants of the fixed tasks never move
+        existing_variables = [
+            retained.task_variables[task.get_unique_id()] for task in tasks
+            if task.get_unique_id() not in added_ids and task.get_fixed_interval() is None
+        ]
+
+        heuristic_hints = None
+        if not removed_tasks and not removed_constraints \
+                and all(task.get_fixed_interval() is None for task in added_tasks) \
+                and self._only_delays_added_tasks(
+                retained, resource_keys, changed_resources, added_ids, [constraints[key] for key in added_constraints]):
+            # the previous plan, followed by the new tasks one after the other, is still feasible:
+            # the horizon grows by their durations and the existing domains only need to be widened
+            # (not before their release dates)
+            upper_bound = max([retained.horizon_estimate.upper_bound] +
+                              [task.get_release_date() for task in added_tasks])
+            upper_bound += sum(task.get_max_duration() for task in added_tasks)
+            growth = upper_bound - retained.horizon_estimate.upper_bound
+            horizon_estimate = HorizonEstimate(
+                lower_bound=retained.horizon_estimate.lower_bound,
+                upper_bound=upper_bound
+            )
+            for task in added_tasks:
+                task.update_time_window(task.get_release_date(), None)
+            if growth > 0:
+                for start, end, _ in existing_variables:
+                    for index in (start, end):
+                        model.proto.variables[index].domain[-1] += growth
+        else:
+            horizon_estimate = self._evaluate_horizon(scenario, tasks, target)
+            if self.__config.heuristic_presolve:
+                heuristic_hints = self._apply_heuristic_presolve(scenario, tasks, horizon_estimate, target)
+            self._tighten_task_domains(scenario, tasks, horizon_estimate.upper_bound)
+            for task in tasks:
+                if task.get_unique_id() not in added_ids and task.get_fixed_interval() is None:
+                    start, end, _ = retained.task_variables[task.get_unique_id()]
+                    self._set_variables_domain(model, [start, end], task, horizon_estimate.upper_bound)
+        horizon = horizon_estimate.upper_bound
+
+        for unique_id in removed_tasks:
+            contributions.remove(model, ModelContributions.task_key(unique_id))
+            del retained.task_variables[unique_id]
+        for key in removed_constraints:
+            contributions.remove(model, key)
+        for key in changed_resources:
+            contributions.remove(model, ('resource', key))
+        contributions.remove(model, TARGET_CONTRIBUTION)
+
+        for task in tasks:
+            if task.get_unique_id() not in added_ids:
+                retained.bind_task(task)
+
+        self._create_tasks_vars(wrapped_model, added_tasks, horizon, contributions)
+        for task in added_tasks:
+            retained.task_variables[task.get_unique_id()] = (
+                task.cp_sat.start.index,
+                task.cp_sat.end.index,
+                task.cp_sat.interval.index if task.cp_sat.interval is not None else -1
+            )
+
+        for key in added_constraints:
+            owner, constraint = constraints[key]
+            with contributions.recording(model, key):
+                if owner is not None:
+                    constraint.attach_task_constraint(model, owner)
+                else:
+                    constraint.attach_scenario_constraint(model)
+
+        changed = [resource for resource in resource_index.resources if resource.uuid in changed_resources]
+        self._prepare_resources(wrapped_model, changed, contributions)
+        self._link_task_resources(model, tasks, contributions, only=changed)
+        self._link_scenario_resources(
+            model,
+            [resource for resource in resource_index.scenario_resources if resource.uuid in changed_resources],
+            contributions
+        )
+
+        self._link_target(model, target, horizon_estimate, tasks, contributions)
+
+        retained.task_keys = task_keys
+        retained.resource_keys = resource_keys
+        retained.horizon_estimate = horizon_estimate
+        logger.debug(f"Model patched: {len(added_tasks)} tasks added, {len(removed_tasks)} removed, "
+                     f"{len(added_constraints)} constraints added, {len(removed_constraints)} removed, "
+                     f"{len(changed_resources)} resources changed")
+
+        # the retained model stays untouched by the solve
+        patched = clone_wrapped_model(wrapped_model)
+        for task in tasks:
+            retained.bind_task(task, patched.model)
+
+        patched.model.clear_hints()
+        hints = hints if hints is not None else heuristic_hints
+        if hints:
+            hinted = self._apply_hints(patched.model, tasks, hints)
+            logger.debug(f"Warm start hints applied to {hinted}/{len(tasks)} tasks")
+
+        return patched
+
+    def _only_delays_added_tasks(
+            self,
+            retained: RetainedModel,
+            resource_keys: Dict[Any, Tuple[str, bool, Tuple[str, ...]]],
+            changed_resources: set,
+            added_ids: set,
+            added_constraints: List[Tuple[Optional[Task], Constraint]],
+    ) -> bool:
+        """
+        True when the changes only add tasks and constrain them, never the existing ones:
+        every new precedence ends on an added task, and resources only gained added tasks
+        """
+        for owner, constraint in added_constraints:
+            precedences = constraint.get_precedences(owner)
+            if precedences is None:
+                return False
+            for _, after in precedences:
+                if after.get_unique_id() not in added_ids:
+                    return False
+
+        for key in changed_resources:
+            current = resource_keys.get(key)
+            previous = retained.resource_keys.get(key, (current[0], current[1], ())) if current else None
+            if current is None or previous[:2] != current[:2]:
+                return False
+            gained = set(current[2]) - set(previous[2])
+            if not set(previous[2]) <= set(current[2]) or not gained <= added_ids:
+                return False
+
+        return True
+
+    def _set_variables_domain(
+            self,
+            model: CpModel,
+            indices: List[int],
+            task: Task,
+            horizon: int,
+    ) -> None:
+        """
+        bounds the given variables of the task within its time window
+        """
+        earliest_start, latest_end = task.get_time_window()
+        if latest_end is None or latest_end > horizon:
+            latest_end = horizon
+
+        for index in indices:
+            domain = model.proto.variables[index].domain
+            del domain[:]
+            domain.extend([earliest_start, latest_end])
+
+    # endregion incremental
+
     # region scenario
 
     def _link_scenario_constraints(
             self,
             model: CpModel,
             scenario: Scenario,
+            contributions: Optional[ModelContributions] = None,
     ) -> List[Constraint]:
         """
         appends the constraints related to the scenario to the model
         """
         scenario_constraints = scenario.get_constraints()
         if scenario_constraints and len(scenario_constraints):
-            for constraint in scenario_constraints:
-                constraint.attach_scenario_constraint(model)
+            keys = contributions.scenario_constraint_keys(scenario) if contributions is not None \
+                else [None] * len(scenario_constraints)
+            for key, constraint in zip(keys, scenario_constraints):
+                with recording(contributions, model, key):
+                    constraint.attach_scenario_constraint(model)
             return scenario_constraints
         else:
             return []
@@ -208,15 +796,16 @@ class WorkerService:
     def _link_scenario_resources(
             self,
             model: CpModel,
-            scenario: Scenario,
+            scenario_resources: List[Resource],
+            contributions: Optional[ModelContributions] = None,
     ) -> List[Resource]:
         """
         appends the constraints that the resources need to apply to the model
         """
-        scenario_resources = scenario.get_resources()
         if scenario_resources and len(scenario_resources):
             for resource in scenario_resources:
-                resource.attach_scenario_resource(model)
+                with recording(contributions, model, ModelContributions.resource_key(resource)):
+                    resource.attach_scenario_resource(model)
             return scenario_resources
         else:
             return []
@@ -229,11 +818,18 @@ class WorkerService:
             self,
             model: CpModel,
             target: Target,
-            horizon: int,
-            tasks: List[Task]
+            horizon_estimate: HorizonEstimate,
+            tasks: List[Task],
+            contributions: Optional[ModelContributions] = None,
     ) -> None:
         # todo absolutely generalize this! maybe the wrapped target?
-        target.attach_target(model, horizon, tasks)
+        with recording(contributions, model, TARGET_CONTRIBUTION):
+            target.attach_target(
+                model,
+                horizon_estimate.upper_bound,
+                tasks,
+                lower_bound=horizon_estimate.lower_bound
+            )
 
     # endregion target
 
@@ -253,61 +849,151 @@ class WorkerService:
             scenario: Scenario,
             solver: Solver,
             target: Target,
+            hints: Optional[Dict[str, Tuple[int, int]]] = None,
     ) -> WorkerTaskInput:
         """
         This creates everything for the cp_solver to work on
 
-        use this result to actually start a worker, based on the settings
+        hints are the (start, end) of each task unique id of a previous plan,
+        see load_warm_start_hints
+
+        use this result to actually start a worker, based on the settings.
+        The time spent in each phase is returned in its build_stats
         """
+        timer = PhaseTimer()
+
+        resource_index = self.fetch_resources(scenario)
+        logger.debug(f"Loaded {len(resource_index.resources)} resources "
+                     f"({resource_index.duplicates_removed} duplicates removed)")
+        timer.lap('resource_fetch')
+
+        tasks = self.fetch_tasks(scenario)
+        # the fixed tasks are folded into constants while creating the task variables
+        fixed_count = sum(1 for task in tasks if task.get_fixed_interval() is not None)
+        logger.debug(f"Loaded {len(tasks)} tasks ({fixed_count} fixed)")
+        timer.lap('task_fetch')
+
+        retainable = self.__retained_models.is_enabled() and scenario.uuid is not None
+        # taken out while patched, a failed patch could leave it half patched
+        retained = self.__retained_models.take(scenario.uuid) if retainable else None
+        if retained is not None:
+            wrapped_model = self._patch_retained_model(retained, scenario, tasks, resource_index, target, hints)
+            # a None patch left it untouched
+            self.__retained_models.put(scenario.uuid, retained)
+            timer.lap('patch')
+            if wrapped_model is not None:
+                return self._worker_input(wrapped_model, scenario, solver, timer, 'patched')
+
+        cache_key = self._model_cache_key(scenario, tasks, resource_index, target)
+        cached = self.__model_cache_service.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            wrapped_model = self._load_cached_model(cached, tasks, hints)
+            if wrapped_model is not None:
+                logger.debug(f"Model loaded from cache {cache_key}")
+                timer.lap('cache_load')
+                return self._worker_input(wrapped_model, scenario, solver, timer, 'cache')
+        timer.lap('cache_lookup')
+
         wrapped_model = self._boot_model()
         logger.debug("Created model")
 
-        # todo add preprocessor for fixed statuses
-
-        resources = self._fetch_resources(scenario)
-        logger.debug(f"Loaded {len(resources)} resources")
+        # records what each entity adds, so that the model can be patched later on
+        contributions = ModelContributions(ScenarioFingerprint(resource_index.resources)) if retainable else None
 
-        resources = self._prepare_resources(wrapped_model, resources)
+        resources = self._prepare_resources(wrapped_model, resource_index.resources, contributions)
         logger.debug(f"Prepared {len(resources)} resources")
+        timer.lap('resource_prepare')
 
-        tasks = self._fetch_tasks(scenario)
-        logger.debug(f"Loaded {len(tasks)} tasks")
+        horizon_estimate = self._evaluate_horizon(scenario, tasks, target)
+        timer.lap('horizon')
 
-        horizon = self._evaluate_horizon(tasks)
-        logger.debug(f"Set horizon as {horizon} time units")
+        heuristic_hints = None
+        if self.__config.heuristic_presolve:
+            heuristic_hints = self._apply_heuristic_presolve(scenario, tasks, horizon_estimate, target)
+            if hints is None:
+                hints = heuristic_hints
+            timer.lap('heuristic')
 
-        self._create_tasks_vars(wrapped_model, tasks, horizon)
+        horizon = horizon_estimate.upper_bound
+        logger.debug(f"Set horizon as {horizon} time units (makespan lower bound {horizon_estimate.lower_bound})")
+
+        tightened = self._tighten_task_domains(scenario, tasks, horizon)
+        logger.debug(f"Tightened the domains of {tightened}/{len(tasks)} tasks")
+        timer.lap('domains')
+
+        self._create_tasks_vars(wrapped_model, tasks, horizon, contributions)
         logger.debug(f"Task vars initialized with a total of {len(wrapped_model.variables)} variables")
+        timer.lap('task_vars')
+
+        if hints:
+            hinted = self._apply_hints(wrapped_model.model, tasks, hints)
+            logger.debug(f"Warm start hints applied to {hinted}/{len(tasks)} tasks")
+            timer.lap('hints')
 
         # from here on, actual constraints are starting to be added
 
         # first for the tasks
 
-        self._link_task_constraints(wrapped_model.model, tasks)
+        self._link_task_constraints(wrapped_model.model, tasks, contributions)
         logger.debug(f"Task constraints initialized")
+        timer.lap('task_constraints')
 
-        self._link_task_resources(wrapped_model.model, tasks)
+        self._link_task_resources(wrapped_model.model, tasks, contributions)
         logger.debug(f"Task resources initialized")
+        timer.lap('task_resources')
 
         # then for the whole scenario constraints
 
-        self._link_scenario_constraints(wrapped_model.model, scenario)
+        self._link_scenario_constraints(wrapped_model.model, scenario, contributions)
         logger.debug(f"Scenario constraints initialized")
+        timer.lap('scenario_constraints')
 
-        self._link_scenario_resources(wrapped_model.model, scenario)
+        self._link_scenario_resources(wrapped_model.model, resource_index.scenario_resources, contributions)
         logger.debug(f"Scenario resources initialized")
+        timer.lap('scenario_resources')
 
         # the target is now set
-        self._link_target(wrapped_model.model, target, horizon, tasks)
+        self._link_target(wrapped_model.model, target, horizon_estimate, tasks, contributions)
         logger.debug(f"Target set")
+        timer.lap('target')
+
+        if cache_key is not None:
+            self._store_cached_model(cache_key, wrapped_model, tasks, heuristic_hints)
+            timer.lap('cache_store')
+
+        if contributions is not None:
+            self._retain_model(scenario, tasks, resource_index, wrapped_model, contributions, horizon_estimate)
+            timer.lap('retain')
+
+        return self._worker_input(wrapped_model, scenario, solver, timer, 'built')
 
+    def _worker_input(
+            self,
+            wrapped_model: WrappedModel,
+            scenario: Scenario,
+            solver: Solver,
+            timer: PhaseTimer,
+            source: str,
+    ) -> WorkerTaskInput:
+        """
+        links the solver to the model, closing the build stats
+        """
         cp_solver = self._link_solver(wrapped_model.model, solver)
         logger.debug(f"Solver created")
+        timer.lap('solver')
+
+        build_stats = ExecutionBuildStats(source=source, phases=timer.phases, **model_size(wrapped_model.model))
+        if self.__metrics_service is not None:
+            self.__metrics_service.build_seconds.labels(source=source).observe(sum(timer.phases.values()))
+        logger.debug(f"Model {source} in {sum(timer.phases.values()):.3f}s: {build_stats.variables} variables, "
+                     f"{build_stats.constraints} constraints, {build_stats.intervals} intervals")
 
         return WorkerTaskInput(
             wrapped_model=wrapped_model,
             scenario=scenario,
-            solver=cp_solver
+            solver=cp_solver,
+            solver_profile=solver.get_profile(),
+            build_stats=build_stats
         )
 
     def _assign_scenario_results(
@@ -316,44 +1002,74 @@ class WorkerService:
             wrapped_solver: WrappedSolver,
             scenario: Scenario,
             solver_status: WorkerTaskOutputStatus
-    ) -> Scenario:
+    ) -> ScenarioResult:
         """
-        Creates a new scenario with the results obtained from the computation
+        reads the results obtained from the computation and assigns them to the scenario
         """
-        from planner_solver.models.base_models import ScenarioStatus, TaskStatus
+        self._check_solver_status(solver_status)
+
+        tasks = scenario.get_tasks()
+        start_indices, end_indices = ScenarioResult.variable_indices(tasks)
+        result = ScenarioResult.from_solution(
+            task_ids=[task.get_unique_id() for task in tasks],
+            solution=wrapped_solver.solver.response_proto.solution,
+            start_indices=start_indices,
+            end_indices=end_indices
+        )
 
-        solved_scenario = copy.deepcopy(scenario)
+        self.assign_scenario_values(scenario, result, solver_status)
+        return result
 
+    def _check_solver_status(
+            self,
+            solver_status: WorkerTaskOutputStatus
+    ) -> None:
         if (solver_status == WorkerTaskOutputStatus.UNKNOWN or
             solver_status == WorkerTaskOutputStatus.MODEL_INVALID or
             solver_status == WorkerTaskOutputStatus.INFEASIBLE):
             raise WorkerStatusException(int(solver_status), 'You should not assign scenario results if model fails')
 
+    def assign_scenario_values(
+            self,
+            scenario: Scenario,
+            result: ScenarioResult,
+            solver_status: WorkerTaskOutputStatus
+    ) -> Scenario:
+        """
+        sets the status and the result of each task of the scenario, in place
+        """
+        from planner_solver.models.base_models import ScenarioStatus, TaskStatus
+
+        self._check_solver_status(solver_status)
+
         # set the scenario status
-        solved_scenario.update_scenario_status(ScenarioStatus.SOLVED)
+        scenario.update_scenario_status(ScenarioStatus.SOLVED)
 
         # set the status for each task and block their data
-        for task in solved_scenario.get_tasks():
-            task.update_task_status(TaskStatus.PLANNED)
-
-            start = wrapped_solver.solver.value(task.cp_sat.start)
-            end = wrapped_solver.solver.value(task.cp_sat.end)
+        for task in scenario.get_tasks():
+            values = result.get(task.get_unique_id())
+            if values is None:
+                raise WorkerException(f"No result for task {task.get_unique_id()}")
 
+            # the fixed tasks keep their status, and their values
+            if task.get_task_status() != TaskStatus.FIXED:
+                task.update_task_status(TaskStatus.PLANNED)
             task.generate_result(
-                start=start,
-                end=end
+                start=values[0],
+                end=values[1]
             )
 
-        return solved_scenario
+        return scenario
 
 
     def solve_synchronously(
             self,
-            task: WorkerTaskInput
+            task: WorkerTaskInput,
+            allow_unsolved: bool = False
     ) -> WorkerTaskOutput:
         """
         solves the task without any callback during execution
-        one thread per worker
+        one thread per worker, see _build_output for allow_unsolved
         """
         from planner_solver.models.base_models import WrappedSolver
 
@@ -370,17 +1086,551 @@ class WorkerService:
         solve_status = solver.solve(model)
         logger.debug(f"Model solved with status {solve_status}")
 
+        return self._build_output(task, wrapped_solver, solve_status, allow_unsolved)
+
+    def _build_output(
+            self,
+            task: WorkerTaskInput,
+            wrapped_solver: WrappedSolver,
+            solve_status: CpSolverStatus,
+            allow_unsolved: bool = False
+    ) -> WorkerTaskOutput:
+        """
+        allow_unsolved returns an output without result when the search stopped
+        before finding a solution, instead of raising
+        """
         worker_solver_status = WorkerTaskOutputStatus.from_cp_status(solve_status)
 
-        result_scenario = self._assign_scenario_results(
+        if allow_unsolved and worker_solver_status == WorkerTaskOutputStatus.UNKNOWN:
+            solve_stats = read_solve_stats(wrapped_solver.solver)
+            self._observe_solve(worker_solver_status, solve_stats)
+            return WorkerTaskOutput(
+                wrapped_solver=wrapped_solver,
+                scenario=task.scenario,
+                status=worker_solver_status,
+                solver_profile=task.solver_profile,
+                solver_parameters=self._dump_solver_parameters(wrapped_solver.solver),
+                build_stats=task.build_stats,
+                solve_stats=solve_stats
+            )
+
+        result = self._assign_scenario_results(
             wrapped_model=task.wrapped_model,
             wrapped_solver=wrapped_solver,
-            scenario=scenario,
+            scenario=task.scenario,
             solver_status=worker_solver_status
         )
 
+        solve_stats = read_solve_stats(wrapped_solver.solver)
+        self._observe_solve(worker_solver_status, solve_stats)
+
         return WorkerTaskOutput(
             wrapped_solver=wrapped_solver,
-            scenario=result_scenario,
-            status=worker_solver_status
-        )
\ No newline at end of file
+            scenario=task.scenario,
+            result=result,
+            status=worker_solver_status,
+            solver_profile=task.solver_profile,
+            solver_parameters=self._dump_solver_parameters(wrapped_solver.solver),
+            objective=wrapped_solver.solver.objective_value,
+            build_stats=task.build_stats,
+            solve_stats=solve_stats
+        )
+
+    def _observe_solve(self, status: WorkerTaskOutputStatus, solve_stats: Optional[ExecutionSolveStats]) -> None:
+        if self.__metrics_service is not None and solve_stats is not None:
+            self.__metrics_service.solve_seconds.labels(status=status.name).observe(solve_stats.wall_time)
+
+    # region decomposition
+
+    def _decompose(
+            self,
+            scenario: Scenario,
+            target: Target,
+    ) -> Optional[List[Scenario]]:
+        """
+        the independent components of the scenario, see decompose, None when the decomposition is off
+        """
+        if not self.__config.decomposition:
+            return None
+        return decompose(self, scenario, target)
+
+    def _prepare_components(
+            self,
+            subscenarios: List[Scenario],
+            solver: Solver,
+            target: Target,
+            hints: Optional[Dict[str, Tuple[int, int]]] = None,
+    ) -> List[WorkerTaskInput]:
+        return [self.prepare_worker(subscenario, solver, target, hints) for subscenario in subscenarios]
+
+    def solve_decomposed(
+            self,
+            scenario: Scenario,
+            solver: Solver,
+            target: Target,
+            hints: Optional[Dict[str, Tuple[int, int]]] = None,
+    ) -> WorkerTaskOutput:
+        """
+        splits the scenario in its independent components, builds and solves each one
+        on its own model in parallel, then merges their plans and objectives.
+
+        Resources are expected to only restrict the tasks they are attached to.
+        Falls back to a single model when the scenario cannot be split, see decompose
+        """
+        subscenarios = self._decompose(scenario, target)
+        if subscenarios is None:
+            return self.solve_synchronously(self.prepare_worker(scenario, solver, target, hints))
+
+        worker_inputs = self._prepare_components(subscenarios, solver, target, hints)
+        return solve_components(self, scenario, target, worker_inputs)
+
+    # endregion decomposition
+
+    # region rolling horizon
+
+    def solve_rolling(
+            self,
+            scenario: Scenario,
+            solver: Solver,
+            target: Target,
+            window_size: int,
+            overlap: int = 0,
+            window_time_limit: Optional[float] = None,
+            hints: Optional[Dict[str, Tuple[int, int]]] = None,
+            control: Optional[ExecutionControl] = None,
+    ) -> WorkerTaskOutput:
+        """
+        solves a long scenario one window of window_size tasks at a time, see solve_rolling
+        of the rolling horizon service. The windows get the rolling_window_time_limit of the
+        worker when no window_time_limit is given
+        """
+        time_limit = window_time_limit if window_time_limit is not None else self.__config.rolling_window_time_limit
+        return solve_rolling(self, scenario, solver, target, window_size, overlap, time_limit, hints, control)
+
+    # endregion rolling horizon
+
+    async def _emit_incumbent(
+            self,
+            uuid_scenario: str,
+            uuid_execution: str,
+            streamed: StreamedIncumbent
+    ) -> None:
+        await self.__mongodb_service.push_scenario_execution_incumbent(
+            uuid_scenario=uuid_scenario,
+            uuid=uuid_execution,
+            incumbent=streamed.incumbent
+        )
+        # the publish is blocking, it runs on the publishing thread and not on the loop
+        await self.__rabbitmq_service.publish_incumbent_async(
+            uuid_execution=uuid_execution,
+            data={
+                "uuid_scenario": uuid_scenario,
+                "uuid_execution": uuid_execution,
+                "objective": streamed.incumbent.objective,
+                "bound": streamed.incumbent.bound,
+                "wall_time": streamed.incumbent.wall_time,
+                "tasks": {
+                    unique_id: {"start": start, "end": end}
+                    for unique_id, (start, end) in streamed.values.items()
+                },
+            }
+        )
+
+    async def solve_streaming(
+            self,
+            task: WorkerTaskInput,
+            uuid_scenario: str,
+            uuid_execution: str,
+            control: Optional[ExecutionControl] = None,
+    ) -> WorkerTaskOutput:
+        """
+        solves the task on a separate thread, streaming the improving solutions
+        to the execution document and to the incumbent exchange while the search runs.
+
+        The streamed solutions are throttled by the worker incumbent_min_interval.
+        With a control the search can be cancelled, and stopping with no solution is not an error
+        """
+        from planner_solver.models.base_models import WrappedSolver
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[Optional[StreamedIncumbent]] = asyncio.Queue()
+
+        callback = IncumbentSolutionCallback(
+            tasks=task.scenario.get_tasks(),
+            min_interval=self.__config.incumbent_min_interval,
+            sink=lambda streamed: loop.call_soon_threadsafe(queue.put_nowait, streamed)
+        )
+
+        async def consume():
+            while True:
+                streamed = await queue.get()
+                if streamed is None:
+                    return
+                try:
+                    await self._emit_incumbent(uuid_scenario, uuid_execution, streamed)
+                except Exception as e:
+                    # streaming is best effort, the final result is stored anyway
+                    logger.error(f"Could not stream incumbent for execution {uuid_execution}: {e}")
+
+        consumer = asyncio.create_task(consume())
+
+        solver = task.solver
+        try:
+            solve = asyncio.ensure_future(asyncio.to_thread(solver.solve, task.wrapped_model.model, callback))
+            if control is not None:
+                await asyncio.gather(solve, control.watch(solve))
+            solve_status = await solve
+        finally:
+            queue.put_nowait(None)
+            await consumer
+
+        logger.debug(f"Model solved with status {solve_status}, "
+                     f"{callback.emitted_count}/{callback.solution_count} solutions streamed")
+
+        # the last improving solution could have been throttled
+        if callback.has_pending:
+            await self._emit_incumbent(uuid_scenario, uuid_execution, StreamedIncumbent(
+                incumbent=IncumbentSolution(
+                    objective=solver.objective_value,
+                    bound=solver.best_objective_bound,
+                    wall_time=solver.wall_time,
+                ),
+                values={
+                    t.get_unique_id(): (solver.value(t.cp_sat.start), solver.value(t.cp_sat.end))
+                    for t in task.scenario.get_tasks()
+                }
+            ))
+
+        wrapped_solver = WrappedSolver(
+            solver=solver,
+            variables=task.wrapped_model.variables
+        )
+
+        return self._build_output(task, wrapped_solver, solve_status, allow_unsolved=control is not None)
+
+    # region cancellation
+
+    def cancel_execution(self, uuid_execution: str) -> bool:
+        """
+        stops the search of the execution, returns False when it is not running here.
+        The cancel is remembered for a while, in case the execution starts later on this worker
+        """
+        with self.__running_lock:
+            self.__recent_cancels[uuid_execution] = None
+            self.__recent_cancels.move_to_end(uuid_execution)
+            while len(self.__recent_cancels) > RECENT_CANCELS:
+                self.__recent_cancels.popitem(last=False)
+            control = self.__running.get(uuid_execution)
+
+        if control is None:
+            return False
+
+        logger.info(f"Stopping the search of execution {uuid_execution}")
+        control.cancel()
+        return True
+
+    async def solve_execution(
+            self,
+            task: WorkerTaskInput,
+            uuid_scenario: str,
+            uuid_execution: str,
+            budget: Optional[ExecutionBudget] = None,
+    ) -> WorkerTaskOutput:
+        """
+        streams the solve of an execution within its budget, cancellable through cancel_execution.
+        A stopped search keeps the best plan found so far (FEASIBLE), or no plan at all (UNKNOWN)
+        """
+        if budget is not None:
+            budget.apply(task.solver)
+
+        control = ExecutionControl(task.solver)
+        return await self._solve_controlled(
+            uuid_execution, control, lambda: self.solve_streaming(task, uuid_scenario, uuid_execution, control)
+        )
+
+    async def solve_decomposed_execution(
+            self,
+            scenario: Scenario,
+            target: Target,
+            tasks: List[WorkerTaskInput],
+            uuid_execution: str,
+            budget: Optional[ExecutionBudget] = None,
+    ) -> WorkerTaskOutput:
+        """
+        solve_execution for the components of a decomposed scenario: each one gets the whole
+        budget, a cancel stops all of them. The incumbents of the components are not streamed
+        """
+        if budget is not None:
+            for task in tasks:
+                budget.apply(task.solver)
+
+        control = ExecutionControl(*(task.solver for task in tasks))
+        return await self._solve_controlled(
+            uuid_execution, control, lambda: self._solve_watched(control, solve_components, self, scenario, target, tasks, True)
+        )
+
+    async def _solve_watched(
+            self,
+            control: ExecutionControl,
+            solve: Callable[..., WorkerTaskOutput],
+            *args: Any,
+    ) -> WorkerTaskOutput:
+        """
+        runs the blocking solve on a thread of the loop, stopping its searches again while it runs
+        """
+        solving = asyncio.ensure_future(asyncio.to_thread(solve, *args))
+        await asyncio.gather(solving, control.watch(solving))
+        return await solving
+
+    async def solve_pooled_execution(
+            self,
+            scenario: Scenario,
+            target: Target,
+            tasks: List[WorkerTaskInput],
+            uuid_execution: str,
+            budget: Optional[ExecutionBudget] = None,
+    ) -> WorkerTaskOutput:
+        """
+        solve_execution in the pool processes, for a single model or the components of
+        a decomposed scenario. Only the plans are sent back, the incumbents are not streamed
+        """
+        if budget is not None:
+            for task in tasks:
+                budget.apply(task.solver)
+        if len(tasks) > 1:
+            split_search_workers(tasks)
+
+        control = ExecutionControl(remote_cancelled=self.__pool.cancel_event())
+
+        async def solve() -> WorkerTaskOutput:
+            results = await asyncio.gather(*(
+                asyncio.wrap_future(self.__pool.submit(task, control.remote_cancelled)) for task in tasks
+            ))
+            outputs = [self._pooled_output(task, result) for task, result in zip(tasks, results)]
+            for output in outputs:
+                if output.status in (WorkerTaskOutputStatus.INFEASIBLE, WorkerTaskOutputStatus.MODEL_INVALID):
+                    raise WorkerStatusException(int(output.status), 'The pooled model has no solution')
+            return outputs[0] if len(outputs) == 1 else merge_components(self, scenario, target, tasks, outputs)
+
+        return await self._solve_controlled(uuid_execution, control, solve)
+
+    async def _solve_controlled(
+            self,
+            uuid_execution: str,
+            control: ExecutionControl,
+            solve: Callable[[], Awaitable[WorkerTaskOutput]],
+    ) -> WorkerTaskOutput:
+        """
+        runs the solve with its control registered, so that cancel_execution reaches it
+        """
+        with self.__running_lock:
+            self.__running[uuid_execution] = control
+            if uuid_execution in self.__recent_cancels:
+                control.cancel()
+
+        try:
+            output = await solve()
+        finally:
+            with self.__running_lock:
+                del self.__running[uuid_execution]
+                self.__recent_cancels.pop(uuid_execution, None)
+
+        output.cancelled = control.cancelled.is_set()
+        if output.cancelled:
+            logger.info(f"Execution {uuid_execution} cancelled with status {output.status.name}")
+        return output
+
+    # endregion cancellation
+
+    def _dump_solver_parameters(
+            self,
+            solver: CpSolver
+    ) -> Dict[str, Any]:
+        """
+        only the parameters that differ from the CpSat defaults
+        """
+        return json_format.MessageToDict(solver.parameters, preserving_proto_field_name=True)
+
+    async def store_execution_output(
+            self,
+            uuid_scenario: str,
+            uuid_execution: str,
+            output: WorkerTaskOutput
+    ) -> None:
+        """
+        persists the outcome of a solve onto its execution document
+        """
+        await self.__mongodb_service.update_scenario_execution_document(
+            uuid_scenario=uuid_scenario,
+            uuid=uuid_execution,
+            values={
+                "status": output.status,
+                "solver_profile": output.solver_profile,
+                "solver_parameters": output.solver_parameters,
+                "objective": output.objective,
+                "build_stats": output.build_stats.model_dump() if output.build_stats is not None else None,
+                "solve_stats": output.solve_stats.model_dump() if output.solve_stats is not None else None,
+                "cancelled": output.cancelled,
+                # a stopped search without any plan
+                "error": 'no plan found within the limits' if output.result is None and not output.cancelled else None,
+                "task_results": {
+                    unique_id: ExecutionTaskResult(
+                        start=start,
+                        end=end
+                    ).model_dump()
+                    for unique_id, (start, end) in output.result.to_values().items()
+                } if output.result is not None else {},
+            }
+        )
+
+    # region execution
+
+    async def run_execution(
+            self,
+            scenario: Scenario,
+            solver: Solver,
+            target: Target,
+            uuid_execution: str,
+            budget: Optional[ExecutionBudget] = None,
+            heuristic_only: bool = False,
+            rolling_window: Optional[int] = None,
+            rolling_overlap: int = 0,
+            rolling_window_time_limit: Optional[float] = None,
+    ) -> WorkerTaskOutput:
+        """
+        the whole execution of a stored scenario, as run by the runner: builds the model
+        (one per independent component, with decomposition) warm started from the last plan,
+        solves it within the budget (cancellable through cancel_execution), in the process pool
+        with pool_executions, and stores the outcome on the execution.
+        A solve that ends without a plan is stored with its status and error
+        """
+        uuid_scenario = scenario.uuid
+        try:
+            if heuristic_only:
+                control = ExecutionControl()
+                output = await self._solve_controlled(
+                    uuid_execution, control, lambda: asyncio.to_thread(self.solve_heuristic, scenario, control)
+                )
+            elif rolling_window is not None:
+                if budget is not None and (budget.time_budget is not None or budget.work_budget is not None):
+                    logger.warning(f"Execution {uuid_execution}: the budget only applies to single model solves, "
+                                   f"the rolling windows use their own time limit")
+                hints = await self.load_warm_start_hints(uuid_scenario)
+                control = ExecutionControl()
+                output = await self._solve_controlled(uuid_execution, control, lambda: self._solve_watched(
+                    control, self.solve_rolling, scenario, solver, target,
+                    rolling_window, rolling_overlap, rolling_window_time_limit, hints or None, control
+                ))
+            else:
+                hints = await self.load_warm_start_hints(uuid_scenario)
+                # the build is cpu bound, the loop keeps serving the other executions meanwhile
+                subscenarios = await asyncio.to_thread(self._decompose, scenario, target)
+                if self.__config.pool_executions:
+                    tasks = await asyncio.to_thread(
+                        self._prepare_components, subscenarios or [scenario], solver, target, hints or None
+                    )
+                    output = await self.solve_pooled_execution(scenario, target, tasks, uuid_execution, budget)
+                elif subscenarios is not None:
+                    tasks = await asyncio.to_thread(self._prepare_components, subscenarios, solver, target, hints or None)
+                    output = await self.solve_decomposed_execution(scenario, target, tasks, uuid_execution, budget)
+                else:
+                    task = await asyncio.to_thread(self.prepare_worker, scenario, solver, target, hints or None)
+                    output = await self.solve_execution(task, uuid_scenario, uuid_execution, budget)
+        except WorkerStatusException as e:
+            # a proven infeasible or invalid model is an outcome, not a runner failure
+            output = WorkerTaskOutput(status=WorkerTaskOutputStatus(e.worker_status), wrapped_solver=None, scenario=scenario)
+            await self.store_execution_error(uuid_scenario, uuid_execution, str(e), output.status)
+            return output
+        except Exception as e:
+            await self.store_execution_error(uuid_scenario, uuid_execution, str(e))
+            raise
+
+        await self.store_execution_output(uuid_scenario, uuid_execution, output)
+        return output
+
+    async def store_execution_error(
+            self,
+            uuid_scenario: str,
+            uuid_execution: str,
+            error: str,
+            status: WorkerTaskOutputStatus = WorkerTaskOutputStatus.UNKNOWN
+    ) -> None:
+        """
+        records on the execution why it produced no plan
+        """
+        await self.__mongodb_service.update_scenario_execution_document(
+            uuid_scenario=uuid_scenario,
+            uuid=uuid_execution,
+            values={"status": status, "error": error}
+        )
+
+    # endregion execution
+
+    # region pool
+
+    def shutdown_pool(self) -> None:
+        self.__pool.shutdown()
+
+    def solve_pooled(
+            self,
+            tasks: List[WorkerTaskInput]
+    ) -> List[WorkerTaskOutput]:
+        """
+        solves many tasks at once, one per pool process.
+        Only the model proto travels to the children, the results are
+        mapped back on the scenarios here in the parent process.
+        Every task gets its output, the ones without a plan only their status
+        """
+        futures = [self.__pool.submit(task) for task in tasks]
+
+        return [self._pooled_output(task, future.result()) for task, future in zip(tasks, futures)]
+
+    def _pooled_output(
+            self,
+            task: WorkerTaskInput,
+            result: SerializedWorkerResult
+    ) -> WorkerTaskOutput:
+        """
+        maps the result of a pool process back on the scenario of its task,
+        a task without a plan gets only its status
+        """
+        logger.debug(f"Pooled model solved with status {result.status}")
+
+        worker_solver_status = WorkerTaskOutputStatus(result.status)
+        self._observe_solve(worker_solver_status, result.solve_stats)
+
+        if result.starts is None:
+            return WorkerTaskOutput(
+                wrapped_solver=None,
+                scenario=task.scenario,
+                status=worker_solver_status,
+                solver_profile=task.solver_profile,
+                solver_parameters=self._dump_solver_parameters(task.solver),
+                build_stats=task.build_stats,
+                solve_stats=result.solve_stats
+            )
+
+        scenario_result = ScenarioResult(
+            task_ids=[t.get_unique_id() for t in task.scenario.get_tasks()],
+            starts=result.starts,
+            ends=result.ends
+        )
+        self.assign_scenario_values(
+            scenario=task.scenario,
+            result=scenario_result,
+            solver_status=worker_solver_status
+        )
+
+        return WorkerTaskOutput(
+            wrapped_solver=None,
+            scenario=task.scenario,
+            result=scenario_result,
+            status=worker_solver_status,
+            solver_profile=task.solver_profile,
+            solver_parameters=self._dump_solver_parameters(task.solver),
+            objective=result.objective,
+            build_stats=task.build_stats,
+            solve_stats=result.solve_stats
+        )
+
+    # endregion pool
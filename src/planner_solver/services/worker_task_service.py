@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from typing import List, Dict, Tuple, Optional, Any, Sequence, TYPE_CHECKING
+
+import numpy as np
+from ortools.sat.python.cp_model import CpSolver
+
+from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.models.stored_documents import ExecutionBuildStats, ExecutionSolveStats
+
+if TYPE_CHECKING:
+    from planner_solver.models.base_models import Scenario, Task, WrappedModel, WrappedSolver
+
+# the inputs and the outputs of the worker tasks, whatever the way they are solved
+
+class WorkerTaskInput:
+    """
+    this class wraps everything needed to execute one worker task
+    it is booted directly by the worker service and then sent to be worked
+    based on the worker settings
+    """
+
+    wrapped_model: WrappedModel
+    scenario: Scenario
+    solver: CpSolver
+    solver_profile: Optional[str]
+    build_stats: Optional[ExecutionBuildStats]
+
+    def __init__(
+            self,
+            wrapped_model: WrappedModel,
+            scenario: Scenario,
+            solver: CpSolver,
+            solver_profile: Optional[str] = None,
+            build_stats: Optional[ExecutionBuildStats] = None
+    ):
+        self.wrapped_model = wrapped_model
+        self.scenario = scenario
+        self.solver = solver
+        self.solver_profile = solver_profile
+        self.build_stats = build_stats
+
+
+class ScenarioResult:
+    """
+    the plan of a solved scenario, as integer arrays aligned on the task unique ids.
+    Tasks are only referenced by id, the scenario itself is never copied
+    """
+    task_ids: List[str]
+    starts: np.ndarray
+    ends: np.ndarray
+
+    def __init__(
+            self,
+            task_ids: List[str],
+            starts: np.ndarray,
+            ends: np.ndarray
+    ):
+        self.task_ids = task_ids
+        self.starts = starts
+        self.ends = ends
+        self.__positions: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.task_ids)
+
+    @staticmethod
+    def variable_indices(tasks: List[Task]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        the model indices of the start and end variables of the tasks
+        """
+        starts = np.fromiter((task.cp_sat.start.index for task in tasks), dtype=np.int64, count=len(tasks))
+        ends = np.fromiter((task.cp_sat.end.index for task in tasks), dtype=np.int64, count=len(tasks))
+        return starts, ends
+
+    @staticmethod
+    def from_solution(
+            task_ids: List[str],
+            solution: Sequence[int],
+            start_indices: np.ndarray,
+            end_indices: np.ndarray
+    ) -> "ScenarioResult":
+        """
+        reads every start and end at once from the flat solution vector of the response
+        """
+        values = np.asarray(solution, dtype=np.int64)
+        return ScenarioResult(
+            task_ids=task_ids,
+            starts=values[start_indices],
+            ends=values[end_indices]
+        )
+
+    @staticmethod
+    def from_values(values: Dict[str, Tuple[int, int]]) -> "ScenarioResult":
+        task_ids = list(values.keys())
+        return ScenarioResult(
+            task_ids=task_ids,
+            starts=np.fromiter((values[uid][0] for uid in task_ids), dtype=np.int64, count=len(task_ids)),
+            ends=np.fromiter((values[uid][1] for uid in task_ids), dtype=np.int64, count=len(task_ids))
+        )
+
+    def get(self, unique_id: str) -> Optional[Tuple[int, int]]:
+        if self.__positions is None:
+            self.__positions = {uid: i for i, uid in enumerate(self.task_ids)}
+
+        position = self.__positions.get(unique_id)
+        if position is None:
+            return None
+        return int(self.starts[position]), int(self.ends[position])
+
+    def to_values(self) -> Dict[str, Tuple[int, int]]:
+        """
+        task unique id -> (start, end), the format used by the hints
+        """
+        return {
+            uid: (start, end)
+            for uid, start, end in zip(self.task_ids, self.starts.tolist(), self.ends.tolist())
+        }
+
+
+class WorkerTaskOutput:
+    """
+    this wraps everything that returns from a worker execution
+    on the main thread. Side effects are handled outside
+    """
+    status: WorkerTaskOutputStatus
+    wrapped_solver: Optional[WrappedSolver]
+    """None when the solve happened in a pool process"""
+    scenario: Scenario
+    """the input scenario, with the results assigned to its tasks"""
+    result: Optional[ScenarioResult]
+    solver_profile: Optional[str]
+    solver_parameters: Dict[str, Any]
+    objective: Optional[float]
+    """the objective value of the plan, None when no model objective was solved"""
+    build_stats: Optional[ExecutionBuildStats]
+    solve_stats: Optional[ExecutionSolveStats]
+    cancelled: bool
+    """the search was stopped by a cancel, the plan (if any) is the best found so far"""
+
+    def __init__(
+            self,
+            status: WorkerTaskOutputStatus,
+            wrapped_solver: Optional[WrappedSolver],
+            scenario: Scenario,
+            result: Optional[ScenarioResult] = None,
+            solver_profile: Optional[str] = None,
+            solver_parameters: Optional[Dict[str, Any]] = None,
+            objective: Optional[float] = None,
+            build_stats: Optional[ExecutionBuildStats] = None,
+            solve_stats: Optional[ExecutionSolveStats] = None,
+            cancelled: bool = False
+    ):
+        self.status = status
+        self.wrapped_solver = wrapped_solver
+        self.scenario = scenario
+        self.result = result
+        self.solver_profile = solver_profile
+        self.solver_parameters = solver_parameters if solver_parameters is not None else {}
+        self.objective = objective
+        self.build_stats = build_stats
+        self.solve_stats = solve_stats
+        self.cancelled = cancelled
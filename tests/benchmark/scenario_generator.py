@@ -0,0 +1,56 @@
+import random
+from typing import List
+
+from base_module.constraints.after_constraint import AfterConstraint
+from base_module.resources.machinery_resource import MachineryResource
+from base_module.scenarios.simple_shop_floor import SimpleShopFloorScenario
+from base_module.tasks.fixed_duration_task import FixedDurationTask
+
+
+def generate_scenario(
+        tasks: int,
+        machines: int,
+        precedence_density: float = 1.0,
+        max_duration: int = 10,
+        lookback: int = 50,
+        seed: int = 0,
+) -> SimpleShopFloorScenario:
+    """
+    a random shop floor, always the same for the same arguments:
+    every task runs on one of the machines and follows on average precedence_density
+    tasks among the lookback ones before it, so that the precedence graph grows linearly
+
+    the entities get stable uuids, as if they were loaded from the database
+    """
+    rng = random.Random(seed)
+    scenario = SimpleShopFloorScenario()
+    scenario.label = f"generated-{tasks}-{machines}-{precedence_density}-{seed}"
+
+    machine_resources: List[MachineryResource] = []
+    for i in range(machines):
+        machine = MachineryResource()
+        machine.uuid = f"machine-{i}"
+        machine.machine_name = f"m{i}"
+        machine_resources.append(machine)
+        scenario.add_resource(machine)
+
+    generated: List[FixedDurationTask] = []
+    for i in range(tasks):
+        task = FixedDurationTask()
+        task.uuid = f"task-{i}"
+        task.label = f"task-{i}"
+        task.duration = rng.randint(1, max_duration)
+        task.add_resource(rng.choice(machine_resources))
+
+        # the integer part of the density is always there, the rest is a probability
+        count = int(precedence_density) + (1 if rng.random() < precedence_density % 1 else 0)
+        candidates = generated[max(0, i - lookback):]
+        for before in rng.sample(candidates, min(count, len(candidates))):
+            after_constraint = AfterConstraint()
+            after_constraint.task = before
+            task.add_constraint(after_constraint)
+
+        generated.append(task)
+        scenario.add_task(task)
+
+    return scenario
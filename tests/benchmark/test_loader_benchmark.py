@@ -0,0 +1,131 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import List, Dict, Any
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+if os.getenv('PS_BENCHMARK_MONGODB', 'false').lower() != 'true':
+    pytest.skip("the loader benchmarks need mongodb, see the README", allow_module_level=True)
+
+from bson import DBRef
+
+from planner_solver.containers import ApplicationContainer
+from planner_solver.models.stored_documents import ScenarioDocument, TaskDocument, ResourceDocument, \
+    ConstraintDocument
+from scenario_generator import generate_scenario
+
+
+def env_sizes() -> List[int]:
+    return [int(size) for size in os.getenv('PS_BENCHMARK_LOADER_SIZES', '10000,50000,100000').split(',')]
+
+SIZES = env_sizes()
+DENSITY = float(os.getenv('PS_BENCHMARK_DENSITY', '1.0'))
+SEED = int(os.getenv('PS_BENCHMARK_SEED', '0'))
+
+@pytest.fixture(scope="module")
+def event_loop_runner():
+    # beanie is initialized once per loop, every round runs on the same one
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+@pytest.fixture(scope="module")
+def mongodb_service(event_loop_runner):
+    container = ApplicationContainer()
+    container.init_resources()
+    container.module_loader_service().load_all()
+
+    service = container.mongodb_service()
+    event_loop_runner(service.clear_all_collections())
+    return service
+
+def stored(uuid: str, type_name: str, label: str, data: Dict[str, Any], scenario: Dict[str, Any]) -> Dict[str, Any]:
+    now = datetime.now()
+    return {
+        "uuid": uuid, "type": type_name, "label": label, "data": data, "is_deleted": False,
+        "created_at": now, "updated_at": now,
+        "scenario": DBRef(ScenarioDocument.get_collection_name(), scenario["_id"]),
+        "scenario_uuid": scenario["uuid"],
+    }
+
+async def seed(size: int) -> str:
+    """
+    stores a generated scenario the way the api does: the constraints hold the
+    snapshot of the linked task, the tasks list their resources and constraints
+    """
+    generated = generate_scenario(tasks=size, machines=max(1, size // 20), precedence_density=DENSITY, seed=SEED)
+    uuid_scenario = f"loader-{size}-{DENSITY}-{SEED}"
+
+    result = await ScenarioDocument.get_pymongo_collection().insert_one({
+        "uuid": uuid_scenario, "type": "simple_shop_floor", "label": generated.label,
+        "data": {"label": generated.label}, "is_deleted": False,
+    })
+    scenario = {"_id": result.inserted_id, "uuid": uuid_scenario}
+
+    resources = [
+        stored(machine.uuid, "machinery_resource", machine.machine_name,
+               {"label": machine.machine_name, "machine_name": machine.machine_name}, scenario)
+        for machine in generated.get_resources()
+    ]
+    tasks, constraints = [], []
+    for task in generated.get_tasks():
+        for i, constraint in enumerate(task.get_constraints()):
+            before = constraint.task
+            constraint_uuid = f"{task.uuid}-after-{i}"
+            constraints.append(stored(constraint_uuid, "after_constraint", constraint_uuid, {
+                "label": constraint_uuid,
+                "task_uuid": task.uuid,
+                "task": {
+                    "uuid": before.uuid, "type": "fixed_duration_task", "label": before.label,
+                    "data": {"label": before.label, "duration": before.duration},
+                },
+            }, scenario))
+        tasks.append(stored(task.uuid, "fixed_duration_task", task.label, {
+            "label": task.label,
+            "duration": task.duration,
+            "resource_uuids": [resource.uuid for resource in task.get_resources()],
+        }, scenario))
+
+    for document_type, documents in [(ResourceDocument, resources), (TaskDocument, tasks), (ConstraintDocument, constraints)]:
+        if documents:
+            await document_type.get_pymongo_collection().insert_many(documents, ordered=False)
+
+    return uuid_scenario
+
+async def load_naive(uuid_scenario: str):
+    """
+    the path before load_scenario: one collection after the other,
+    each query with the $lookup of the scenario and full documents
+    """
+    scenario = (await ScenarioDocument.find(ScenarioDocument.uuid == uuid_scenario).first_or_none()).to_base_model()
+    for document_type in [TaskDocument, ResourceDocument, ConstraintDocument]:
+        documents = await document_type.find(document_type.scenario.uuid == uuid_scenario, fetch_links=True).to_list()
+        for document in documents:
+            document.to_base_model()
+    return scenario
+
+@pytest.mark.parametrize('size', SIZES)
+def test_load_naive(benchmark, mongodb_service, event_loop_runner, size):
+    uuid_scenario = event_loop_runner(seed(size))
+
+    benchmark.pedantic(lambda: event_loop_runner(load_naive(uuid_scenario)), rounds=1)
+
+    benchmark.extra_info["tasks"] = size
+    event_loop_runner(mongodb_service.clear_all_collections())
+
+@pytest.mark.parametrize('size', SIZES)
+def test_load_scenario(benchmark, mongodb_service, event_loop_runner, size):
+    uuid_scenario = event_loop_runner(seed(size))
+
+    scenario = benchmark.pedantic(
+        lambda: event_loop_runner(mongodb_service.load_scenario(uuid_scenario)),
+        rounds=3 if size <= 10000 else 1,
+    )
+
+    assert len(scenario.get_tasks()) == size
+    benchmark.extra_info["tasks"] = size
+    benchmark.extra_info["constraints"] = sum(len(task.get_constraints()) for task in scenario.get_tasks())
+    event_loop_runner(mongodb_service.clear_all_collections())
@@ -0,0 +1,111 @@
+import os
+import resource
+from typing import List, Dict, Any
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from ortools.sat.python.cp_model import CpModel
+
+from base_module.solvers.profiled_solver import ProfiledSolver
+from base_module.targets.minimum_time_target import MinimumTypeTarget
+from planner_solver.config.models import WorkerConfig
+from planner_solver.services.mongodb_service import MongodbService
+from planner_solver.services.rabbitmq_service import RabbitmqService
+from planner_solver.services.worker_service import WorkerService
+from scenario_generator import generate_scenario
+
+
+def env_sizes() -> List[int]:
+    # the full run goes up to 100000 tasks, see the README
+    return [int(size) for size in os.getenv('PS_BENCHMARK_SIZES', '10,100,1000').split(',')]
+
+SIZES = env_sizes()
+DENSITY = float(os.getenv('PS_BENCHMARK_DENSITY', '1.0'))
+SEED = int(os.getenv('PS_BENCHMARK_SEED', '0'))
+
+def generate(size: int):
+    return generate_scenario(tasks=size, machines=max(1, size // 20), precedence_density=DENSITY, seed=SEED)
+
+def rounds(size: int) -> int:
+    return 3 if size <= 1000 else 1
+
+def build_worker_service() -> WorkerService:
+    # no cache nor retained model, every round builds from scratch
+    return WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0)
+    )
+
+def build_solver() -> ProfiledSolver:
+    solver = ProfiledSolver()
+    solver.profile = 'fast-feasible'
+    solver.random_seed = SEED
+    return solver
+
+def model_stats(model: CpModel) -> Dict[str, Any]:
+    proto = model.proto
+    return {
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+        "intervals": sum(1 for constraint in proto.constraints if constraint.HasField('interval')),
+    }
+
+def peak_rss_kb() -> int:
+    # the peak of the whole process so far, in KiB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+@pytest.mark.parametrize('size', SIZES)
+def test_build(benchmark, size):
+    worker_service = build_worker_service()
+    solver, target = build_solver(), MinimumTypeTarget()
+
+    worker_input = benchmark.pedantic(
+        worker_service.prepare_worker,
+        setup=lambda: ((generate(size), solver, target), {}),
+        rounds=rounds(size),
+    )
+
+    benchmark.extra_info.update(model_stats(worker_input.wrapped_model.model))
+    benchmark.extra_info["phases"] = worker_input.build_stats.phases
+    benchmark.extra_info["peak_rss_kb"] = peak_rss_kb()
+
+@pytest.mark.parametrize('size', SIZES)
+def test_solve(benchmark, size):
+    worker_service = build_worker_service()
+    solver, target = build_solver(), MinimumTypeTarget()
+
+    # only the solve is timed, each round on a freshly built model
+    prepared = []
+
+    def setup():
+        prepared.append(worker_service.prepare_worker(generate(size), solver, target))
+        return (prepared[-1],), {}
+
+    output = benchmark.pedantic(worker_service.solve_synchronously, setup=setup, rounds=rounds(size))
+
+    cp_solver = output.wrapped_solver.solver
+    benchmark.extra_info.update(model_stats(prepared[-1].wrapped_model.model))
+    benchmark.extra_info.update({
+        "status": output.status.name,
+        "objective": output.objective,
+        "bound": cp_solver.best_objective_bound,
+        "branches": cp_solver.num_branches,
+        "conflicts": cp_solver.num_conflicts,
+        "peak_rss_kb": peak_rss_kb(),
+    })
+
+def test_generator_is_seeded():
+    first, second = generate_scenario(200, 10, seed=1), generate_scenario(200, 10, seed=1)
+
+    def describe(scenario):
+        return [
+            (task.uuid, task.duration, task.get_resources()[0].uuid, [c.task.uuid for c in task.get_constraints()])
+            for task in scenario.get_tasks()
+        ]
+
+    assert describe(first) == describe(second)
+    assert describe(first) != describe(generate_scenario(200, 10, seed=2))
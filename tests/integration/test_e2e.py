@@ -309,4 +309,54 @@ async def test_constraint_linked_to_tasks_creation(
     # response = client.get(f"/scenario/{uuid_scenario}/task/{uuid_first_task}")
     # assert response.status_code == 404
 
+@pytest.mark.asyncio
+async def test_bulk_creation(
+        client
+):
+    response = client.post('/scenario', json={
+        "type": "simple_shop_floor",
+        "data": {
+            "label": "bulk"
+        }
+    })
+    assert response.status_code == 200
+    uuid_scenario = response.json()['data']['uuid']
+
+    # the constraint points to the tasks of the same request
+    response = client.post(f"/scenario/{uuid_scenario}/bulk", json={
+        "resources": [
+            {"type": "machinery_resource", "data": {"uuid": "bulk-machine", "label": "m", "machine_name": "m"}},
+        ],
+        "tasks": [
+            {"type": "fixed_duration_task", "data": {"uuid": "bulk-1", "label": "1", "duration": 2, "resource_uuids": ["bulk-machine"]}},
+            {"type": "fixed_duration_task", "data": {"uuid": "bulk-2", "label": "2", "duration": 3, "resource_uuids": ["bulk-machine"]}},
+            {"type": "not_a_type", "data": {"label": "3"}},
+        ],
+        "constraints": [
+            {"type": "after_constraint_scenario", "data": {"label": "2 after 1", "task_before": "bulk-1", "task_after": "bulk-2"}},
+            {"type": "after_constraint_scenario", "data": {"label": "broken", "task_before": "bulk-1", "task_after": "nope"}},
+            {"type": "after_constraint", "data": {"label": "task level", "task": "bulk-1", "task_uuid": "bulk-2"}},
+            # a task-level constraint cannot be attached to the scenario
+            {"type": "after_constraint", "data": {"label": "unattached", "task": "bulk-1"}},
+        ],
+    })
+    assert response.status_code == 200
+    content = response.json()
+    assert (content['created'], content['failed']) == (5, 3)
+    errors = [(item['kind'], item['index']) for item in content['items'] if item['error'] is not None]
+    assert errors == [('task', 2), ('constraint', 1), ('constraint', 3)]
+
+    response = client.get(f"/scenario/{uuid_scenario}/constraint")
+    constraint, task_constraint = sorted(response.json(), key=lambda found: found['data']['label'])
+    assert task_constraint['data']['task_uuid'] == 'bulk-2'
+    assert constraint['data']['task_before']['data']['uuid'] == 'bulk-1'
+    assert constraint['data']['task_after']['data']['label'] == '2'
+
+    # the single kind endpoint, linking the stored tasks
+    response = client.post(f"/scenario/{uuid_scenario}/constraint/bulk", json=[
+        {"type": "after_constraint_scenario", "data": {"label": "again", "task_before": "bulk-1", "task_after": "bulk-2"}},
+    ])
+    assert response.status_code == 200
+    assert response.json()['created'] == 1
+
 # endregion basic scenario contents
@@ -29,4 +29,35 @@ async def test_db_connection(
     resource_documents = await mongodb_service.get_all_resource_documents()
     assert len(resource_documents) == 0
     scenario_documents = await mongodb_service.get_scenario_documents()
-    assert len(scenario_documents) == 0
\ No newline at end of file
+    assert len(scenario_documents) == 0
+
+@pytest.mark.asyncio
+async def test_scenario_scoped_lookup(
+        container
+):
+    from planner_solver.models.stored_documents import ScenarioDocument, TaskDocument
+
+    cont = await container
+    mongodb_service = cont.mongodb_service()
+    await mongodb_service.clear_all_collections()
+
+    scenario = await ScenarioDocument(label='scoped').insert()
+    task = await TaskDocument(label='scoped task', type='fixed_duration_task', scenario=scenario).insert()
+
+    # written on insert
+    assert task.scenario_uuid == scenario.uuid
+    found = await mongodb_service.get_task_document(uuid_scenario=scenario.uuid, uuid=task.uuid)
+    assert found is not None and found.uuid == task.uuid
+
+    # the scoped lookups use the compound index
+    plan = await TaskDocument.get_pymongo_collection().find(
+        {"scenario_uuid": scenario.uuid, "uuid": task.uuid}
+    ).explain()
+    assert 'IXSCAN' in str(plan['queryPlanner']['winningPlan'])
+    assert 'COLLSCAN' not in str(plan['queryPlanner']['winningPlan'])
+
+    # the documents stored before the field existed are migrated from their link
+    await TaskDocument.get_pymongo_collection().update_one({"uuid": task.uuid}, {"$unset": {"scenario_uuid": ""}})
+    updated = await mongodb_service.migrate_scenario_uuid()
+    assert updated['ps_tasks'] == 1
+    assert await mongodb_service.get_task_document(uuid_scenario=scenario.uuid, uuid=task.uuid) is not None
@@ -0,0 +1,124 @@
+from typing import List, Tuple
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from base_module.constraints.after_constraint import AfterConstraint
+from base_module.resources.machinery_resource import MachineryResource
+from base_module.scenarios.simple_shop_floor import SimpleShopFloorScenario
+from base_module.solvers.simple_solver import SimpleSolver
+from base_module.targets.minimum_time_target import MinimumTypeTarget
+from base_module.tasks.fixed_duration_task import FixedDurationTask
+from planner_solver.config.models import WorkerConfig
+from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.services.decomposition_service import find_components
+from planner_solver.services.mongodb_service import MongodbService
+from planner_solver.services.rabbitmq_service import RabbitmqService
+from planner_solver.services.execution_control_service import ExecutionBudget
+from planner_solver.services.worker_service import WorkerService
+
+
+def build_scenario(
+        tasks: List[Tuple[str, int, str]],
+        precedences: List[Tuple[str, str]],
+) -> SimpleShopFloorScenario:
+    """
+    tasks as (uuid, duration, machine uuid), precedences as (before uuid, after uuid)
+    """
+    scenario = SimpleShopFloorScenario()
+
+    machines = {}
+    for machine_uuid in sorted({machine for _, _, machine in tasks}):
+        machine = MachineryResource()
+        machine.uuid = machine_uuid
+        machine.machine_name = machine_uuid
+        machines[machine_uuid] = machine
+        scenario.add_resource(machine)
+
+    by_uuid = {}
+    for task_uuid, duration, machine_uuid in tasks:
+        task = FixedDurationTask()
+        task.uuid = task_uuid
+        task.label = task_uuid
+        task.duration = duration
+        task.add_resource(machines[machine_uuid])
+        by_uuid[task_uuid] = task
+        scenario.add_task(task)
+
+    for before, after in precedences:
+        after_constraint = AfterConstraint()
+        after_constraint.task = by_uuid[before]
+        by_uuid[after].add_constraint(after_constraint)
+
+    return scenario
+
+def build_worker_service(decomposition: bool) -> WorkerService:
+    return WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0, decomposition=decomposition)
+    )
+
+def test_find_components():
+    # two machines, linked only through the a1 -> b1 precedence
+    tasks = [('a0', 2, 'm1'), ('a1', 3, 'm1'), ('b0', 4, 'm2'), ('b1', 1, 'm2'), ('c0', 5, 'm3')]
+
+    scenario = build_scenario(tasks, [])
+    components = find_components(scenario, scenario.get_tasks())
+    assert [[task.uuid for task in component.tasks] for component in components] == [['a0', 'a1'], ['b0', 'b1'], ['c0']]
+    assert [[resource.uuid for resource in component.resources] for component in components] == [['m1'], ['m2'], ['m3']]
+
+    scenario = build_scenario(tasks, [('a1', 'b1')])
+    components = find_components(scenario, scenario.get_tasks())
+    assert [[task.uuid for task in component.tasks] for component in components] == [['a0', 'a1', 'b0', 'b1'], ['c0']]
+
+def test_solve_decomposed():
+    tasks = [('a0', 2, 'm1'), ('a1', 3, 'm1'), ('a2', 4, 'm1'), ('b0', 5, 'm2'), ('b1', 1, 'm2')]
+    precedences = [('a0', 'a2'), ('b1', 'b0')]
+
+    output = build_worker_service(True).solve_decomposed(
+        build_scenario(tasks, precedences), SimpleSolver(), MinimumTypeTarget()
+    )
+    whole = build_worker_service(False).solve_decomposed(
+        build_scenario(tasks, precedences), SimpleSolver(), MinimumTypeTarget()
+    )
+
+    assert output.status == WorkerTaskOutputStatus.OPTIMAL
+    assert output.wrapped_solver is None
+    # the makespan of the scenario is the one of its longest component
+    assert output.objective == whole.objective == 9
+    assert len(output.result) == 5
+
+    values = output.result.to_values()
+    for task in output.scenario.get_tasks():
+        assert values[task.uuid][1] - values[task.uuid][0] == task.duration
+    assert values['a2'][0] >= values['a0'][1]
+    assert values['b0'][0] >= values['b1'][1]
+
+@pytest.mark.asyncio
+async def test_run_decomposed_execution():
+    tasks = [('a0', 2, 'm1'), ('a1', 3, 'm1'), ('b0', 5, 'm2'), ('b1', 1, 'm2')]
+    worker_service = build_worker_service(True)
+    mongodb_service = worker_service._WorkerService__mongodb_service
+    mongodb_service.get_last_successful_execution_document.return_value = None
+
+    scenario = build_scenario(tasks, [('a0', 'a1')])
+    scenario.uuid = 'scenario-uuid'
+    with patch.object(worker_service, 'solve_decomposed_execution', wraps=worker_service.solve_decomposed_execution) as solve:
+        output = await worker_service.run_execution(
+            scenario, SimpleSolver(), MinimumTypeTarget(), 'execution-uuid', ExecutionBudget(time_budget=5.0)
+        )
+
+    # one model per component, each one within the budget
+    assert len(solve.call_args.args[2]) == 2
+    assert output.status == WorkerTaskOutputStatus.OPTIMAL and output.objective == 6
+    stored = mongodb_service.update_scenario_execution_document.call_args.kwargs['values']
+    assert len(stored['task_results']) == 4
+    assert stored['solver_parameters']['max_time_in_seconds'] == 5.0
+
+    # a cancel reaches every component
+    assert not worker_service.cancel_execution('cancelled-uuid')
+    output = await worker_service.run_execution(
+        build_scenario(tasks, []), SimpleSolver(), MinimumTypeTarget(), 'cancelled-uuid'
+    )
+    assert output.cancelled
@@ -0,0 +1,87 @@
+from base_module.constraints.after_constraint import AfterConstraint, AfterConstraintScenario
+from base_module.resources.machinery_resource import MachineryResource
+from base_module.scenarios.simple_shop_floor import SimpleShopFloorScenario
+from base_module.tasks.fixed_duration_task import FixedDurationTask
+from planner_solver.models.base_models import Constraint
+from planner_solver.services.horizon_service import ListScheduleHorizonEstimator, SumHorizonEstimator, \
+    tighten_time_windows
+
+
+def build_task(label: str, duration: int, machine: MachineryResource) -> FixedDurationTask:
+    task = FixedDurationTask()
+    task.label = label
+    task.duration = duration
+    task.add_resource(machine)
+    return task
+
+def build_two_lines_scenario() -> SimpleShopFloorScenario:
+    """
+    two machines, each with a chain of two tasks, plus a scenario-level precedence across them
+    """
+    m1 = MachineryResource()
+    m1.machine_name = "m1"
+    m2 = MachineryResource()
+    m2.machine_name = "m2"
+
+    a1 = build_task("a1", 3, m1)
+    a2 = build_task("a2", 4, m1)
+    b1 = build_task("b1", 2, m2)
+    b2 = build_task("b2", 6, m2)
+
+    after = AfterConstraint()
+    after.task = a1
+    a2.add_constraint(after)
+
+    across = AfterConstraintScenario()
+    across.task_before = b1
+    across.task_after = a2
+
+    scenario = SimpleShopFloorScenario()
+    scenario.add_resource(m1)
+    scenario.add_resource(m2)
+    for t in [a1, a2, b1, b2]:
+        scenario.add_task(t)
+    scenario.add_constraint(across)
+
+    return scenario
+
+def test_list_schedule_bounds():
+    scenario = build_two_lines_scenario()
+    tasks = scenario.get_tasks()
+
+    trivial = SumHorizonEstimator().estimate(scenario, tasks)
+    estimate = ListScheduleHorizonEstimator().estimate(scenario, tasks)
+
+    assert trivial.upper_bound == 15
+    # a1 -> a2 on m1 takes 7, b1 + b2 on m2 takes 8
+    assert estimate.lower_bound == 8
+    assert estimate.lower_bound <= estimate.upper_bound < trivial.upper_bound
+
+def test_unknown_constraint_falls_back():
+    class OpaqueConstraint(Constraint):
+        def attach_task_constraint(self, model, task):
+            pass
+
+        def attach_scenario_constraint(self, model):
+            pass
+
+    scenario = build_two_lines_scenario()
+    scenario.add_constraint(OpaqueConstraint())
+
+    estimate = ListScheduleHorizonEstimator().estimate(scenario, scenario.get_tasks())
+
+    assert estimate.upper_bound == 15
+    assert estimate.lower_bound == 0
+
+def test_tighten_time_windows():
+    scenario = build_two_lines_scenario()
+    a1, a2, b1, b2 = scenario.get_tasks()
+
+    tightened = tighten_time_windows(scenario, scenario.get_tasks(), horizon=20)
+
+    assert tightened == 3
+    # a2 waits for both a1 (3) and b1 (2)
+    assert a2.get_time_window() == (3, 20)
+    assert a1.get_time_window() == (0, 16)
+    assert b1.get_time_window() == (0, 16)
+    assert b2.get_time_window() == (0, 20)
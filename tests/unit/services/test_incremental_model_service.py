@@ -0,0 +1,148 @@
+from typing import List, Tuple
+from unittest.mock import MagicMock
+
+from base_module.constraints.after_constraint import AfterConstraint
+from base_module.resources.machinery_resource import MachineryResource
+from base_module.scenarios.simple_shop_floor import SimpleShopFloorScenario
+from base_module.solvers.simple_solver import SimpleSolver
+from base_module.targets.minimum_time_target import MinimumTypeTarget
+from base_module.tasks.fixed_duration_task import FixedDurationTask
+from planner_solver.config.models import WorkerConfig
+from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.services.mongodb_service import MongodbService
+from planner_solver.services.rabbitmq_service import RabbitmqService
+from planner_solver.services.worker_service import WorkerService
+
+
+def build_scenario(
+        tasks: List[Tuple[str, int, str | None]],
+        precedences: List[Tuple[str, str]],
+) -> SimpleShopFloorScenario:
+    """
+    a freshly loaded version of the same stored scenario: tasks as (uuid, duration, machine uuid)
+    and precedences as (before uuid, after uuid)
+    """
+    scenario = SimpleShopFloorScenario()
+    scenario.uuid = 'scenario-uuid'
+
+    machines = {}
+    for machine_uuid in sorted({machine for _, _, machine in tasks if machine is not None}):
+        machine = MachineryResource()
+        machine.uuid = machine_uuid
+        machine.machine_name = machine_uuid
+        machines[machine_uuid] = machine
+        scenario.add_resource(machine)
+
+    by_uuid = {}
+    for task_uuid, duration, machine_uuid in tasks:
+        task = FixedDurationTask()
+        task.uuid = task_uuid
+        task.label = task_uuid
+        task.duration = duration
+        if machine_uuid is not None:
+            task.add_resource(machines[machine_uuid])
+        by_uuid[task_uuid] = task
+        scenario.add_task(task)
+
+    for before, after in precedences:
+        after_constraint = AfterConstraint()
+        after_constraint.task = by_uuid[before]
+        by_uuid[after].add_constraint(after_constraint)
+
+    return scenario
+
+def makespan(worker_service: WorkerService, scenario: SimpleShopFloorScenario) -> int:
+    result = worker_service.solve_synchronously(
+        worker_service.prepare_worker(scenario, SimpleSolver(), MinimumTypeTarget())
+    )
+    assert result.status == WorkerTaskOutputStatus.OPTIMAL
+    return int(result.result.ends.max())
+
+def test_incremental_patch():
+    config = WorkerConfig.model_construct(
+        model_cache_size=0,
+        incremental_models=2,
+        incremental_max_delta=1.0,
+    )
+    worker_service = WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=config
+    )
+    rebuilt = WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0)
+    )
+
+    chain = [('a0', 2, None), ('a1', 3, None), ('a2', 4, None), ('b0', 5, 'm2')]
+    versions = [
+        # the first build
+        (chain, [('a0', 'a1'), ('a1', 'a2')], 9),
+        # only a task added, after the chain
+        (chain + [('c0', 4, None)], [('a0', 'a1'), ('a1', 'a2'), ('a2', 'c0')], 13),
+        # a precedence removed, a task added on the machine after b0
+        (chain + [('c0', 4, None), ('b1', 7, 'm2')], [('a0', 'a1'), ('a2', 'c0'), ('b0', 'b1')], 12),
+        # the task removed again
+        (chain + [('c0', 4, None)], [('a0', 'a1'), ('a2', 'c0')], 8),
+    ]
+
+    for i, (tasks, precedences, expected) in enumerate(versions):
+        if i > 0:
+            # from here on, the retained model is patched
+            worker_service._boot_model = MagicMock(side_effect=AssertionError("model rebuilt"))
+
+        assert makespan(worker_service, build_scenario(tasks, precedences)) == expected
+        assert makespan(rebuilt, build_scenario(tasks, precedences)) == expected
+
+def test_incremental_large_delta_rebuilds():
+    config = WorkerConfig.model_construct(
+        model_cache_size=0,
+        incremental_models=2,
+        incremental_max_delta=0.2,
+    )
+    worker_service = WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=config
+    )
+
+    tasks = [('a0', 2, 'm1'), ('a1', 3, 'm1')]
+    assert makespan(worker_service, build_scenario(tasks, [])) == 5
+
+    boot_model = MagicMock(wraps=worker_service._boot_model)
+    worker_service._boot_model = boot_model
+
+    # every task changed machine
+    tasks = [('a0', 2, 'm1'), ('a1', 3, 'm2'), ('a2', 1, 'm2')]
+    assert makespan(worker_service, build_scenario(tasks, [])) == 4
+    assert boot_model.call_count == 1
+
+def test_incremental_patch_is_exclusive():
+    config = WorkerConfig.model_construct(
+        model_cache_size=0,
+        incremental_models=2,
+        incremental_max_delta=1.0,
+    )
+    worker_service = WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=config
+    )
+    chain = [('a0', 2, None), ('a1', 3, None), ('a2', 4, None)]
+    assert makespan(worker_service, build_scenario(chain, [('a0', 'a1'), ('a1', 'a2')])) == 9
+
+    concurrent = []
+    patch_retained_model = worker_service._patch_retained_model
+
+    def patch_while_another_execution_prepares(*args):
+        # the other execution of the scenario does not find the model being patched
+        boot_model = MagicMock(wraps=worker_service._boot_model)
+        worker_service._boot_model = boot_model
+        concurrent.append(makespan(worker_service, build_scenario(chain, [('a0', 'a1')])))
+        assert boot_model.call_count == 1
+        return patch_retained_model(*args)
+
+    worker_service._patch_retained_model = patch_while_another_execution_prepares
+    assert makespan(worker_service, build_scenario(chain + [('c0', 4, None)], [('a0', 'a1'), ('a1', 'a2')])) == 9
+    assert concurrent == [5]
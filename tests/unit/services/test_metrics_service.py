@@ -0,0 +1,66 @@
+import asyncio
+import urllib.request
+
+from prometheus_client import Histogram
+from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST
+
+from planner_solver.config.models import MetricsConfig
+from planner_solver.services.metrics_service import MetricsService
+
+
+def build_metrics_service() -> MetricsService:
+    return MetricsService(MetricsConfig.model_construct(enabled=True, runner_host='127.0.0.1', runner_port=0))
+
+def test_render():
+    metrics_service = build_metrics_service()
+    histogram = Histogram('test_seconds', 'a test', ('method',), buckets=(0.1, 1.0), registry=metrics_service.registry)
+    for value in [0.05, 0.5, 0.5, 2.0]:
+        histogram.labels(method='get').observe(value)
+    metrics_service.executions_in_flight.inc()
+
+    content, content_type = metrics_service.render('application/openmetrics-text')
+    assert content_type == CONTENT_TYPE_LATEST
+    lines = content.decode().splitlines()
+    assert lines[-1] == '# EOF'
+    assert '# TYPE test_seconds histogram' in lines
+    # the le labels are canonical floats
+    assert [line for line in lines if line.startswith('test_seconds_') and not line.startswith('test_seconds_created')] == [
+        'test_seconds_bucket{le="0.1",method="get"} 1.0',
+        'test_seconds_bucket{le="1.0",method="get"} 3.0',
+        'test_seconds_bucket{le="+Inf",method="get"} 4.0',
+        'test_seconds_count{method="get"} 4.0',
+        'test_seconds_sum{method="get"} 3.05',
+    ]
+    assert 'planner_solver_executions_in_flight 1.0' in lines
+
+def test_instrument_coroutines():
+    metrics_service = build_metrics_service()
+
+    class Service:
+        async def get_document(self, uuid: str) -> str:
+            return uuid
+
+        async def _private(self) -> None:
+            pass
+
+    service = Service()
+    metrics_service.instrument_coroutines(service, metrics_service.mongodb_call_seconds)
+
+    assert asyncio.run(service.get_document('abc')) == 'abc'
+    registry = metrics_service.registry
+    assert registry.get_sample_value('planner_solver_mongodb_call_seconds_count', {'method': 'get_document'}) == 1
+    assert registry.get_sample_value('planner_solver_mongodb_call_seconds_count', {'method': '_private'}) is None
+
+def test_sidecar_server():
+    metrics_service = build_metrics_service()
+    metrics_service.start_server()
+    try:
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{metrics_service.get_server_port()}/metrics",
+            headers={'Accept': 'application/openmetrics-text'},
+        )
+        with urllib.request.urlopen(request) as response:
+            assert response.headers['Content-Type'] == CONTENT_TYPE_LATEST
+            assert response.read().decode().endswith('# EOF\n')
+    finally:
+        metrics_service.stop_server()
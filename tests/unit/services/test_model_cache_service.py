@@ -0,0 +1,147 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from unittest.mock import MagicMock, patch
+
+from base_module.constraints.after_constraint import AfterConstraint
+from base_module.resources.machinery_resource import MachineryResource
+from base_module.scenarios.simple_shop_floor import SimpleShopFloorScenario
+from base_module.solvers.profiled_solver import ProfiledSolver
+from base_module.solvers.simple_solver import SimpleSolver
+from base_module.targets.minimum_time_target import MinimumTypeTarget
+from base_module.tasks.fixed_duration_task import FixedDurationTask
+from planner_solver.config.models import WorkerConfig
+from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.services import model_cache_service as module
+from planner_solver.services.model_cache_service import ModelCacheService, CachedModel
+from planner_solver.services.mongodb_service import MongodbService
+from planner_solver.services.rabbitmq_service import RabbitmqService
+from planner_solver.services.worker_service import WorkerService
+
+
+def build_stored_scenario(durations: List[int]) -> SimpleShopFloorScenario:
+    """
+    a chain of tasks on a single machine, all with their stored uuids
+    """
+    machine = MachineryResource()
+    machine.uuid = 'machine-uuid'
+    machine.machine_name = 'm1'
+
+    scenario = SimpleShopFloorScenario()
+    scenario.add_resource(machine)
+
+    previous = None
+    for i, duration in enumerate(durations):
+        task = FixedDurationTask()
+        task.uuid = f"task-uuid-{i}"
+        task.label = f"task_{i}"
+        task.duration = duration
+        task.add_resource(machine)
+        if previous is not None:
+            after_constraint = AfterConstraint()
+            after_constraint.task = previous
+            task.add_constraint(after_constraint)
+        scenario.add_task(task)
+        previous = task
+
+    return scenario
+
+def build_worker_service(config: WorkerConfig) -> WorkerService:
+    return WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=config,
+        model_cache_service=ModelCacheService(config)
+    )
+
+def test_model_cache_hit(tmp_path):
+    config = WorkerConfig.model_construct(
+        model_cache_size=4,
+        model_cache_dir=str(tmp_path),
+        model_cache_disk_entries=8,
+    )
+    worker_service = build_worker_service(config)
+
+    first = worker_service.prepare_worker(build_stored_scenario([2, 3, 4]), SimpleSolver(), MinimumTypeTarget())
+
+    # same scenario, another solver: the model comes from the memory tier
+    solver = ProfiledSolver()
+    solver.profile = 'fast-feasible'
+    second = worker_service.prepare_worker(build_stored_scenario([2, 3, 4]), solver, MinimumTypeTarget())
+    assert second.wrapped_model.model.proto == first.wrapped_model.model.proto
+    assert second.solver.parameters.max_time_in_seconds == 5.0
+
+    result = worker_service.solve_synchronously(second)
+    assert result.status == WorkerTaskOutputStatus.OPTIMAL
+    assert result.result.ends.tolist() == [2, 5, 9]
+
+    # a new process only finds the disk tier
+    worker_service = build_worker_service(config)
+    worker_unit = worker_service.prepare_worker(build_stored_scenario([2, 3, 4]), SimpleSolver(), MinimumTypeTarget())
+    assert len(worker_unit.wrapped_model.variables) == len(first.wrapped_model.variables)
+    assert worker_service.solve_synchronously(worker_unit).result.ends.tolist() == [2, 5, 9]
+
+def test_model_cache_miss_on_change(tmp_path):
+    config = WorkerConfig.model_construct(
+        model_cache_size=4,
+        model_cache_dir=None,
+        model_cache_disk_entries=8,
+    )
+    model_cache_service = ModelCacheService(config)
+    worker_service = WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=config,
+        model_cache_service=model_cache_service
+    )
+
+    worker_service.prepare_worker(build_stored_scenario([2, 3, 4]), SimpleSolver(), MinimumTypeTarget())
+    worker_service.prepare_worker(build_stored_scenario([2, 3, 5]), SimpleSolver(), MinimumTypeTarget())
+    assert model_cache_service.hits == 0
+    assert model_cache_service.misses == 2
+
+    worker_unit = worker_service.prepare_worker(build_stored_scenario([2, 3, 5]), SimpleSolver(), MinimumTypeTarget())
+    assert model_cache_service.hits == 1
+    assert worker_service.solve_synchronously(worker_unit).result.ends.tolist() == [2, 5, 10]
+
+def test_model_cache_version(tmp_path):
+    config = WorkerConfig.model_construct(
+        model_cache_size=0,
+        model_cache_dir=str(tmp_path),
+        model_cache_disk_entries=8,
+    )
+    build_worker_service(config).prepare_worker(build_stored_scenario([2, 3, 4]), SimpleSolver(), MinimumTypeTarget())
+
+    # the disk entries of another builder are not reused
+    module.builder_version.cache_clear()
+    try:
+        with patch.object(module, 'MODEL_CACHE_VERSION', module.MODEL_CACHE_VERSION + 1):
+            model_cache_service = ModelCacheService(config)
+            worker_service = WorkerService(
+                mongodb_service=MagicMock(spec=MongodbService),
+                rabbitmq_service=MagicMock(spec=RabbitmqService),
+                config=config,
+                model_cache_service=model_cache_service
+            )
+            worker_service.prepare_worker(build_stored_scenario([2, 3, 4]), SimpleSolver(), MinimumTypeTarget())
+        assert (model_cache_service.hits, model_cache_service.misses) == (0, 1)
+    finally:
+        module.builder_version.cache_clear()
+
+def test_model_cache_concurrent_access():
+    model_cache_service = ModelCacheService(WorkerConfig.model_construct(
+        model_cache_size=4,
+        model_cache_dir=None,
+        model_cache_disk_entries=8,
+    ))
+
+    def use(i: int):
+        key = f"key-{i % 8}"
+        if model_cache_service.get(key) is None:
+            model_cache_service.put(key, CachedModel(model_proto=b'', variables={}, tasks={}))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(use, range(2000)))
+
+    # no lookup lost, the LRU never above its size
+    assert model_cache_service.hits + model_cache_service.misses == 2000
+    assert sum(model_cache_service.get(f"key-{i}") is not None for i in range(8)) == 4
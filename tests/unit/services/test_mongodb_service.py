@@ -0,0 +1,255 @@
+import asyncio
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest.mock import MagicMock, AsyncMock, patch
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from base_module.constraints.after_constraint import AfterConstraint, AfterConstraintScenario
+from planner_solver.models.stored_documents import TaskDocument
+from planner_solver.services.mongodb_service import MongodbService, parameter_links, ENTITY_PROJECTION
+from planner_solver.services.types_service import TypesService
+
+
+def test_parameter_links():
+    assert parameter_links(AfterConstraint) == (('task', 'task'),)
+    assert parameter_links(AfterConstraintScenario) == (('task_after', 'task'), ('task_before', 'task'))
+    # computed once per class
+    assert parameter_links(AfterConstraint) is parameter_links(AfterConstraint)
+
+def test_hydrate_parameter_links_many():
+    mongodb_service = MongodbService(MagicMock(), MagicMock(spec=TypesService))
+
+    constraints = []
+    for before, after in [('a', 'b'), ('b', 'c'), ('a', 'missing')]:
+        constraint = AfterConstraintScenario()
+        constraint.task_before, constraint.task_after = before, after
+        constraints.append(constraint)
+
+    documents = {uuid: SimpleNamespace(uuid=uuid) for uuid in ['a', 'b', 'c']}
+    async def find(document_type, uuids, uuid_scenario):
+        return [documents[uuid] for uuid in uuids if uuid in documents]
+
+    with patch.object(MongodbService, '_MongodbService__connect', AsyncMock()), \
+            patch.object(mongodb_service, '_find_linked_documents', side_effect=find) as find_mock:
+        asyncio.run(mongodb_service.hydrate_parameter_links_many(constraints, 'scenario'))
+
+    # a single query for all the task links
+    find_mock.assert_called_once()
+    document_type, uuids, uuid_scenario = find_mock.call_args.args
+    assert (document_type, uuids, uuid_scenario) == (TaskDocument, {'a', 'b', 'c', 'missing'}, 'scenario')
+
+    assert constraints[0].task_before is documents['a'] and constraints[0].task_after is documents['b']
+    assert constraints[1].task_before is documents['b'] and constraints[1].task_after is documents['c']
+    assert constraints[2].task_after is None
+
+def collection(raws):
+    found = MagicMock()
+    found.find.return_value.to_list = AsyncMock(return_value=raws)
+    found.find_one = AsyncMock(return_value=raws[0] if raws else None)
+    return found
+
+def test_load_scenario():
+    from bson import DBRef, ObjectId
+    from planner_solver.models.stored_documents import ScenarioDocument, ResourceDocument, ConstraintDocument
+    from base_module.resources.machinery_resource import MachineryResource
+    from base_module.scenarios.simple_shop_floor import SimpleShopFloorScenario
+    from base_module.tasks.fixed_duration_task import FixedDurationTask
+
+    types_service = TypesService()
+    types_service.register_scenario_type(SimpleShopFloorScenario, 'simple_shop_floor')
+    types_service.register_task_type(FixedDurationTask, 'fixed_duration_task')
+    types_service.register_resource_type(MachineryResource, 'machinery_resource')
+    types_service.register_constraint_type(AfterConstraint, 'after_constraint')
+    types_service.register_constraint_type(AfterConstraintScenario, 'after_constraint_scenario')
+
+    mongodb_service = MongodbService(MagicMock(), types_service)
+    ids = [ObjectId() for _ in range(3)]
+    collections = {
+        ScenarioDocument: collection([{"_id": ObjectId(), "uuid": "s", "type": "simple_shop_floor", "data": {"label": "s"}}]),
+        TaskDocument: collection([
+            {"_id": ids[0], "uuid": "t1", "type": "fixed_duration_task",
+             "data": {"label": "t1", "duration": 2, "resource_uuids": ["m"]}},
+            {"_id": ids[1], "uuid": "t2", "type": "fixed_duration_task",
+             "data": {"label": "t2", "duration": 3, "resource_uuids": ["m"]}},
+        ]),
+        ResourceDocument: collection([
+            {"_id": ids[2], "uuid": "m", "type": "machinery_resource", "data": {"label": "m", "machine_name": "m"}},
+        ]),
+        ConstraintDocument: collection([
+            # a task-level constraint holding the snapshot of the hydrated task
+            {"_id": ObjectId(), "uuid": "c1", "type": "after_constraint",
+             "data": {"label": "c1", "task_uuid": "t2", "task": {"uuid": "t1", "label": "t1"}}},
+            # a scenario-level one, with a plain uuid and a DBRef
+            {"_id": ObjectId(), "uuid": "c2", "type": "after_constraint_scenario",
+             "data": {"label": "c2", "task_before": "t1", "task_after": DBRef("ps_tasks", ids[1])}},
+        ]),
+    }
+
+    with patch.object(MongodbService, '_MongodbService__connect', AsyncMock()), ExitStack() as stack:
+        for document_type, found in collections.items():
+            stack.enter_context(patch.object(document_type, 'get_pymongo_collection', return_value=found))
+        scenario = asyncio.run(mongodb_service.load_scenario('s'))
+
+    # every query is scoped and projected
+    assert collections[TaskDocument].find.call_args.args == ({"scenario_uuid": "s"}, ENTITY_PROJECTION)
+
+    t1, t2 = scenario.get_tasks()
+    machine, = scenario.get_resources()
+    assert t1.get_resources() == [machine] and t2.get_resources()[0] is machine
+    assert t1.get_constraints() == []
+    c1, = t2.get_constraints()
+    assert c1.task is t1
+    c2, = scenario.get_constraints()
+    assert c2.task_before is t1 and c2.task_after is t2
+    assert (t1.get_unique_id(), t2.get_duration()) == ('t1', 3)
+
+def test_load_scenario_from_forms():
+    from bson import ObjectId
+    from ortools.sat.python.cp_model import CpModel
+    from planner_solver.exceptions.type_exceptions import ConstraintAttachTypeException
+    from planner_solver.models.base_models import WrappedModel
+    from planner_solver.models.forms import BasePlannerSolverForm
+    from planner_solver.models.stored_documents import ScenarioDocument, ResourceDocument, ConstraintDocument
+    from base_module.resources.machinery_resource import MachineryResource
+    from base_module.scenarios.simple_shop_floor import SimpleShopFloorScenario
+    from base_module.tasks.fixed_duration_task import FixedDurationTask
+
+    types_service = TypesService()
+    types_service.register_scenario_type(SimpleShopFloorScenario, 'simple_shop_floor')
+    types_service.register_task_type(FixedDurationTask, 'fixed_duration_task')
+    types_service.register_resource_type(MachineryResource, 'machinery_resource')
+    types_service.register_constraint_type(AfterConstraint, 'after_constraint')
+
+    def stored(document_type, form_type, data):
+        # what the endpoints store: the form is validated, turned into a document and inserted
+        with patch('planner_solver.models.forms.types_service', types_service):
+            base_model = BasePlannerSolverForm(type=form_type, data=data).to_base_model()
+        if isinstance(base_model, AfterConstraint):
+            base_model.check_attachment()
+        with patch.object(document_type, 'get_settings'):
+            document = document_type.from_base_model(base_model)
+        return {"_id": ObjectId(), "uuid": data.get("uuid", document.uuid), "type": document.type, "data": document.data}
+
+    machine = stored(ResourceDocument, 'machinery_resource', {"uuid": "m", "label": "m", "machine_name": "m"})
+    t1 = stored(TaskDocument, 'fixed_duration_task', {"uuid": "t1", "label": "t1", "duration": 2, "resource_uuids": ["m"]})
+    t2 = stored(TaskDocument, 'fixed_duration_task', {"uuid": "t2", "label": "t2", "duration": 3, "resource_uuids": ["m"]})
+    after = stored(ConstraintDocument, 'after_constraint', {"label": "t2 after t1", "task": "t1", "task_uuid": "t2"})
+
+    # a task-level constraint is rejected without its task
+    with pytest.raises(ConstraintAttachTypeException):
+        stored(ConstraintDocument, 'after_constraint', {"label": "unattached", "task": "t1"})
+
+    mongodb_service = MongodbService(MagicMock(), types_service)
+    collections = {
+        ScenarioDocument: collection([{"_id": ObjectId(), "uuid": "s", "type": "simple_shop_floor", "data": {"label": "s"}}]),
+        TaskDocument: collection([t1, t2]),
+        ResourceDocument: collection([machine]),
+        ConstraintDocument: collection([after]),
+    }
+    with patch.object(MongodbService, '_MongodbService__connect', AsyncMock()), ExitStack() as stack:
+        for document_type, found in collections.items():
+            stack.enter_context(patch.object(document_type, 'get_pymongo_collection', return_value=found))
+        scenario = asyncio.run(mongodb_service.load_scenario('s'))
+
+    task_1, task_2 = scenario.get_tasks()
+    resource, = scenario.get_resources()
+    assert task_1.get_resources() == [resource] and task_2.get_resources() == [resource]
+    assert scenario.get_constraints() == []
+    constraint, = task_2.get_constraints()
+    assert constraint.task is task_1
+
+    # the model is built as the worker does, without attaching the constraint to the scenario
+    wrapped_model = WrappedModel(model=CpModel(), variables={})
+    for task in scenario.get_tasks():
+        task.generate_cp_sat(wrapped_model, 10)
+    constraint.attach_task_constraint(wrapped_model.model, task_2)
+
+def fake_document_type(inserted: list, failing: set):
+    class FakeDocument:
+        def __init__(self, base_model):
+            self.base_model = base_model
+            self.uuid = None
+
+        @classmethod
+        def from_base_model(cls, base_model):
+            return cls(base_model)
+
+        @classmethod
+        async def insert_many(cls, documents, ordered):
+            assert not ordered
+            errors = [{'index': i, 'errmsg': 'duplicate key'} for i, d in enumerate(documents) if d.uuid in failing]
+            inserted.extend(d for d in documents if d.uuid not in failing)
+            if errors:
+                raise BulkWriteError({'writeErrors': errors})
+    return FakeDocument
+
+def test_store_documents_bulk():
+    from base_module.tasks.fixed_duration_task import FixedDurationTask
+    from planner_solver.models.forms import BulkItemResult
+    from planner_solver.services import mongodb_service as module
+
+    inserted = []
+    fakes = {kind: fake_document_type(inserted, {'t2'}) for kind in ['task', 'resource', 'constraint']}
+    mongodb_service = MongodbService(MagicMock(bulk_chunk_size=1), MagicMock(spec=TypesService))
+    stored = SimpleNamespace(uuid='stored')
+
+    def task(uuid=None):
+        return FixedDurationTask(label='t', duration=1, uuid=uuid)
+
+    def constraint(before, after):
+        built = AfterConstraintScenario(label='c')
+        built.task_before, built.task_after = before, after
+        return built
+
+    items = [
+        (BulkItemResult(kind='task', index=0), task('t1')),
+        (BulkItemResult(kind='task', index=1), task('t2')),
+        (BulkItemResult(kind='task', index=2), task('t1')),
+        (BulkItemResult(kind='task', index=3, error='invalid'), None),
+        (BulkItemResult(kind='task', index=4), task()),
+        (BulkItemResult(kind='constraint', index=0), constraint('t1', 'stored')),
+        (BulkItemResult(kind='constraint', index=1), constraint('t1', 'missing')),
+    ]
+
+    async def find(document_type, uuids, uuid_scenario):
+        return [stored] if 'stored' in uuids else []
+
+    with patch.object(MongodbService, '_MongodbService__connect', AsyncMock()), \
+            patch.dict(module.LINK_DOCUMENTS, fakes), \
+            patch.object(mongodb_service, '_find_linked_documents', side_effect=find) as find_mock:
+        results = asyncio.run(mongodb_service.store_documents_bulk(SimpleNamespace(uuid='s'), items))
+
+    # only the links outside of the batch are queried
+    assert find_mock.call_args.args[1] == {'stored', 'missing'}
+
+    assert [(r.uuid, r.error) for r in results[:2]] == [('t1', None), (None, 'duplicate key')]
+    assert results[2].error.startswith('Duplicate task uuid t1')
+    assert results[3].error == 'invalid'
+    assert results[4].uuid is not None and results[4].error is None
+    assert results[5].uuid is not None and results[5].error is None
+    assert results[6].error == 'task_after links to the missing task missing'
+
+    # the constraint embeds the documents of the batch and the stored ones
+    stored_constraint = next(d for d in inserted if d.uuid == results[5].uuid)
+    assert stored_constraint.base_model.task_before.uuid == 't1'
+    assert stored_constraint.base_model.task_after is stored
+    assert all(d.scenario_uuid == 's' for d in inserted)
+
+def test_update_scenario_execution_document():
+    from planner_solver.models.stored_documents import ExecutionDocument
+
+    mongodb_service = MongodbService(MagicMock(), MagicMock(spec=TypesService))
+    found = MagicMock()
+    found.update = AsyncMock(return_value=SimpleNamespace(uuid='e'))
+
+    with patch.object(MongodbService, '_MongodbService__connect', AsyncMock()), \
+            patch.object(ExecutionDocument, 'scenario_uuid', MagicMock(), create=True), \
+            patch.object(ExecutionDocument, 'uuid', MagicMock(), create=True), \
+            patch.object(ExecutionDocument, 'find_one', return_value=found):
+        asyncio.run(mongodb_service.update_scenario_execution_document('s', 'e', {"status": "done"}))
+
+    # the update doesn't go through the before_event hooks, updated_at is set with the values
+    values = found.update.call_args.args[0]["$set"]
+    assert values["status"] == "done" and values["updated_at"] is not None
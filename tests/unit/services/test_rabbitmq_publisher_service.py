@@ -0,0 +1,86 @@
+import asyncio
+from unittest.mock import MagicMock, AsyncMock, patch
+
+import pika
+import pytest
+
+from planner_solver.config.models import RabbitmqConfig, RabbitmqConnectionConfig
+from planner_solver.services.rabbitmq_publisher_service import PublisherChannel, PendingPublish, \
+    RabbitmqPublisherService, PublishNackedException, PublishException
+from planner_solver.services.rabbitmq_service import RabbitmqService
+
+
+def build_config() -> RabbitmqConfig:
+    return RabbitmqConfig.model_construct(
+        connection=RabbitmqConnectionConfig(host='localhost', port=5672, username='guest', password='guest'),
+        **{name: field.default for name, field in RabbitmqConfig.model_fields.items() if name != 'connection'}
+    )
+
+def confirm_frame(method_class, delivery_tag: int, multiple: bool):
+    return MagicMock(method=method_class(delivery_tag=delivery_tag, multiple=multiple))
+
+@pytest.mark.asyncio
+async def test_publisher_channel_confirms():
+    channel = PublisherChannel(MagicMock())
+    pending = [PendingPublish('', 'queue', b'{}', None) for _ in range(4)]
+    for p in pending:
+        channel.publish(p)
+
+    # the first three are confirmed at once, the last one is refused
+    channel.on_confirm(confirm_frame(pika.spec.Basic.Ack, 3, True))
+    assert [p.confirmed.done() for p in pending] == [True, True, True, False]
+    channel.on_confirm(confirm_frame(pika.spec.Basic.Nack, 4, False))
+    with pytest.raises(PublishNackedException):
+        await pending[3].confirmed
+    assert channel.unconfirmed_count == 0
+
+@pytest.mark.asyncio
+async def test_publish_in_batches():
+    config = build_config()
+    publisher = RabbitmqPublisherService(config, RabbitmqService(config))
+
+    batches = []
+
+    def write(batch):
+        batches.append(len(batch))
+        for pending in batch:
+            pending.confirmed.set_result(None)
+
+    with patch.object(publisher, '_connect', AsyncMock()), patch.object(publisher, '_write', write):
+        await asyncio.gather(*[
+            publisher.publish_execution_trigger({"uuid_execution": str(i)}, size=i) for i in range(250)
+        ])
+        await publisher.close()
+
+    # the burst is written in batches, each publish still awaited its own confirm
+    assert sum(batches) == 250
+    assert max(batches) == config.publisher_batch_size
+    assert len(batches) < 250
+
+@pytest.mark.asyncio
+async def test_publish_partial_batch():
+    config = build_config()
+    publisher = RabbitmqPublisherService(config, RabbitmqService(config))
+
+    # the channel breaks after the first message of the batch
+    channel = MagicMock()
+    channel.basic_publish.side_effect = [None, pika.exceptions.ChannelWrongStateError()]
+    publisher_channel = PublisherChannel(channel)
+    publisher._RabbitmqPublisherService__channels = [publisher_channel]
+
+    pending = [PendingPublish('', 'queue', b'{}', None) for _ in range(3)]
+    queue = asyncio.Queue()
+    for p in pending:
+        queue.put_nowait(p)
+
+    with patch.object(publisher, '_connect', AsyncMock()):
+        flusher = asyncio.create_task(publisher._flush_forever(queue))
+        await asyncio.sleep(0)
+        flusher.cancel()
+
+    # the written one still waits for its confirm, the others fail to be published again
+    assert not pending[0].confirmed.done()
+    assert publisher_channel.unconfirmed_count == 1
+    for p in pending[1:]:
+        with pytest.raises(PublishException):
+            await p.confirmed
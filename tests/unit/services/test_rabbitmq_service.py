@@ -0,0 +1,172 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pika
+import pytest
+
+from planner_solver.config.models import RabbitmqConfig, RabbitmqConnectionConfig
+from planner_solver.services.rabbitmq_service import RabbitmqService
+
+
+def build_rabbitmq_service() -> RabbitmqService:
+    return RabbitmqService(RabbitmqConfig.model_construct(
+        connection=RabbitmqConnectionConfig(host='localhost', port=5672, username='guest', password='guest'),
+        **{name: field.default for name, field in RabbitmqConfig.model_fields.items() if name != 'connection'}
+    ))
+
+def test_size_routing():
+    rabbitmq_service = build_rabbitmq_service()
+
+    assert [rabbitmq_service.size_class_for(size).name for size in [0, 1000, 1001, 20000, 50000]] == \
+        ['small', 'small', 'medium', 'medium', 'large']
+
+    small = rabbitmq_service.size_class_for(0)
+    priorities = [rabbitmq_service.priority_for(size, small) for size in [0, 450, 999]]
+    assert priorities == [9, 5, 0]
+
+    large = rabbitmq_service.size_class_for(50000)
+    assert rabbitmq_service.priority_for(20000, large) == 9
+    assert rabbitmq_service.priority_for(100000, large) == 0
+
+def test_publish_execution_trigger():
+    rabbitmq_service = build_rabbitmq_service()
+
+    with patch('pika.BlockingConnection') as connection:
+        channel = connection.return_value.channel.return_value
+        rabbitmq_service.publish_execution_trigger({"uuid_execution": "e"}, size=5000)
+        rabbitmq_service.publish_execution_trigger({"uuid_execution": "f"}, size=10, priority=42)
+
+    # one priority queue declared per class
+    declared = {call.kwargs['queue']: call.kwargs['arguments'] for call in channel.queue_declare.call_args_list}
+    assert declared == {
+        f"execution_trigger.{name}": {'x-max-priority': 9} for name in ['small', 'medium', 'large']
+    }
+
+    medium, small = channel.basic_publish.call_args_list
+    assert medium.kwargs['routing_key'] == 'execution_trigger.medium'
+    assert json.loads(medium.kwargs['body'])['size_class'] == 'medium'
+    assert medium.kwargs['properties'].priority == 7
+    # the explicit priority is capped
+    assert small.kwargs['routing_key'] == 'execution_trigger.small'
+    assert small.kwargs['properties'].priority == 9
+
+def test_publish_connection_per_thread():
+    rabbitmq_service = build_rabbitmq_service()
+
+    with patch('pika.BlockingConnection') as connection:
+        connection.side_effect = lambda parameters: MagicMock(is_closed=False)
+        rabbitmq_service.publish_incumbent('e', {"objective": 1})
+        rabbitmq_service.publish_incumbent('e', {"objective": 0})
+        thread = threading.Thread(target=rabbitmq_service.publish_execution_control, args=({"action": "cancel"},))
+        thread.start()
+        thread.join()
+
+    # reused within a thread, never shared across them
+    assert connection.call_count == 2
+
+def test_control_consumer_reconnects():
+    rabbitmq_service = build_rabbitmq_service()
+    rabbitmq_service._RabbitmqService__config.reconnect_delay = 0
+    received = []
+    delivered = threading.Event()
+    stay = threading.Event()
+
+    def connect(parameters):
+        connection = MagicMock(is_open=True)
+        channel = connection.channel.return_value
+
+        def consume():
+            on_message = channel.basic_consume.call_args.kwargs['on_message_callback']
+            on_message(channel, None, None, json.dumps({"action": "cancel"}))
+            if len(received) == 2:
+                delivered.set()
+                stay.wait()
+            # the connection drops after its message
+        channel.start_consuming.side_effect = consume
+        return connection
+
+    connections = [pika.exceptions.AMQPConnectionError('down'), connect, connect]
+    def next_connection(parameters):
+        found = connections.pop(0)
+        if isinstance(found, Exception):
+            raise found
+        return found(parameters)
+
+    with patch('pika.BlockingConnection', side_effect=next_connection):
+        rabbitmq_service.start_control_consumer(received.append)
+        assert delivered.wait(timeout=5)
+    stay.set()
+
+    # the failed connection and the dropped one are both retried
+    assert received == [{"action": "cancel"}, {"action": "cancel"}]
+
+@pytest.mark.asyncio
+async def test_publish_incumbent_async():
+    rabbitmq_service = build_rabbitmq_service()
+    loop = asyncio.get_running_loop()
+    # every thread of the default executor is taken by a solve
+    release = threading.Event()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+    solve = loop.run_in_executor(None, release.wait)
+
+    threads = []
+    with patch.object(rabbitmq_service, 'publish_incumbent',
+                      side_effect=lambda *args: threads.append(threading.current_thread().name)) as publish:
+        await asyncio.wait_for(rabbitmq_service.publish_incumbent_async('e', {"objective": 1}), timeout=5)
+
+    release.set()
+    await solve
+    publish.assert_called_once_with('e', {"objective": 1})
+    assert threads[0].startswith('publish')
+    rabbitmq_service.close()
+
+@pytest.mark.asyncio
+async def test_handle_delivery():
+    rabbitmq_service = build_rabbitmq_service()
+    channel = MagicMock()
+    channel.is_open = True
+
+    running, peak = 0, 0
+
+    async def callback(data):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.to_thread(time.sleep, 0.05)
+        running -= 1
+        if data['uuid_execution'] == 'broken':
+            raise ValueError()
+
+    semaphore = asyncio.Semaphore(2)
+    await asyncio.gather(*[
+        rabbitmq_service._handle_delivery(
+            channel, tag, json.dumps({"uuid_execution": uuid}).encode(), 'execution_trigger.small', semaphore, callback
+        )
+        for tag, uuid in enumerate(['a', 'b', 'c', 'broken'])
+    ])
+
+    # bounded by the class concurrency, acked on the loop
+    assert peak == 2
+    assert sorted(call.kwargs['delivery_tag'] for call in channel.basic_ack.call_args_list) == [0, 1, 2]
+    channel.basic_nack.assert_called_once_with(delivery_tag=3, requeue=False)
+
+def test_forward_legacy_triggers():
+    rabbitmq_service = build_rabbitmq_service()
+
+    with patch('pika.BlockingConnection') as connection:
+        channel = connection.return_value.channel.return_value
+        channel.basic_get.side_effect = [
+            (MagicMock(delivery_tag=1), None, json.dumps({"uuid_execution": "e"}).encode()),
+            (None, None, None),
+        ]
+        assert rabbitmq_service.forward_legacy_triggers() == 1
+
+    published = channel.basic_publish.call_args.kwargs
+    assert published['routing_key'] == 'execution_trigger.small'
+    assert json.loads(published['body'])['uuid_execution'] == 'e'
+    channel.basic_ack.assert_called_once_with(delivery_tag=1)
+    channel.queue_delete.assert_called_once_with(queue='execution_trigger', if_empty=True)
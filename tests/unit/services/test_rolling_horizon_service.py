@@ -0,0 +1,125 @@
+from typing import List, Tuple
+from unittest.mock import MagicMock, patch
+
+from base_module.constraints.after_constraint import AfterConstraint
+from base_module.resources.machinery_resource import MachineryResource
+from base_module.scenarios.simple_shop_floor import SimpleShopFloorScenario
+from base_module.solvers.profiled_solver import ProfiledSolver
+from base_module.solvers.simple_solver import SimpleSolver
+from base_module.targets.minimum_time_target import MinimumTypeTarget
+from base_module.tasks.fixed_duration_task import FixedDurationTask
+from planner_solver.config.models import WorkerConfig
+from planner_solver.models.enums import WorkerTaskOutputStatus
+from planner_solver.services.mongodb_service import MongodbService
+from planner_solver.services.rabbitmq_service import RabbitmqService
+from planner_solver.services.rolling_horizon_service import rolling_windows
+from planner_solver.services.execution_control_service import ExecutionControl
+from planner_solver.services.worker_service import WorkerService
+
+
+def build_scenario(
+        tasks: List[Tuple[str, int, str]],
+        precedences: List[Tuple[str, str]],
+) -> SimpleShopFloorScenario:
+    """
+    tasks as (uuid, duration, machine uuid), precedences as (before uuid, after uuid)
+    """
+    scenario = SimpleShopFloorScenario()
+
+    machines = {}
+    for machine_uuid in sorted({machine for _, _, machine in tasks}):
+        machine = MachineryResource()
+        machine.uuid = machine_uuid
+        machine.machine_name = machine_uuid
+        machines[machine_uuid] = machine
+        scenario.add_resource(machine)
+
+    by_uuid = {}
+    for task_uuid, duration, machine_uuid in tasks:
+        task = FixedDurationTask()
+        task.uuid = task_uuid
+        task.label = task_uuid
+        task.duration = duration
+        task.add_resource(machines[machine_uuid])
+        by_uuid[task_uuid] = task
+        scenario.add_task(task)
+
+    for before, after in precedences:
+        after_constraint = AfterConstraint()
+        after_constraint.task = by_uuid[before]
+        by_uuid[after].add_constraint(after_constraint)
+
+    return scenario
+
+def test_rolling_windows():
+    windows = rolling_windows([str(i) for i in range(7)], window_size=3, overlap=1)
+
+    assert [window.task_ids for window in windows] == [['0', '1', '2'], ['2', '3', '4'], ['4', '5', '6']]
+    assert [window.frozen_ids for window in windows] == [['0', '1'], ['2', '3'], ['4', '5', '6']]
+
+def test_solve_rolling():
+    # three jobs of four operations, each operation on its own machine
+    tasks, precedences = [], []
+    for job in range(3):
+        for operation in range(4):
+            tasks.append((f"j{job}o{operation}", 1 + (job + operation) % 3, f"m{operation}"))
+            if operation > 0:
+                precedences.append((f"j{job}o{operation - 1}", f"j{job}o{operation}"))
+
+    worker_service = WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0, rolling_window_time_limit=5.0)
+    )
+
+    scenario = build_scenario(tasks, precedences)
+    output = worker_service.solve_rolling(scenario, SimpleSolver(), MinimumTypeTarget(), window_size=4, overlap=1)
+    assert output.status == WorkerTaskOutputStatus.FEASIBLE
+    assert len(output.result) == len(tasks)
+
+    # the stitched plan is feasible
+    values = output.result.to_values()
+    durations = {uuid: duration for uuid, duration, _ in tasks}
+    for uuid, (start, end) in values.items():
+        assert end - start == durations[uuid]
+    for before, after in precedences:
+        assert values[before][1] <= values[after][0]
+    for machine in {machine for _, _, machine in tasks}:
+        intervals = sorted(values[uuid] for uuid, _, m in tasks if m == machine)
+        for (_, end), (start, _) in zip(intervals, intervals[1:]):
+            assert end <= start
+
+    # the boundary conditions are not left on the tasks
+    assert all(task.get_release_date() == 0 for task in scenario.get_tasks())
+
+    # the window limit never raises the one of the solver profile
+    assert output.solver_parameters['max_time_in_seconds'] == 5.0
+    solver = ProfiledSolver()
+    solver.max_time_in_seconds = 2.0
+    output = worker_service.solve_rolling(build_scenario(tasks, precedences), solver, MinimumTypeTarget(), window_size=4)
+    assert output.solver_parameters['max_time_in_seconds'] == 2.0
+
+def test_solve_rolling_cancelled():
+    tasks = [(f"t{i}", 1 + i % 3, 'm0') for i in range(12)]
+    precedences = [(f"t{i - 1}", f"t{i}") for i in range(1, 12)]
+    worker_service = WorkerService(
+        mongodb_service=MagicMock(spec=MongodbService),
+        rabbitmq_service=MagicMock(spec=RabbitmqService),
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0, rolling_window_time_limit=5.0)
+    )
+    control = ExecutionControl()
+    solve_synchronously = worker_service.solve_synchronously
+
+    def cancel_after_the_window(*args, **kwargs):
+        output = solve_synchronously(*args, **kwargs)
+        control.cancel()
+        return output
+
+    # the windows left are skipped, the scenario is left without a plan
+    with patch.object(worker_service, 'solve_synchronously', side_effect=cancel_after_the_window) as solve:
+        output = worker_service.solve_rolling(
+            build_scenario(tasks, precedences), SimpleSolver(), MinimumTypeTarget(), window_size=4, control=control
+        )
+    assert solve.call_count == 1
+    assert output.status == WorkerTaskOutputStatus.UNKNOWN and output.result is None
+    assert len(control.solvers) == 1
@@ -1,20 +1,27 @@
+import asyncio
 import logging
+import random
 from typing import List, cast
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import pytest
+from ortools.sat.python.cp_model import CpModel
 
 from base_module.constraints.after_constraint import AfterConstraint
 from base_module.resources.machinery_resource import MachineryResource
 from base_module.scenarios.simple_shop_floor import SimpleShopFloorScenario
+from base_module.solvers.profiled_solver import ProfiledSolver, SOLVER_PROFILES
 from base_module.solvers.simple_solver import SimpleSolver
 from base_module.targets.minimum_time_target import MinimumTypeTarget
 from base_module.tasks.fixed_duration_task import FixedDurationTask
-from planner_solver.config.models import ModuleConfig
-from planner_solver.models.base_models import Task
+from planner_solver.config.models import ModuleConfig, WorkerConfig
+from planner_solver.exceptions.worker_exceptions import WorkerException
+from planner_solver.models.base_models import Task, Target
+from planner_solver.models.enums import WorkerTaskOutputStatus
 from planner_solver.services.module_loader_service import ModuleLoaderService
 from planner_solver.services.mongodb_service import MongodbService
 from planner_solver.services.rabbitmq_service import RabbitmqService
+from planner_solver.services.execution_control_service import ExecutionBudget
 from planner_solver.services.worker_service import WorkerService
 
 
@@ -105,4 +112,541 @@ async def test_simple_worker(
     task_b = find_task(tasks, 'task_b')[0]
     assert task_b is not None
     assert task_b.result.start == 0
-    assert task_b.result.end == 3
\ No newline at end of file
+    assert task_b.result.end == 3
+
+def build_chain_scenario(durations: List[int]) -> SimpleShopFloorScenario:
+    """
+    a single machine with a chain of tasks, each one after the previous
+    """
+    machinery_resource = MachineryResource()
+    machinery_resource.machine_name = "m1"
+
+    scenario = SimpleShopFloorScenario()
+    scenario.add_resource(machinery_resource)
+
+    previous = None
+    for i, duration in enumerate(durations):
+        task = FixedDurationTask()
+        task.label = f"task_{i}"
+        task.duration = duration
+        task.add_resource(machinery_resource)
+        if previous is not None:
+            after_constraint = AfterConstraint()
+            after_constraint.task = previous
+            task.add_constraint(after_constraint)
+        scenario.add_task(task)
+        previous = task
+
+    return scenario
+
+def test_pooled_worker(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+        mock_module_config,
+):
+    config = WorkerConfig.model_construct(
+        pool_size=2,
+        pool_max_tasks_per_child=1,
+        pool_start_method='forkserver',
+    )
+
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=config,
+        module_config=mock_module_config,
+    )
+
+    chains = [[2, 3], [1, 1, 1], [4]]
+    worker_units = [
+        worker_service.prepare_worker(build_chain_scenario(durations), SimpleSolver(), MinimumTypeTarget())
+        for durations in chains + [[5]]
+    ]
+    # the last one can't be solved, it must not fail the others
+    worker_units[-1].wrapped_model.model.add_bool_or([])
+
+    try:
+        results = worker_service.solve_pooled(worker_units)
+    finally:
+        worker_service.shutdown_pool()
+
+    assert len(results) == len(chains) + 1
+    assert results[-1].status == WorkerTaskOutputStatus.INFEASIBLE and results[-1].result is None
+    for durations, result in zip(chains, results):
+        assert result.wrapped_solver is None
+        tasks = cast(List[FixedDurationTask], result.scenario.get_tasks())
+        assert [t.result.start for t in tasks] == [sum(durations[:i]) for i in range(len(durations))]
+        assert tasks[-1].result.end == sum(durations)
+
+@pytest.mark.asyncio
+async def test_pooled_execution(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+        mock_module_config,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=WorkerConfig.model_construct(
+            pool_size=2, pool_start_method='forkserver', pool_executions=True,
+            model_cache_size=0, incremental_models=0,
+        ),
+        module_config=mock_module_config,
+    )
+    mock_mongodb_service.get_last_successful_execution_document.return_value = None
+
+    scenario = build_chain_scenario([2, 3, 4])
+    scenario.uuid = 'scenario-uuid'
+    try:
+        output = await worker_service.run_execution(
+            scenario, SimpleSolver(), MinimumTypeTarget(), 'execution-uuid', ExecutionBudget(time_budget=5.0)
+        )
+        assert output.status == WorkerTaskOutputStatus.OPTIMAL and output.wrapped_solver is None
+        assert [t.result.end for t in scenario.get_tasks()] == [2, 5, 9]
+        stored = mock_mongodb_service.update_scenario_execution_document.call_args.kwargs['values']
+        assert len(stored['task_results']) == 3
+        assert stored['solver_parameters']['max_time_in_seconds'] == 5.0
+
+        # the cancel reaches the search running in the pool process
+        worker_unit = worker_service.prepare_worker(build_job_shop_scenario(15, 10), SimpleSolver(), MinimumTypeTarget())
+        solve = asyncio.create_task(worker_service.solve_pooled_execution(
+            worker_unit.scenario, MinimumTypeTarget(), [worker_unit], 'running', ExecutionBudget(time_budget=30.0)
+        ))
+        await asyncio.sleep(1.0)
+        assert worker_service.cancel_execution('running')
+        output = await asyncio.wait_for(solve, timeout=10)
+        assert output.cancelled and output.solve_stats.wall_time < 10
+    finally:
+        worker_service.shutdown_pool()
+
+def test_profiled_solver(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    solver = ProfiledSolver()
+    solver.profile = 'fast-feasible'
+    solver.random_seed = 42
+
+    parameters = solver.get_parameters()
+    assert parameters['max_time_in_seconds'] == SOLVER_PROFILES['fast-feasible']['max_time_in_seconds']
+    assert parameters['random_seed'] == 42
+    assert parameters['num_workers'] >= 1
+
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service
+    )
+
+    worker_unit = worker_service.prepare_worker(build_chain_scenario([2, 3]), solver, MinimumTypeTarget())
+    assert worker_unit.solver.parameters.random_seed == 42
+
+    result = worker_service.solve_synchronously(worker_unit)
+    assert result.solver_profile == 'fast-feasible'
+    assert result.solver_parameters['random_seed'] == 42
+
+    unknown = ProfiledSolver()
+    unknown.profile = 'not-a-profile'
+    with pytest.raises(ValueError):
+        unknown.get_parameters()
+
+@pytest.mark.asyncio
+async def test_streaming_worker(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    config = WorkerConfig.model_construct(incumbent_min_interval=0.0)
+
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=config
+    )
+
+    worker_unit = worker_service.prepare_worker(build_chain_scenario([2, 3, 4]), SimpleSolver(), MinimumTypeTarget())
+
+    result = await worker_service.solve_streaming(worker_unit, 'scenario-uuid', 'execution-uuid')
+
+    assert result.status == WorkerTaskOutputStatus.OPTIMAL
+    assert mock_mongodb_service.push_scenario_execution_incumbent.await_count >= 1
+    assert mock_rabbitmq_service.publish_incumbent_async.call_count >= 1
+
+    published = mock_rabbitmq_service.publish_incumbent_async.call_args.kwargs
+    assert published['uuid_execution'] == 'execution-uuid'
+    assert len(published['data']['tasks']) == 3
+
+def test_warm_start_hints(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service
+    )
+
+    scenario = build_chain_scenario([2, 3])
+    tasks = scenario.get_tasks()
+    hints = {
+        tasks[0].get_unique_id(): (0, 2),
+        'removed-task': (10, 12),
+    }
+
+    worker_unit = worker_service.prepare_worker(scenario, SimpleSolver(), MinimumTypeTarget(), hints=hints)
+
+    solution_hint = worker_unit.wrapped_model.model.proto.solution_hint
+    assert list(solution_hint.vars) == [tasks[0].cp_sat.start.index, tasks[0].cp_sat.end.index]
+    assert list(solution_hint.values) == [0, 2]
+
+    result = worker_service.solve_synchronously(worker_unit)
+    assert result.status == WorkerTaskOutputStatus.OPTIMAL
+
+def test_heuristic_worker(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service
+    )
+
+    # heuristic only, no CpSat involved
+    result = worker_service.solve_heuristic(build_chain_scenario([2, 3, 4]))
+    assert result.status == WorkerTaskOutputStatus.FEASIBLE
+    assert result.wrapped_solver is None
+    tasks = cast(List[FixedDurationTask], result.scenario.get_tasks())
+    assert [(t.result.start, t.result.end) for t in tasks] == [(0, 2), (2, 5), (5, 9)]
+
+    # as presolve, the plan becomes the hints
+    scenario = build_chain_scenario([2, 3, 4])
+    worker_unit = worker_service.prepare_worker(scenario, SimpleSolver(), MinimumTypeTarget())
+    solution_hint = worker_unit.wrapped_model.model.proto.solution_hint
+    assert len(solution_hint.vars) == 6
+
+    result = worker_service.solve_synchronously(worker_unit)
+    assert result.status == WorkerTaskOutputStatus.OPTIMAL
+
+def test_resource_deduplication(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service
+    )
+
+    # the same stored machine, loaded three times
+    machines = []
+    for _ in range(3):
+        machine = MachineryResource()
+        machine.uuid = 'machine-uuid'
+        machine.machine_name = 'm1'
+        machines.append(machine)
+
+    scenario = SimpleShopFloorScenario()
+    scenario.add_resource(machines[0])
+    for i, machine in enumerate(machines[1:]):
+        task = FixedDurationTask()
+        task.label = f"task_{i}"
+        task.duration = 2
+        task.add_resource(machine)
+        scenario.add_task(task)
+
+    resource_index = worker_service.fetch_resources(scenario)
+
+    assert resource_index.resources == [machines[0]]
+    assert resource_index.duplicates_removed == 2
+    for task in scenario.get_tasks():
+        assert task.get_resources()[0] is machines[0]
+
+    # the machine is now shared, so the two tasks cannot overlap
+    result = worker_service.solve_synchronously(
+        worker_service.prepare_worker(scenario, SimpleSolver(), MinimumTypeTarget())
+    )
+    tasks = result.scenario.get_tasks()
+    assert max(t.result.end for t in tasks) == 4
+
+def test_scenario_result(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service
+    )
+
+    scenario = build_chain_scenario([2, 3, 4])
+    result = worker_service.solve_synchronously(
+        worker_service.prepare_worker(scenario, SimpleSolver(), MinimumTypeTarget())
+    )
+
+    # the results are set on the original tasks, nothing is copied
+    assert result.scenario is scenario
+    assert result.result.task_ids == [t.get_unique_id() for t in scenario.get_tasks()]
+    assert result.result.starts.tolist() == [0, 2, 5]
+    assert result.result.ends.tolist() == [2, 5, 9]
+    assert result.result.get(scenario.get_tasks()[1].get_unique_id()) == (2, 5)
+    assert result.result.get('missing') is None
+
+def test_fixed_tasks(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    from planner_solver.models.base_models import TaskStatus
+
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service
+    )
+
+    machine = MachineryResource()
+    machine.machine_name = 'm1'
+    scenario = SimpleShopFloorScenario()
+    scenario.add_resource(machine)
+
+    # two tasks already realized on the machine, two still to plan
+    tasks = []
+    for i, duration in enumerate([4, 2, 3, 2]):
+        task = FixedDurationTask()
+        task.label = f"task_{i}"
+        task.duration = duration
+        task.add_resource(machine)
+        scenario.add_task(task)
+        tasks.append(task)
+    for i, (start, end) in enumerate([(1, 5), (5, 7)]):
+        tasks[i].update_task_status(TaskStatus.FIXED)
+        tasks[i].generate_result(start=start, end=end)
+    for before, after in [(0, 1), (1, 2)]:
+        after_constraint = AfterConstraint()
+        after_constraint.task = tasks[before]
+        tasks[after].add_constraint(after_constraint)
+
+    worker_unit = worker_service.prepare_worker(scenario, SimpleSolver(), MinimumTypeTarget())
+
+    # only the tasks to plan (and the makespan) are searched
+    model = worker_unit.wrapped_model.model
+    assert sum(1 for variable in model.proto.variables if variable.domain[0] != variable.domain[-1]) == 5
+
+    result = worker_service.solve_synchronously(worker_unit)
+    assert result.status == WorkerTaskOutputStatus.OPTIMAL
+    assert [task.get_task_status() for task in tasks] == [TaskStatus.FIXED] * 2 + [TaskStatus.PLANNED] * 2
+    assert result.result.starts.tolist()[:2] == [1, 5]
+    assert result.objective == 12
+
+def test_build_and_solve_stats(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0)
+    )
+
+    worker_unit = worker_service.prepare_worker(build_chain_scenario([3, 2, 4]), SimpleSolver(), MinimumTypeTarget())
+    build_stats = worker_unit.build_stats
+    assert build_stats.source == 'built'
+    assert {'task_fetch', 'task_vars', 'task_constraints', 'target', 'solver'} <= set(build_stats.phases)
+    assert all(seconds >= 0 for seconds in build_stats.phases.values())
+    assert build_stats.variables > 0 and build_stats.intervals == 3
+
+    output = worker_service.solve_synchronously(worker_unit)
+    assert output.build_stats is build_stats
+    assert output.solve_stats.wall_time > 0
+    assert output.solve_stats.objective == output.objective == 9
+
+def build_job_shop_scenario(jobs: int, machines: int, seed: int = 0) -> SimpleShopFloorScenario:
+    """
+    each job visits all the machines in a random order, hard enough not to be solved at once
+    """
+    rng = random.Random(seed)
+    scenario = SimpleShopFloorScenario()
+
+    machine_resources = []
+    for i in range(machines):
+        machine = MachineryResource()
+        machine.machine_name = f"m{i}"
+        machine_resources.append(machine)
+        scenario.add_resource(machine)
+
+    for job in range(jobs):
+        previous = None
+        for operation, machine in enumerate(rng.sample(machine_resources, machines)):
+            task = FixedDurationTask()
+            task.label = f"job_{job}_{operation}"
+            task.duration = rng.randint(1, 20)
+            task.add_resource(machine)
+            if previous is not None:
+                after_constraint = AfterConstraint()
+                after_constraint.task = previous
+                task.add_constraint(after_constraint)
+            scenario.add_task(task)
+            previous = task
+
+    return scenario
+
+class EarliestStartsTarget(Target):
+    """
+    not a makespan: the plans that end later may be the better ones
+    """
+    def attach_target(self, model: CpModel, horizon: int, tasks: List[Task], lower_bound: int = 0) -> None:
+        model.minimize(sum(task.cp_sat.start for task in tasks))
+
+def test_horizon_by_target(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=WorkerConfig.model_construct(horizon_estimator='list_schedule')
+    )
+    scenario = build_job_shop_scenario(4, 3)
+    tasks = scenario.get_tasks()
+
+    makespan = worker_service._evaluate_horizon(scenario, tasks, MinimumTypeTarget())
+    other = worker_service._evaluate_horizon(scenario, tasks, EarliestStartsTarget())
+
+    # the list schedule cuts the horizon of the makespan only
+    assert makespan.upper_bound < other.upper_bound == sum(task.duration for task in tasks)
+    assert makespan.lower_bound == other.lower_bound
+
+    # nor does the heuristic presolve, whose plan stays a hint
+    assert worker_service._apply_heuristic_presolve(scenario, tasks, other, EarliestStartsTarget())
+    assert other.upper_bound == sum(task.duration for task in tasks)
+
+@pytest.mark.asyncio
+async def test_cancel_execution(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0, incumbent_min_interval=1.0)
+    )
+    budget = ExecutionBudget(time_budget=30.0)
+
+    # cancelled while running, as soon as the first plan is streamed: that plan is kept
+    async def cancel_on_first_incumbent(**kwargs):
+        worker_service.cancel_execution(kwargs['uuid'])
+
+    mock_mongodb_service.push_scenario_execution_incumbent.side_effect = cancel_on_first_incumbent
+    worker_unit = worker_service.prepare_worker(build_job_shop_scenario(15, 10), SimpleSolver(), MinimumTypeTarget())
+    output = await worker_service.solve_execution(worker_unit, 'scenario-uuid', 'running', budget)
+    assert output.cancelled
+    # unless the search happened to finish before the stop
+    assert output.status in (WorkerTaskOutputStatus.FEASIBLE, WorkerTaskOutputStatus.OPTIMAL)
+    assert len(output.result) == 150
+    assert output.solve_stats.wall_time < 10
+
+    # cancelled before its search started, stopped with no plan and no exception
+    worker_unit = worker_service.prepare_worker(build_job_shop_scenario(15, 10), SimpleSolver(), MinimumTypeTarget())
+    assert not worker_service.cancel_execution('queued')
+    output = await worker_service.solve_execution(worker_unit, 'scenario-uuid', 'queued', budget)
+    assert output.cancelled
+    assert output.status in (WorkerTaskOutputStatus.UNKNOWN, WorkerTaskOutputStatus.FEASIBLE)
+    assert output.solve_stats.wall_time < 10
+
+def test_execution_budget():
+    cp_solver = SimpleSolver().generate_solver(None)
+    cp_solver.parameters.max_time_in_seconds = 5.0
+
+    ExecutionBudget(time_budget=60.0, work_budget=2.0).apply(cp_solver)
+    # the lower limit wins
+    assert cp_solver.parameters.max_time_in_seconds == 5.0
+    assert cp_solver.parameters.max_deterministic_time == 2.0
+
+@pytest.mark.asyncio
+async def test_run_execution(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0, incumbent_min_interval=1.0)
+    )
+    mock_mongodb_service.get_last_successful_execution_document.return_value = None
+
+    scenario = build_chain_scenario([2, 3, 4])
+    scenario.uuid = 'scenario-uuid'
+    output = await worker_service.run_execution(
+        scenario, SimpleSolver(), MinimumTypeTarget(), 'execution-uuid', ExecutionBudget(time_budget=5.0)
+    )
+
+    assert output.status == WorkerTaskOutputStatus.OPTIMAL
+    assert output.solver_parameters['max_time_in_seconds'] == 5.0
+
+    # the outcome is stored on the execution
+    stored = mock_mongodb_service.update_scenario_execution_document.call_args.kwargs
+    assert (stored['uuid_scenario'], stored['uuid']) == ('scenario-uuid', 'execution-uuid')
+    assert stored['values']['status'] == WorkerTaskOutputStatus.OPTIMAL
+    assert len(stored['values']['task_results']) == 3
+    assert stored['values']['error'] is None
+
+@pytest.mark.asyncio
+async def test_run_execution_heuristic_only(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0, incumbent_min_interval=1.0)
+    )
+
+    scenario = build_chain_scenario([2, 3, 4])
+    scenario.uuid = 'scenario-uuid'
+    output = await worker_service.run_execution(
+        scenario, SimpleSolver(), MinimumTypeTarget(), 'execution-uuid', heuristic_only=True
+    )
+
+    assert output.status == WorkerTaskOutputStatus.FEASIBLE
+    assert output.wrapped_solver is None
+    stored = mock_mongodb_service.update_scenario_execution_document.call_args.kwargs
+    assert len(stored['values']['task_results']) == 3
+
+@pytest.mark.asyncio
+async def test_run_execution_heuristic_cancelled(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0, incumbent_min_interval=1.0)
+    )
+    scenario = build_chain_scenario([2, 3, 4])
+    scenario.uuid = 'scenario-uuid'
+
+    # cancelled before it ran, no rule is tried
+    assert not worker_service.cancel_execution('execution-uuid')
+    output = await worker_service.run_execution(
+        scenario, SimpleSolver(), MinimumTypeTarget(), 'execution-uuid', heuristic_only=True
+    )
+
+    assert output.cancelled
+    assert output.status == WorkerTaskOutputStatus.UNKNOWN and output.result is None
+    stored = mock_mongodb_service.update_scenario_execution_document.call_args.kwargs
+    assert stored['values']['cancelled'] and stored['values']['error'] is None
+
+@pytest.mark.asyncio
+async def test_run_execution_records_errors(
+        mock_mongodb_service,
+        mock_rabbitmq_service,
+):
+    worker_service = WorkerService(
+        mongodb_service=mock_mongodb_service,
+        rabbitmq_service=mock_rabbitmq_service,
+        config=WorkerConfig.model_construct(model_cache_size=0, incremental_models=0, incumbent_min_interval=1.0)
+    )
+    scenario = build_chain_scenario([2, 3, 4])
+    scenario.uuid = 'scenario-uuid'
+
+    with patch.object(worker_service, 'solve_heuristic', side_effect=WorkerException('no plan')):
+        with pytest.raises(WorkerException):
+            await worker_service.run_execution(
+                scenario, SimpleSolver(), MinimumTypeTarget(), 'execution-uuid', heuristic_only=True
+            )
+
+    stored = mock_mongodb_service.update_scenario_execution_document.call_args.kwargs
+    assert stored['values'] == {"status": WorkerTaskOutputStatus.UNKNOWN, "error": 'no plan'}